@@ -1,7 +1,25 @@
+import atexit
+import io
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import IO, Callable, Dict, Optional, Tuple
 
 SIMPLE_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+DEFAULT_QUEUE_SIZE = 10000
+
+# Attributes every LogRecord has; all others were passed with `extra` and are logged as fields.
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listeners: Dict[str, logging.handlers.QueueListener] = {}
+_listeners_lock = threading.Lock()
 
 
 def configure_basic_logging() -> None:
@@ -17,3 +35,240 @@ def configure_score_logger(name: str, level: int = logging.DEBUG) -> logging.Log
     logger.setLevel(level)
     logger.propagate = False
     return logger
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line, including the fields passed with `extra`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a random fraction of the records of a logger and its children. Records of level
+    WARNING and above are always kept.
+    """
+
+    def __init__(self, sample_rates: Dict[str, float], seed: Optional[int] = None):
+        """
+        :param sample_rates: fraction of records kept by logger name, the most specific name applies
+        """
+        super().__init__()
+        self.__sample_rates = sample_rates
+        self.__random = random.Random(seed)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = _lookup_by_logger_name(self.__sample_rates, record.name)
+        return rate is None or self.__random.random() < rate
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `max_per_second` records per logger through, with bursts of up to `burst`
+    records. The first record let through after records were dropped carries their
+    number in its `suppressed` field.
+    """
+
+    def __init__(
+        self,
+        max_per_second: float,
+        burst: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__()
+        self.__rate = max_per_second
+        self.__burst = burst if burst is not None else max(1, int(max_per_second))
+        self.__clock = clock
+        self.__buckets: Dict[str, Tuple[float, float]] = {}
+        self.__suppressed: Dict[str, int] = {}
+        self.__lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        now = self.__clock()
+        with self.__lock:
+            tokens, updated_at = self.__buckets.get(record.name, (self.__burst, now))
+            tokens = min(self.__burst, tokens + (now - updated_at) * self.__rate)
+            if tokens < 1:
+                self.__buckets[record.name] = (tokens, now)
+                self.__suppressed[record.name] = (
+                    self.__suppressed.get(record.name, 0) + 1
+                )
+                return False
+            self.__buckets[record.name] = (tokens - 1, now)
+            suppressed = self.__suppressed.pop(record.name, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a `QueueListener` without formatting them in the logging thread.
+    Records are dropped and counted if the queue is full, so logging never blocks. The
+    message arguments are formatted on the listener thread; they must not be mutated
+    after the logging call.
+    """
+
+    def __init__(
+        self,
+        log_queue: "queue.SimpleQueue[logging.LogRecord]",
+        max_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        super().__init__(log_queue)  # type: ignore[arg-type]
+        self.__max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # SimpleQueue is unbounded and its put never waits for a lock held by the listener.
+        if self.queue.qsize() >= self.__max_size:  # type: ignore[attr-defined]
+            self.dropped += 1
+        else:
+            self.queue.put_nowait(record)
+
+
+def configure_async_score_logger(
+    name: str,
+    level: int = logging.DEBUG,
+    json_format: bool = True,
+    sample_rates: Optional[Dict[str, float]] = None,
+    max_per_second: Optional[float] = None,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    stream: Optional[IO[str]] = None,
+) -> logging.Logger:
+    """
+    Like `configure_score_logger`, but records are written by a background thread, so a
+    logging call costs little more than putting the record on a queue. The queue is
+    flushed at interpreter exit or by `shutdown_async_logging`.
+    :param json_format: if True, records are written as JSON lines, otherwise with `SIMPLE_FORMAT`
+    :param sample_rates: fraction of DEBUG and INFO records kept by logger name, see `SamplingFilter`
+    :param max_per_second: maximum number of records per second and logger, see `RateLimitFilter`
+    :param queue_size: number of records buffered before further records are dropped
+    :param stream: stream the records are written to, stdout by default
+    """
+    stream_handler = logging.StreamHandler(stream if stream is not None else sys.stdout)
+    stream_handler.setFormatter(
+        JsonFormatter() if json_format else logging.Formatter(SIMPLE_FORMAT)
+    )
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = NonBlockingQueueHandler(log_queue, queue_size)
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+    if max_per_second:
+        queue_handler.addFilter(RateLimitFilter(max_per_second))
+    listener = logging.handlers.QueueListener(
+        log_queue, stream_handler  # type: ignore[arg-type]
+    )
+
+    logger = logging.getLogger(name)
+    with _listeners_lock:
+        previous = _listeners.pop(name, None)
+        if previous is not None:
+            previous.stop()
+        for handler in list(logger.handlers):
+            if isinstance(handler, NonBlockingQueueHandler):
+                logger.removeHandler(handler)
+        if not _listeners:
+            atexit.register(shutdown_async_logging)
+        _listeners[name] = listener
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    listener.start()
+    return logger
+
+
+def shutdown_async_logging(name: Optional[str] = None) -> None:
+    """
+    Writes all queued records and stops the background thread of the async logger with the
+    given name, or of all async loggers. Records logged afterwards are dropped once the
+    queue is full.
+    """
+    with _listeners_lock:
+        names = [name] if name is not None else list(_listeners)
+        listeners = [_listeners.pop(n) for n in names if n in _listeners]
+        if not _listeners:
+            atexit.unregister(shutdown_async_logging)
+    for listener in listeners:
+        listener.stop()
+
+
+class _SlowStream(io.TextIOBase):
+    """
+    Stream whose writes take `delay` seconds, like stdout piped to a busy log collector.
+    """
+
+    def __init__(self, stream: IO[str], delay: float):
+        self.__stream = stream
+        self.__delay = delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.__delay)
+        return self.__stream.write(text)
+
+
+def benchmark_score_logger(
+    n_calls: int = 10000,
+    stream: Optional[IO[str]] = None,
+    write_delay_seconds: float = 0.0,
+) -> Dict[str, float]:
+    """
+    Measures the time a logging call takes in the calling thread, with the synchronous
+    `configure_score_logger` and with `configure_async_score_logger`.
+    :param stream: stream the records are written to, by default the null device
+    :param write_delay_seconds: time added to every write, to simulate a stdout pipe whose reader falls behind
+    :return: mean seconds per call by logger kind, the async time excludes the final flush
+    """
+    devnull = open(os.devnull, "w") if stream is None else None
+    target: IO[str] = stream or devnull  # type: ignore[assignment]
+    if write_delay_seconds:
+        target = _SlowStream(target, write_delay_seconds)  # type: ignore[assignment]
+    results = {}
+    try:
+        for kind in ("sync", "async"):
+            name = f"{__name__}.benchmark.{kind}"
+            if kind == "sync":
+                logger = configure_score_logger(name)
+                logger.handlers[-1].setStream(target)  # type: ignore[attr-defined]
+            else:
+                logger = configure_async_score_logger(
+                    name, json_format=False, queue_size=n_calls + 1, stream=target
+                )
+            start = time.perf_counter()
+            for i in range(n_calls):
+                logger.debug("Scored request %d with %d rows", i, 64)
+            results[kind] = (time.perf_counter() - start) / n_calls
+            if kind == "async":
+                shutdown_async_logging(name)
+            logger.handlers.clear()
+    finally:
+        if devnull is not None:
+            devnull.close()
+    return results
+
+
+def _lookup_by_logger_name(values: Dict[str, float], name: str) -> Optional[float]:
+    while True:
+        if name in values:
+            return values[name]
+        if "." not in name:
+            return None
+        name = name.rsplit(".", 1)[0]
@@ -1,11 +1,15 @@
 import csv
 import io
-from typing import Any, Iterable, List, Optional
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional
 
 import gin
 import pandas as pd
 import pandas.io.sql
-import sqlalchemy
+
+from kreuzbergml.instrumentation.metrics import timer
+
+if TYPE_CHECKING:
+    import sqlalchemy
 
 
 @gin.configurable
@@ -18,19 +22,28 @@ class AbstractPostgresDbDAO:
     @staticmethod
     def create_engine(
         username: str, password: str, host: str, port: str, database: str
-    ) -> sqlalchemy.engine.Engine:
+    ) -> "sqlalchemy.engine.Engine":
+        import sqlalchemy
+
         engine = sqlalchemy.create_engine(
             f"postgresql+psycopg2://{username}:{password}@{host}:{port}/{database}"
         )
         return engine
 
     def configure_db(self, schema_sql: str) -> None:
+        import sqlalchemy
+
         escaped_sql = sqlalchemy.text(schema_sql)
         with self.engine.connect() as connection:
             connection.execute(escaped_sql)
 
     def export_from_db(self, table_name: str, schema: str) -> pd.DataFrame:
-        df = pd.read_sql_table(schema=schema, table_name=table_name, con=self.engine)
+        # The query and the parsing into a data frame both happen inside pandas.
+        with timer("postgres.export_from_db") as operation:
+            df = pd.read_sql_table(
+                schema=schema, table_name=table_name, con=self.engine
+            )
+            operation.add(rows=df.shape[0])
         return df
 
     def import_to_db(
@@ -46,22 +59,64 @@ class AbstractPostgresDbDAO:
         else:
             method = self.__psql_truncate_insert_copy
             if_exists = "append"
-        cnt = source_df.to_sql(
-            schema=target_schema_name,
-            name=target_table_name,
-            con=self.engine,
-            method=method,
-            if_exists=if_exists,
-            index=False,
-        )
-        if not cnt:
-            cnt = source_df.shape[0]
+        with timer("postgres.import_to_db") as operation:
+            cnt = source_df.to_sql(
+                schema=target_schema_name,
+                name=target_table_name,
+                con=self.engine,
+                method=method,
+                if_exists=if_exists,
+                index=False,
+            )
+            if not cnt:
+                cnt = source_df.shape[0]
+            operation.add(rows=cnt)
+        return cnt
+
+    def replace_shard(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        target_table_name: str,
+        shard_column: str,
+        shard_id: str,
+        target_schema_name: Optional[str] = None,
+    ) -> int:
+        """
+        Replaces all rows of one shard in an existing table. The shard's previous rows are
+        deleted and the chunks are inserted with COPY in a single transaction, so re-running
+        a shard never duplicates rows and only one chunk has to be held in memory at a time.
+        :param chunks: data frames to insert, `shard_column` is set to `shard_id` on each of them
+        :param shard_column: column identifying the shard a row was written by
+        :return: number of inserted rows
+        """
+        table_name = _qualified_table_name(target_schema_name, target_table_name)
+        cnt = 0
+        with timer("postgres.replace_shard") as operation:
+            with self.engine.begin() as connection:
+                dbapi_conn = connection.connection
+                with dbapi_conn.cursor() as cur:
+                    with timer("postgres.delete_shard"):
+                        cur.execute(
+                            'DELETE FROM {} WHERE "{}" = %s'.format(
+                                table_name, shard_column
+                            ),
+                            (shard_id,),
+                        )
+                    for chunk in chunks:
+                        chunk = chunk.assign(**{shard_column: shard_id})
+                        # Like pandas' SQLTable.insert_data, nulls are written as empty
+                        # fields, which COPY loads as NULL, rather than as "nan" or "NaT".
+                        masked = chunk.astype(object).where(chunk.notna(), None)
+                        rows = masked.itertuples(index=False, name=None)
+                        _copy_csv(cur, table_name, list(chunk.columns), rows)
+                        cnt += chunk.shape[0]
+            operation.add(rows=cnt)
         return cnt
 
     @staticmethod
     def __psql_truncate_insert_copy(
         table: pd.io.sql.SQLTable,
-        conn: sqlalchemy.engine.base.Connection,
+        conn: "sqlalchemy.engine.base.Connection",
         keys: List[str],
         data_iter: Iterable[Any],
     ):
@@ -71,25 +126,14 @@ class AbstractPostgresDbDAO:
         """
         dbapi_conn = conn.connection
         with dbapi_conn.cursor() as cur:
-            s_buf = io.StringIO()
-            writer = csv.writer(s_buf)
-            writer.writerows(data_iter)
-            s_buf.seek(0)
-
-            columns = ", ".join('"{}"'.format(k) for k in keys)
-            if table.schema:
-                table_name = "{}.{}".format(table.schema, table.name)
-            else:
-                table_name = table.name
-
+            table_name = _qualified_table_name(table.schema, table.name)
             cur.execute("TRUNCATE {}".format(table_name))
-            sql = "COPY {} ({}) FROM STDIN WITH CSV".format(table_name, columns)
-            cur.copy_expert(sql=sql, file=s_buf)
+            _copy_csv(cur, table_name, keys, data_iter)
 
     @staticmethod
     def __psql_insert_copy(
         table: pd.io.sql.SQLTable,
-        conn: sqlalchemy.engine.base.Connection,
+        conn: "sqlalchemy.engine.base.Connection",
         keys: List[str],
         data_iter: Iterable[Any],
     ):
@@ -99,16 +143,27 @@ class AbstractPostgresDbDAO:
         """
         dbapi_conn = conn.connection
         with dbapi_conn.cursor() as cur:
-            s_buf = io.StringIO()
-            writer = csv.writer(s_buf)
-            writer.writerows(data_iter)
-            s_buf.seek(0)
-
-            columns = ", ".join('"{}"'.format(k) for k in keys)
-            if table.schema:
-                table_name = "{}.{}".format(table.schema, table.name)
-            else:
-                table_name = table.name
-
-            sql = "COPY {} ({}) FROM STDIN WITH CSV".format(table_name, columns)
-            cur.copy_expert(sql=sql, file=s_buf)
+            table_name = _qualified_table_name(table.schema, table.name)
+            _copy_csv(cur, table_name, keys, data_iter)
+
+
+def _qualified_table_name(schema: Optional[str], name: str) -> str:
+    if schema:
+        return "{}.{}".format(schema, name)
+    return name
+
+
+def _copy_csv(cur: Any, table_name: str, keys: List[str], rows: Iterable[Any]) -> None:
+    with timer("postgres.encode") as operation:
+        s_buf = io.StringIO()
+        writer = csv.writer(s_buf)
+        writer.writerows(rows)
+        n_bytes = s_buf.tell()
+        s_buf.seek(0)
+        operation.add(bytes=n_bytes)
+
+    columns = ", ".join('"{}"'.format(k) for k in keys)
+    sql = "COPY {} ({}) FROM STDIN WITH CSV".format(table_name, columns)
+    with timer("postgres.copy") as operation:
+        cur.copy_expert(sql=sql, file=s_buf)
+        operation.add(bytes=n_bytes)
@@ -4,6 +4,8 @@ from typing import List, Optional, Union
 
 from pandas import DataFrame, DatetimeIndex, Index, PeriodIndex, date_range, period_range
 
+from kreuzbergml.instrumentation.metrics import timed
+
 logger = getLogger(__name__)
 
 
@@ -25,6 +27,7 @@ class DataFrameStatistics:
     def df(self):
         return self._df
 
+    @timed("data_quality.count_nulls")
     def count_nulls(self, col: Union[List[str], str, None] = None):
         """
         :param col: column name if provided only counts null in that column
@@ -34,6 +37,7 @@ class DataFrameStatistics:
         count = self.df.isnull().sum() if col is None else self.df[col].isnull().sum()
         return count
 
+    @timed("data_quality.get_null_cols")
     def get_null_cols(self, col: Optional[str] = None) -> List[str]:
         """
         :param col: if given, checks if  col(s) has nulls
@@ -44,6 +48,7 @@ class DataFrameStatistics:
             else col if isinstance(col, list) \
             else [col]
 
+    @timed("data_quality.get_duplicate_columns")
     def get_duplicate_columns(self):
         """
         :return:
@@ -57,6 +62,7 @@ class DataFrameStatistics:
                     dupes.setdefault(col, []).append(tgt_col)  # Store if they match
         return dupes
 
+    @timed("data_quality.calc_statistics")
     def calc_statistics(self):
 
         if self._df_type in ["time", "period"]:
@@ -105,6 +111,7 @@ class DataFrameStatistics:
             else:
                 print(f"No NaN values were found")
 
+    @timed("data_quality.get_missing_indices")
     def get_missing_indices(self):
         """
         :return:
@@ -1,25 +1,28 @@
 import logging
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
 
 import gin
-from azureml.core import (
-    ComputeTarget,
-    Environment,
-    Model,
-    RunConfiguration,
-    Webservice,
-    Workspace,
-)
-from azureml.core.authentication import (
-    InteractiveLoginAuthentication,
-    ServicePrincipalAuthentication,
-)
-from azureml.core.compute import AmlCompute
-from azureml.core.model import InferenceConfig
-from azureml.core.webservice import AciWebservice
-from azureml.exceptions import ComputeTargetException
-from azureml.pipeline.core import Pipeline, PipelineEndpoint
-from azureml.pipeline.steps import PythonScriptStep
+
+from kreuzbergml.instrumentation.metrics import timed
+
+from .environment import EnvironmentCache
+from .session import DEFAULT_TTL_SECONDS, AzureSession
+
+# The azureml SDK takes seconds to import, it is imported by the methods using it.
+if TYPE_CHECKING:
+    from azureml.core import (
+        ComputeTarget,
+        Environment,
+        Model,
+        Webservice,
+        Workspace,
+    )
+    from azureml.core.authentication import (
+        InteractiveLoginAuthentication,
+        ServicePrincipalAuthentication,
+    )
+    from azureml.pipeline.core import PipelineEndpoint
+    from azureml.pipeline.steps import PythonScriptStep
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +53,7 @@ class AzureApp:
         db_name: Optional[str] = None,
         blob_string: Optional[str] = None,
         blob_container: Optional[str] = None,
+        session_ttl_seconds: float = DEFAULT_TTL_SECONDS,
     ):
         self.__tenant_id = tenant_id
         self.__subscription_id = subscription_id
@@ -70,6 +74,10 @@ class AzureApp:
         self.__db_name = db_name
         self.__blob_string = blob_string
         self.__blob_container = blob_container
+        self.__session = AzureSession(ttl_seconds=session_ttl_seconds)
+        self.__environment_cache = EnvironmentCache(
+            lookup=self.__lookup_environment, build=self.__build_environment
+        )
         # self.__realtime_service_name = realtime_service_name
         # self.__batch_service_name = batch_service_name
 
@@ -147,6 +155,18 @@ class AzureApp:
     def blob_container(self) -> str:
         return self.__blob_container
 
+    @property
+    def session(self) -> AzureSession:
+        """
+        Cache of the authentication, workspace, compute targets and datastores, shared with
+        `AzureDatabase` instances using this app.
+        """
+        return self.__session
+
+    @property
+    def environment_cache(self) -> EnvironmentCache:
+        return self.__environment_cache
+
     # @property
     # def realtime_service_name(self) -> str:
     #     return self.__realtime_service_name
@@ -155,11 +175,13 @@ class AzureApp:
     # def batch_service_name(self) -> str:
     #     return self.__batch_service_name
 
-    def get_workspace(self) -> Workspace:
-        if self.service_principle_id and self.service_principle_password:
-            auth = self.get_service_principle_authentication()
-        else:
-            auth = self.get_interactive_authentication()
+    def get_workspace(self) -> "Workspace":
+        return self.session.get_workspace(self.__create_workspace)
+
+    def __create_workspace(self) -> "Workspace":
+        from azureml.core import Workspace
+
+        auth = self.session.get_auth(self.__create_authentication)
         ws = Workspace(
             subscription_id=self.subscription_id,
             resource_group=self.resource_group,
@@ -168,11 +190,22 @@ class AzureApp:
         )
         return ws
 
-    def get_interactive_authentication(self) -> InteractiveLoginAuthentication:
+    def __create_authentication(
+        self,
+    ) -> Union["ServicePrincipalAuthentication", "InteractiveLoginAuthentication"]:
+        if self.service_principle_id and self.service_principle_password:
+            return self.get_service_principle_authentication()
+        return self.get_interactive_authentication()
+
+    def get_interactive_authentication(self) -> "InteractiveLoginAuthentication":
+        from azureml.core.authentication import InteractiveLoginAuthentication
+
         auth = InteractiveLoginAuthentication(tenant_id=self.tenant_id)
         return auth
 
-    def get_service_principle_authentication(self) -> ServicePrincipalAuthentication:
+    def get_service_principle_authentication(self) -> "ServicePrincipalAuthentication":
+        from azureml.core.authentication import ServicePrincipalAuthentication
+
         auth = ServicePrincipalAuthentication(
             tenant_id=self.tenant_id,
             service_principal_id=self.service_principle_id,
@@ -180,29 +213,39 @@ class AzureApp:
         )
         return auth
 
+    @timed("azure.get_or_create_compute_target")
     def get_or_create_compute_target(
         self,
         compute_name: Optional[str] = None,
         vm_size: str = "STANDARD_DS11_V2",
         vm_priority: str = "lowpriority",
         max_nodes: int = 1,
-    ) -> ComputeTarget:
+        wait: bool = True,
+    ) -> "ComputeTarget":
         """
         Creates a compute cluster.
         See: "Azure Machine Learning Studio" -> "Compute" -> "Compute clusters"
         :param vm_size: by default, it's a General-purpose processing unit which costs €0.04/h per node (assuming vm_priority is low, otherwise it costs €0.17/h)
         :param vm_priority: by default, the priority is low, which means the cluster will not execute given jobs immediately. Execution can start, for example, 10 mintes later.
         :param max_nodes: by default, maximum number of nodes is 1. Increasing the number of nodes will increase the costs proportionally.
+        :param wait: if False, a new cluster is returned while it is still being provisioned, see `DeploymentOrchestrator`
         :return: a compute target object representing a cluster of one or more computers
         """
+        from azureml.core import ComputeTarget
+        from azureml.core.compute import AmlCompute
+        from azureml.exceptions import ComputeTargetException
+
         if not compute_name:
             compute_name = self.compute_name
         ws = self.get_workspace()
-        try:
-            compute_target = ComputeTarget(workspace=ws, name=compute_name)
-            logger.info(f"Compute instance '{compute_name}' already exists.")
-        except ComputeTargetException:
-            logger.info(f"Creating compute instance '{compute_name}'.")
+
+        def get_or_create() -> "ComputeTarget":
+            try:
+                compute_target = ComputeTarget(workspace=ws, name=compute_name)
+                logger.info(f"Compute instance '{compute_name}' already exists.")
+                return compute_target
+            except ComputeTargetException:
+                logger.info(f"Creating compute instance '{compute_name}'.")
             config = AmlCompute.provisioning_configuration(
                 vm_size=vm_size,
                 vm_priority=vm_priority,
@@ -210,14 +253,23 @@ class AzureApp:
             )
             compute_target = ComputeTarget.create(
                 workspace=ws,
-                name=self.compute_name,
+                name=compute_name,
                 provisioning_configuration=config,
             )
-            compute_target.wait_for_completion(show_output=True)
-            logger.info(f"Compute instance '{compute_name}' has been created.")
-        return compute_target
+            if wait:
+                compute_target.wait_for_completion(show_output=True)
+                logger.info(f"Compute instance '{compute_name}' has been created.")
+            return compute_target
 
+        # Loaded under the session's lock of this compute target, so concurrent calls
+        # for the same missing cluster create it only once.
+        return self.session.get_compute_target(compute_name, get_or_create)
+
+    @timed("azure.delete_compute_instance")
     def delete_compute_instance(self) -> bool:
+        from azureml.core import ComputeTarget
+        from azureml.exceptions import ComputeTargetException
+
         ws = self.get_workspace()
         compute_target = None
         try:
@@ -227,10 +279,22 @@ class AzureApp:
         if not compute_target:
             return False
         compute_target.delete()
+        self.session.invalidate(("compute_target", self.compute_name))
         logger.info(f"Compute instance '{self.compute_name}' has been deleted.")
         return True
 
-    def deploy_model(self) -> Model:
+    @timed("azure.deploy_model")
+    def deploy_model(self, model: Optional[Any] = None) -> "Model":
+        """
+        Registers the content of `code_path` as model.
+        :param model: if given, it is first saved as memory-mapped artifact into `code_path`, see `kreuzbergml.model.artifact.package_model`
+        """
+        from azureml.core import Model
+
+        if model is not None:
+            from kreuzbergml.model.artifact import package_model
+
+            package_model(model, self.code_path)
         ws = self.get_workspace()
         model = Model.register(
             workspace=ws,
@@ -240,18 +304,55 @@ class AzureApp:
         return model
 
     def get_env(
+        self, conda_file: str, base_image: Optional[str] = None
+    ) -> "Environment":
+        """
+        Returns a registered environment built from the conda specification, reusing an
+        existing one if the specification and base image did not change, see `EnvironmentCache`.
+        Deployment specific settings are passed at deploy time, see `get_environment_variables`.
+        """
+        return self.environment_cache.get_or_create(conda_file, base_image)
+
+    def __lookup_environment(self, name: str) -> Optional["Environment"]:
+        from azureml.core import Environment
+
+        try:
+            return Environment.get(workspace=self.get_workspace(), name=name)
+        except Exception as e:
+            # The SDK raises a plain Exception carrying the HTTP status code of the
+            # failed request; only a 404 means no environment with this name exists.
+            if "Code: 404" in str(e):
+                return None
+            raise
+
+    def __build_environment(
+        self, name: str, conda_file: str, base_image: Optional[str]
+    ) -> "Environment":
+        from azureml.core import Environment
+
+        ws = self.get_workspace()
+        env = Environment.from_conda_specification(name=name, file_path=conda_file)
+        if base_image:
+            env.docker.base_image = base_image
+        # Registered only once its image was built, so the content hash name never
+        # refers to an environment whose build failed.
+        build = env.build(workspace=ws)
+        build.wait_for_completion(show_output=True)
+        status = build.get_status()
+        if status != "Succeeded":
+            raise RuntimeError(
+                f"The image build of environment '{name}' ended with status '{status}'."
+            )
+        return env.register(workspace=ws)
+
+    def get_environment_variables(
         self,
-        endpoint_azure_name: str,
-        conda_file: str,
         principal_access: bool = False,
         db_access: bool = False,
         blob_access: bool = False,
         custom_environment_variables: Optional[Dict[str, str]] = None,
-    ) -> Environment:
-        env = Environment.from_conda_specification(
-            name=f"{endpoint_azure_name}-env", file_path=conda_file
-        )
-        env.environment_variables = {
+    ) -> Dict[str, str]:
+        environment_variables = {
             "tenant_id": self.__tenant_id,
             "subscription_id": self.__subscription_id,
             "resource_group": self.__resource_group,
@@ -263,14 +364,14 @@ class AzureApp:
             "batch_service_name": self.__batch_service_name,
         }
         if principal_access:
-            env.environment_variables.update(
+            environment_variables.update(
                 {
-                    "service_principal_id": self.__service_principal_id,
-                    "service_principal_password": self.__service_principal_password,
+                    "service_principal_id": self.__service_principle_id,
+                    "service_principal_password": self.__service_principle_password,
                 }
             )
         if db_access:
-            env.environment_variables.update(
+            environment_variables.update(
                 {
                     "db_host": self.__db_host,
                     "db_port": self.__db_port,
@@ -280,16 +381,18 @@ class AzureApp:
                 }
             )
         if blob_access:
-            env.environment_variables.update(
+            environment_variables.update(
                 {
                     "blob_string": self.__blob_string,
                     "blob_container": self.__blob_container,
                 }
             )
         if custom_environment_variables:
-            env.environment_variables.update(custom_environment_variables)
-        return env
+            environment_variables.update(custom_environment_variables)
+        # Settings which are not configured are left out instead of being passed as None.
+        return {k: v for k, v in environment_variables.items() if v is not None}
 
+    @timed("azure.create_real_time_endpoint")
     def create_real_time_endpoint(
         self,
         conda_file: str = "conda.yml",
@@ -310,20 +413,22 @@ class AzureApp:
         db_access: bool = False,
         blob_access: bool = False,
         environment_variables: Optional[Dict[str, str]] = None,
-    ) -> Webservice:
+        base_image: Optional[str] = None,
+        wait: bool = True,
+    ) -> "Webservice":
+        """
+        :param wait: if False, the service is returned while it is still being deployed, see `DeploymentOrchestrator`
+        """
+        from azureml.core import Model
+        from azureml.core.model import InferenceConfig
+        from azureml.core.webservice import AciWebservice
+
         ws = self.get_workspace()
         ssl_enabled = (
             True if ssl_cert_pem_file and ssl_key_pem_file and ssl_cname else False
         )
         auth_enabled = True if auth_primary_key else False
-        env = self.get_env(
-            endpoint_azure_name,
-            conda_file,
-            principal_access,
-            db_access,
-            blob_access,
-            environment_variables,
-        )
+        env = self.get_env(conda_file, base_image)
         inference_config = InferenceConfig(
             environment=env,
             entry_script=entry_script_file,
@@ -341,6 +446,9 @@ class AzureApp:
             primary_key=auth_primary_key,
             location=location,
             tags=tags,
+            environment_variables=self.get_environment_variables(
+                principal_access, db_access, blob_access, environment_variables
+            ),
         )
         deployment_target = None
         if deployment_target_compute_name and deployment_target_vm_size:
@@ -357,11 +465,13 @@ class AzureApp:
             deployment_config=deployment_config,
             deployment_target=deployment_target,
             overwrite=True,
-            show_output=True,
+            show_output=wait,
         )
-        service.wait_for_deployment(show_output=True)
+        if wait:
+            service.wait_for_deployment(show_output=True)
         return service
 
+    @timed("azure.create_pipeline_endpoint")
     def create_pipeline_endpoint(
         self,
         entry_script_file: str = "score.py",
@@ -373,24 +483,33 @@ class AzureApp:
         vm_priority: str = "lowpriority",
         max_nodes: int = 1,
         environment_variables: Optional[Dict[str, str]] = None,
-    ) -> PipelineEndpoint:
+        base_image: Optional[str] = None,
+        wait: bool = True,
+    ) -> "PipelineEndpoint":
+        """
+        :param wait: if False, the pipeline is published while its compute cluster is still being provisioned
+        """
+        from azureml.core import RunConfiguration
+        from azureml.pipeline.steps import PythonScriptStep
+
         ws = self.get_workspace()
-        env = self.get_env(
-            service_name,
-            conda_file,
-            db_access=True,
-            blob_access=True,
-            custom_environment_variables=environment_variables,
-        )
+        env = self.get_env(conda_file, base_image)
         compute_target = self.get_or_create_compute_target(
             vm_size=vm_size,
             vm_priority=vm_priority,
             max_nodes=max_nodes,
+            wait=wait,
         )
         runconfig = RunConfiguration()
         runconfig.environment = env
+        runconfig.environment_variables = self.get_environment_variables(
+            db_access=True,
+            blob_access=True,
+            custom_environment_variables=environment_variables,
+        )
 
         batch_execution_step = PythonScriptStep(
+            name=service_name,
             source_directory=self.code_path,
             script_name=entry_script_file,
             arguments=["--model_name", self.model_name],
@@ -398,9 +517,96 @@ class AzureApp:
             compute_target=compute_target,
             allow_reuse=False,
         )
+        return self.__publish_pipeline_endpoint(
+            ws,
+            steps=[batch_execution_step],
+            pipeline_name=pipeline_name,
+            pipeline_endpoint_name=pipeline_endpoint_name,
+        )
+
+    @timed("azure.create_partitioned_pipeline_endpoint")
+    def create_partitioned_pipeline_endpoint(
+        self,
+        entry_script_file: str = "score.py",
+        service_name: str = "test-service",
+        pipeline_name: str = "partitioned-batch-pipeline",
+        pipeline_endpoint_name: str = "partitioned-batch-endpoint",
+        conda_file: str = "./conda.yml",
+        vm_size: str = "STANDARD_DS11_V2",
+        vm_priority: str = "lowpriority",
+        node_count: int = 2,
+        process_count_per_node: int = 1,
+        environment_variables: Optional[Dict[str, str]] = None,
+        base_image: Optional[str] = None,
+        wait: bool = True,
+    ) -> "PipelineEndpoint":
+        """
+        Publishes a batch pipeline with one step per node; the steps have no dependencies
+        and run in parallel on a cluster of `node_count` nodes. Each step passes
+        `--node_index`, `--node_count` and `--process_count` to the entry script, which is
+        expected to score its shards with `kreuzbergml.deployment.batch`, e.g.
+        `LocalShardExecutor(process_count).run(job, select_node_shards(shards, node_index, node_count))`.
+        :param wait: if False, the pipeline is published while its compute cluster is still being provisioned
+        """
+        from azureml.core import RunConfiguration
+        from azureml.pipeline.steps import PythonScriptStep
+
+        ws = self.get_workspace()
+        env = self.get_env(conda_file, base_image)
+        compute_target = self.get_or_create_compute_target(
+            vm_size=vm_size,
+            vm_priority=vm_priority,
+            max_nodes=node_count,
+            wait=wait,
+        )
+        runconfig = RunConfiguration()
+        runconfig.environment = env
+        runconfig.environment_variables = self.get_environment_variables(
+            db_access=True,
+            blob_access=True,
+            custom_environment_variables=environment_variables,
+        )
+
+        steps = [
+            PythonScriptStep(
+                name=f"{service_name}-node-{node_index}",
+                source_directory=self.code_path,
+                script_name=entry_script_file,
+                arguments=[
+                    "--model_name",
+                    self.model_name,
+                    "--node_index",
+                    str(node_index),
+                    "--node_count",
+                    str(node_count),
+                    "--process_count",
+                    str(process_count_per_node),
+                ],
+                runconfig=runconfig,
+                compute_target=compute_target,
+                allow_reuse=False,
+            )
+            for node_index in range(node_count)
+        ]
+        return self.__publish_pipeline_endpoint(
+            ws,
+            steps=steps,
+            pipeline_name=pipeline_name,
+            pipeline_endpoint_name=pipeline_endpoint_name,
+        )
+
+    def __publish_pipeline_endpoint(
+        self,
+        ws: "Workspace",
+        steps: List["PythonScriptStep"],
+        pipeline_name: str,
+        pipeline_endpoint_name: str,
+    ) -> "PipelineEndpoint":
+        from azureml.pipeline.core import Pipeline, PipelineEndpoint
+
         published_pipeline = Pipeline(
             workspace=ws,
-            steps=[batch_execution_step],
+            steps=steps,
             default_source_directory=self.code_path,
             description="Batch pipeline",
         ).publish(
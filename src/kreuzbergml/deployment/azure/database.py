@@ -1,12 +1,13 @@
 import logging
+from typing import TYPE_CHECKING
 
 import gin
-from azureml.core import Datastore
-from azureml.data.azure_postgre_sql_datastore import AzurePostgreSqlDatastore
-from azureml.exceptions import UserErrorException
 
 from .app import AzureApp
 
+if TYPE_CHECKING:
+    from azureml.data.azure_postgre_sql_datastore import AzurePostgreSqlDatastore
+
 logger = logging.getLogger(__name__)
 
 
@@ -52,10 +53,15 @@ class AzureDatabase:
     def user_password(self) -> str:
         return self.__user_password
 
-    def get_or_register_postgres_db(self) -> AzurePostgreSqlDatastore:
+    def get_or_register_postgres_db(self) -> "AzurePostgreSqlDatastore":
+        from azureml.core import Datastore
+        from azureml.exceptions import UserErrorException
+
         ws = self.azure_config.get_workspace()
         try:
-            psql_datastore = Datastore.get(ws, self.datastore_name)
+            psql_datastore = self.azure_config.session.get_datastore(
+                self.datastore_name, lambda: Datastore.get(ws, self.datastore_name)
+            )
             logger.info(f"PostgreSQL database '{self.datastore_name}' already exists.")
         except UserErrorException:
             psql_datastore = Datastore.register_azure_postgre_sql(
@@ -66,6 +72,9 @@ class AzureDatabase:
                 user_id=self.user_id,
                 user_password=self.user_password,
             )
+            self.azure_config.session.put(
+                ("datastore", self.datastore_name), psql_datastore
+            )
             logger.info(
                 f"PostgreSQL database '{self.datastore_name}' has been registered."
             )
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, DefaultDict, Dict, Optional, Union
+
+from kreuzbergml.instrumentation.metrics import timer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAME_PREFIX = "kreuzbergml-env"
+DEFAULT_EXPECTED_BUILD_SECONDS = 600.0
+
+# YAML comments start at a "#" at the beginning of a line or after whitespace,
+# a "#" inside a value such as "git+https://...#egg=name" is kept.
+_COMMENT = re.compile(r"(^|\s)#.*$")
+
+
+@dataclass
+class EnvironmentStats:
+    built: int = 0
+    reused: int = 0
+    build_seconds: float = 0.0
+    expected_build_seconds: float = DEFAULT_EXPECTED_BUILD_SECONDS
+
+    @property
+    def mean_build_seconds(self) -> float:
+        """
+        Mean measured build time, or the expected build time if nothing was built yet.
+        """
+        if self.built:
+            return self.build_seconds / self.built
+        return self.expected_build_seconds
+
+    @property
+    def seconds_saved(self) -> float:
+        return self.reused * self.mean_build_seconds
+
+
+def normalize_conda_specification(text: str) -> str:
+    """
+    Drops comments, trailing whitespace and blank lines, which do not change the environment.
+    """
+    lines = []
+    for line in text.splitlines():
+        stripped = _COMMENT.sub("", line).rstrip()
+        if stripped.strip():
+            lines.append(stripped)
+    return "\n".join(lines)
+
+
+def compute_environment_hash(
+    conda_file: Union[str, Path], base_image: Optional[str] = None
+) -> str:
+    """
+    :return: SHA-256 hex digest of the normalized conda specification and the base image
+    """
+    spec = normalize_conda_specification(Path(conda_file).read_text())
+    digest = hashlib.sha256()
+    digest.update(f"base_image={base_image or ''}\n".encode())
+    digest.update(spec.encode())
+    return digest.hexdigest()
+
+
+class EnvironmentCache:
+    """
+    Reuses registered environments whose conda specification and base image are unchanged.
+    Environments are named after the content hash, so an environment found under that name
+    was built from the same specification and its image does not have to be built again.
+    Per-deployment settings must therefore not be part of the environment; pass them at
+    deploy time instead.
+    """
+
+    def __init__(
+        self,
+        lookup: Callable[[str], Optional[Any]],
+        build: Callable[[str, str, Optional[str]], Any],
+        name_prefix: str = DEFAULT_NAME_PREFIX,
+        expected_build_seconds: float = DEFAULT_EXPECTED_BUILD_SECONDS,
+    ):
+        """
+        :param lookup: returns the registered environment with the given name or None
+        :param build: creates, registers and builds an environment from (name, conda_file, base_image)
+        :param name_prefix: prefix of the environment names, followed by the content hash
+        :param expected_build_seconds: build time assumed for the saved-time report until a build has been measured
+        """
+        self.__lookup = lookup
+        self.__build = build
+        self.__name_prefix = name_prefix
+        self.__environments: Dict[str, Any] = {}
+        # Only requests for the same environment wait for one lookup or build.
+        self.__name_locks: DefaultDict[str, threading.Lock] = defaultdict(
+            threading.Lock
+        )
+        self.__lock = threading.Lock()
+        self.__stats = EnvironmentStats(expected_build_seconds=expected_build_seconds)
+
+    @property
+    def stats(self) -> EnvironmentStats:
+        return self.__stats
+
+    def environment_name(self, content_hash: str) -> str:
+        return f"{self.__name_prefix}-{content_hash[:16]}"
+
+    def get_or_create(
+        self, conda_file: Union[str, Path], base_image: Optional[str] = None
+    ) -> Any:
+        name = self.environment_name(compute_environment_hash(conda_file, base_image))
+        with self.__name_lock(name):
+            with self.__lock:
+                env = self.__environments.get(name)
+            if env is None:
+                env = self.__lookup(name)
+            if env is not None:
+                with self.__lock:
+                    self.__stats.reused += 1
+                logger.info(
+                    f"Reusing environment '{name}', saved ~{self.__stats.mean_build_seconds:.0f}s "
+                    f"of image build ({self.__stats.seconds_saved:.0f}s in total)."
+                )
+            else:
+                logger.info(f"Building environment '{name}' from '{conda_file}'.")
+                start = time.perf_counter()
+                with timer("azure.build_environment"):
+                    env = self.__build(name, str(conda_file), base_image)
+                with self.__lock:
+                    self.__stats.built += 1
+                    self.__stats.build_seconds += time.perf_counter() - start
+            with self.__lock:
+                self.__environments[name] = env
+            return env
+
+    def __name_lock(self, name: str) -> threading.Lock:
+        with self.__lock:
+            return self.__name_locks[name]
@@ -0,0 +1,286 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SUCCEEDED_STATES = ("Healthy", "Succeeded")
+FAILED_STATES = ("Failed", "Unhealthy", "Unschedulable", "Canceled")
+TIMED_OUT = "TimedOut"
+START_FAILED = "StartFailed"
+POLL_FAILED = "PollFailed"
+
+
+@dataclass
+class StepTimings:
+    submit_seconds: float
+    wait_seconds: float
+    polls: int
+
+    @property
+    def total_seconds(self) -> float:
+        return self.submit_seconds + self.wait_seconds
+
+
+@dataclass
+class StepResult:
+    name: str
+    state: Optional[str]
+    value: Any
+    timings: StepTimings
+
+
+class DeploymentStepError(Exception):
+    def __init__(self, result: StepResult):
+        super().__init__(f"Step '{result.name}' ended in state '{result.state}'.")
+        self.result = result
+
+
+class DeploymentOrchestrator:
+    """
+    Runs deployment steps, such as web service deployments, compute provisioning and
+    pipeline publishing, concurrently. Every step runs on its own thread: it is started
+    with a blocking `start` call and its state is then polled with exponential backoff
+    until it reaches a terminal state. Waiting steps only sleep, so any number of them
+    can be waited for at once; at most `max_workers` steps are being started at a time. Every submitted step returns a future of its `StepResult`; the
+    future raises `DeploymentStepError` if the step failed, timed out, could not be
+    started or could not be polled.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        initial_poll_interval: float = 5.0,
+        max_poll_interval: float = 60.0,
+        backoff_factor: float = 2.0,
+        timeout: Optional[float] = None,
+        max_poll_errors: int = 3,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        :param max_workers: maximum number of `start` calls running at the same time
+        :param initial_poll_interval: seconds before the first status poll
+        :param max_poll_interval: upper bound of the poll interval
+        :param backoff_factor: the poll interval is multiplied by this factor after every poll
+        :param timeout: seconds a step may spend waiting for a terminal state
+        :param max_poll_errors: number of consecutive failed polls, e.g. transient SDK or network errors, after which a step fails
+        """
+        self.__start_slots = threading.BoundedSemaphore(max_workers)
+        self.__threads: List[threading.Thread] = []
+        self.__lock = threading.Lock()
+        self.__shut_down = False
+        self.__initial_poll_interval = initial_poll_interval
+        self.__max_poll_interval = max_poll_interval
+        self.__backoff_factor = backoff_factor
+        self.__timeout = timeout
+        self.__max_poll_errors = max_poll_errors
+        self.__sleep = sleep
+
+    def __enter__(self) -> "DeploymentOrchestrator":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stops accepting steps and, if `wait` is True, waits for all submitted steps to end.
+        """
+        with self.__lock:
+            self.__shut_down = True
+            threads = list(self.__threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def submit(
+        self,
+        name: str,
+        start: Callable[[], Any],
+        poll: Optional[Callable[[Any], str]] = None,
+        succeeded_states: Iterable[str] = SUCCEEDED_STATES,
+        failed_states: Iterable[str] = FAILED_STATES,
+    ) -> "Future[StepResult]":
+        """
+        :param name: name of the step used in logs and results
+        :param start: starts the step without waiting for it and returns a handle
+        :param poll: returns the current state of the handle; steps without `poll` are done once `start` returns
+        """
+        future: "Future[StepResult]" = Future()
+        thread = threading.Thread(
+            target=self.__run_step,
+            args=(future, name, start, poll, set(succeeded_states), set(failed_states)),
+            name=f"DeploymentOrchestrator-{name}",
+            daemon=True,
+        )
+        with self.__lock:
+            if self.__shut_down:
+                raise RuntimeError("Cannot submit steps after shutdown.")
+            self.__threads = [t for t in self.__threads if t.is_alive()]
+            self.__threads.append(thread)
+            thread.start()
+        return future
+
+    def submit_real_time_endpoint(
+        self, app: Any, **kwargs: Any
+    ) -> "Future[StepResult]":
+        """
+        Deploys `AzureApp.create_real_time_endpoint(**kwargs)` without blocking on the deployment.
+        """
+        _reject_wait(kwargs)
+        name = kwargs.get("endpoint_azure_name", "default-service")
+        return self.submit(
+            f"real-time-endpoint:{name}",
+            lambda: app.create_real_time_endpoint(wait=False, **kwargs),
+            poll=poll_webservice,
+        )
+
+    def submit_compute_target(self, app: Any, **kwargs: Any) -> "Future[StepResult]":
+        """
+        Provisions `AzureApp.get_or_create_compute_target(**kwargs)` without blocking on it.
+        """
+        _reject_wait(kwargs)
+        name = kwargs.get("compute_name") or app.compute_name
+        return self.submit(
+            f"compute-target:{name}",
+            lambda: app.get_or_create_compute_target(wait=False, **kwargs),
+            poll=poll_compute_target,
+        )
+
+    def submit_pipeline_endpoint(
+        self, app: Any, partitioned: bool = False, **kwargs: Any
+    ) -> "Future[StepResult]":
+        """
+        Publishes `AzureApp.create_pipeline_endpoint(**kwargs)`, or
+        `create_partitioned_pipeline_endpoint` if `partitioned` is True.
+        """
+        _reject_wait(kwargs)
+        create = (
+            app.create_partitioned_pipeline_endpoint
+            if partitioned
+            else app.create_pipeline_endpoint
+        )
+        name = kwargs.get("pipeline_endpoint_name", create.__name__)
+        return self.submit(
+            f"pipeline-endpoint:{name}", lambda: create(wait=False, **kwargs)
+        )
+
+    def __run_step(self, future: "Future[StepResult]", *args: Any) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self.__run(*args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def __run(
+        self,
+        name: str,
+        start: Callable[[], Any],
+        poll: Optional[Callable[[Any], str]],
+        succeeded_states: set,
+        failed_states: set,
+    ) -> StepResult:
+        started_at = time.perf_counter()
+        logger.info(f"Starting step '{name}'.")
+        try:
+            with self.__start_slots:
+                value = start()
+        except Exception as e:
+            logger.exception(f"Step '{name}' could not be started.")
+            now = time.perf_counter()
+            raise DeploymentStepError(
+                StepResult(
+                    name, START_FAILED, None, StepTimings(now - started_at, 0, 0)
+                )
+            ) from e
+        submitted_at = time.perf_counter()
+        state = None
+        polls = 0
+        poll_error: Optional[Exception] = None
+        if poll is not None:
+            interval = self.__initial_poll_interval
+            poll_errors = 0
+            while True:
+                self.__sleep(interval)
+                polls += 1
+                try:
+                    state = poll(value)
+                    poll_errors = 0
+                except Exception as e:
+                    poll_errors += 1
+                    logger.warning(
+                        f"Polling step '{name}' failed ({poll_errors}/"
+                        f"{self.__max_poll_errors}): {e}"
+                    )
+                    if poll_errors >= self.__max_poll_errors:
+                        state, poll_error = POLL_FAILED, e
+                        break
+                if state in succeeded_states or state in failed_states:
+                    break
+                waited = time.perf_counter() - submitted_at
+                if self.__timeout is not None and waited >= self.__timeout:
+                    state = TIMED_OUT
+                    break
+                logger.debug(f"Step '{name}' is in state '{state}'.")
+                interval = min(
+                    interval * self.__backoff_factor, self.__max_poll_interval
+                )
+        finished_at = time.perf_counter()
+        result = StepResult(
+            name=name,
+            state=state,
+            value=value,
+            timings=StepTimings(
+                submit_seconds=submitted_at - started_at,
+                wait_seconds=finished_at - submitted_at,
+                polls=polls,
+            ),
+        )
+        if poll is not None and state not in succeeded_states:
+            logger.error(f"Step '{name}' ended in state '{state}'.")
+            raise DeploymentStepError(result) from poll_error
+        logger.info(
+            f"Step '{name}' finished in {result.timings.total_seconds:.1f}s "
+            f"(state '{state}')."
+        )
+        return result
+
+
+def _reject_wait(kwargs: Dict[str, Any]) -> None:
+    if "wait" in kwargs:
+        raise ValueError(
+            "Orchestrated steps are always started without waiting, do not pass 'wait'."
+        )
+
+
+def poll_webservice(service: Any) -> str:
+    service.update_deployment_state()
+    return service.state
+
+
+def poll_compute_target(compute_target: Any) -> str:
+    compute_target.refresh_state()
+    return compute_target.provisioning_state
+
+
+def wait_all(futures: Iterable["Future[StepResult]"]) -> List[StepResult]:
+    """
+    Waits for all futures and returns their results; raises the first step error after all steps ended.
+    """
+    futures = list(futures)
+    errors: List[Exception] = []
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    if errors:
+        raise errors[0]
+    return results
@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, DefaultDict, Dict, Hashable, Iterator, Optional, Tuple
+
+from kreuzbergml.instrumentation.metrics import timer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 50 * 60
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+
+
+class AzureSession:
+    """
+    Thread-safe cache for Azure SDK objects that are expensive to create, such as the
+    authentication, the workspace, compute targets and datastores. Entries expire after
+    `ttl_seconds` and are then loaded again; concurrent requests for the same missing
+    entry wait for a single load instead of each calling the SDK.
+    Keys are strings or tuples whose first element names the kind of object, e.g.
+    `("compute_target", "cpu-cluster")`; hits and misses are counted per kind.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.__ttl_seconds = ttl_seconds
+        self.__clock = clock
+        self.__entries: Dict[Hashable, _Entry] = {}
+        # Lock and number of threads using it per key being loaded; a lock is dropped
+        # once no thread uses it, so only keys loaded right now hold one.
+        self.__key_locks: Dict[Hashable, Tuple[threading.Lock, int]] = {}
+        self.__lock = threading.Lock()
+        self.__stats: DefaultDict[str, CacheStats] = defaultdict(CacheStats)
+
+    @property
+    def ttl_seconds(self) -> float:
+        return self.__ttl_seconds
+
+    def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        ttl_seconds: Optional[float] = None,
+    ) -> Any:
+        """
+        :return: the cached value for `key`, or the result of `loader()` which is cached for `ttl_seconds`
+        """
+        value, found = self.__lookup(key)
+        if found:
+            return value
+        with self.__key_lock(key):
+            # Another thread may have loaded the entry while this one was waiting.
+            value, found = self.__lookup(key)
+            if found:
+                return value
+            with self.__lock:
+                self.__stats[_kind(key)].misses += 1
+            with timer(f"azure.load_{_kind(key)}"):
+                value = loader()
+            self.put(key, value, ttl_seconds)
+            return value
+
+    def put(
+        self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None
+    ) -> None:
+        ttl = self.__ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self.__lock:
+            self.__entries[key] = _Entry(value, self.__clock() + ttl)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Removes one entry, or all entries if no key is given.
+        """
+        with self.__lock:
+            if key is None:
+                self.__entries.clear()
+            else:
+                self.__entries.pop(key, None)
+
+    def stats(self) -> Dict[str, CacheStats]:
+        with self.__lock:
+            return {
+                kind: CacheStats(s.hits, s.misses, s.evictions)
+                for kind, s in self.__stats.items()
+            }
+
+    @property
+    def hits(self) -> int:
+        return sum(s.hits for s in self.stats().values())
+
+    @property
+    def misses(self) -> int:
+        return sum(s.misses for s in self.stats().values())
+
+    def get_workspace(self, loader: Callable[[], Any]) -> Any:
+        return self.get("workspace", loader)
+
+    def get_auth(self, loader: Callable[[], Any]) -> Any:
+        return self.get("auth", loader)
+
+    def get_compute_target(self, name: str, loader: Callable[[], Any]) -> Any:
+        return self.get(("compute_target", name), loader)
+
+    def get_datastore(self, name: str, loader: Callable[[], Any]) -> Any:
+        return self.get(("datastore", name), loader)
+
+    def __lookup(self, key: Hashable) -> Tuple[Any, bool]:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry.expires_at <= self.__clock():
+                del self.__entries[key]
+                self.__stats[_kind(key)].evictions += 1
+                logger.debug(f"Cached Azure object {key!r} expired.")
+                entry = None
+            if entry is not None:
+                self.__stats[_kind(key)].hits += 1
+            return (entry.value, True) if entry is not None else (None, False)
+
+    @contextmanager
+    def __key_lock(self, key: Hashable) -> Iterator[None]:
+        with self.__lock:
+            lock, users = self.__key_locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self.__key_locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self.__lock:
+                lock, users = self.__key_locks[key]
+                if users == 1:
+                    del self.__key_locks[key]
+                else:
+                    self.__key_locks[key] = (lock, users - 1)
+
+
+def _kind(key: Hashable) -> str:
+    return str(key[0]) if isinstance(key, tuple) and key else str(key)
@@ -0,0 +1,383 @@
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+import pandas as pd
+
+from kreuzbergml.data.postgres import AbstractPostgresDbDAO
+from kreuzbergml.instrumentation.metrics import timer
+
+logger = logging.getLogger(__name__)
+
+ScoreFunction = Callable[[pd.DataFrame], pd.DataFrame]
+
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+@dataclass
+class Shard:
+    shard_id: str
+    spec: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ShardResult:
+    shard_id: str
+    status: str
+    n_rows: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class AbstractShardSource(ABC):
+    @abstractmethod
+    def partition(self) -> List[Shard]:
+        """
+        :return: the shards of the source; shard IDs must not change between runs, so an interrupted run can be resumed
+        """
+
+    @abstractmethod
+    def read(self, shard: Shard, chunksize: int) -> Iterator[pd.DataFrame]:
+        pass
+
+    def on_worker_start(self) -> None:
+        """
+        Called in every worker process before the first shard is read.
+        """
+
+
+class AbstractShardSink(ABC):
+    @abstractmethod
+    def write(self, shard: Shard, chunks: Iterable[pd.DataFrame]) -> int:
+        """
+        Writes the output of one shard, replacing previous output of the same shard.
+        :return: number of written rows
+        """
+
+    def on_worker_start(self) -> None:
+        """
+        Called in every worker process before the first shard is written.
+        """
+
+
+class AbstractShardStateStore(ABC):
+    @abstractmethod
+    def is_done(self, shard_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    def mark_done(self, shard_id: str, n_rows: int) -> None:
+        pass
+
+
+class PostgresKeyRangeSource(AbstractShardSource):
+    """
+    Splits a table into shards of an integer key column. A shard covers the keys in
+    [k * shard_size, (k + 1) * shard_size), so its boundaries and ID do not depend on the
+    current minimum and maximum key: a run interrupted before the table grew can be resumed
+    without writing any key under a second shard ID. Only ranges containing at least one
+    key become shards, so sparse keys do not produce empty shards.
+    """
+
+    def __init__(
+        self,
+        dao: AbstractPostgresDbDAO,
+        table_name: str,
+        key_column: str,
+        shard_size: int,
+        schema: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+    ):
+        if shard_size < 1:
+            raise ValueError(f"shard_size must be positive, got {shard_size}.")
+        self.__dao = dao
+        self.__table_name = table_name
+        self.__key_column = key_column
+        self.__shard_size = shard_size
+        self.__schema = schema
+        self.__columns = columns
+
+    @property
+    def qualified_table_name(self) -> str:
+        if self.__schema:
+            return f"{self.__schema}.{self.__table_name}"
+        return self.__table_name
+
+    def partition(self) -> List[Shard]:
+        from sqlalchemy import text
+
+        sql = text(
+            f'SELECT DISTINCT floor("{self.__key_column}" / CAST(:shard_size AS numeric)) '
+            f"AS key_window FROM {self.qualified_table_name} ORDER BY key_window"
+        )
+        with self.__dao.engine.connect() as connection:
+            rows = connection.execute(sql, {"shard_size": self.__shard_size})
+            windows = [int(row[0]) for row in rows]
+        shards = []
+        for window in windows:
+            start, stop = window * self.__shard_size, (window + 1) * self.__shard_size
+            shards.append(
+                Shard(
+                    f"{self.__table_name}-{start}-{stop}",
+                    {"start": start, "stop": stop},
+                )
+            )
+        return shards
+
+    def read(self, shard: Shard, chunksize: int) -> Iterator[pd.DataFrame]:
+        columns = ", ".join(f'"{c}"' for c in self.__columns) if self.__columns else "*"
+        from sqlalchemy import text
+
+        sql = text(
+            f"SELECT {columns} FROM {self.qualified_table_name} "
+            f'WHERE "{self.__key_column}" >= :start AND "{self.__key_column}" < :stop'
+        )
+        with self.__dao.engine.connect() as connection:
+            connection = connection.execution_options(stream_results=True)
+            yield from pd.read_sql(
+                sql, con=connection, params=shard.spec, chunksize=chunksize
+            )
+
+    def on_worker_start(self) -> None:
+        # Connections inherited from the parent process must not be reused.
+        self.__dao.engine.dispose(close=False)
+
+
+class CsvFileSource(AbstractShardSource):
+    """
+    Uses every CSV file matching the given paths or glob patterns as one shard.
+    """
+
+    def __init__(self, paths: Union[str, Iterable[str]], **read_csv_kwargs: Any):
+        self.__patterns = [paths] if isinstance(paths, str) else list(paths)
+        self.__read_csv_kwargs = read_csv_kwargs
+
+    def partition(self) -> List[Shard]:
+        paths = sorted({p for pattern in self.__patterns for p in glob.glob(pattern)})
+        return [Shard(Path(path).stem, {"path": path}) for path in paths]
+
+    def read(self, shard: Shard, chunksize: int) -> Iterator[pd.DataFrame]:
+        yield from pd.read_csv(
+            shard.spec["path"], chunksize=chunksize, **self.__read_csv_kwargs
+        )
+
+
+class PostgresShardSink(AbstractShardSink):
+    """
+    Writes shard output with COPY into an existing table; see `AbstractPostgresDbDAO.replace_shard`.
+    """
+
+    def __init__(
+        self,
+        dao: AbstractPostgresDbDAO,
+        table_name: str,
+        schema: Optional[str] = None,
+        shard_column: str = "shard_id",
+    ):
+        self.__dao = dao
+        self.__table_name = table_name
+        self.__schema = schema
+        self.__shard_column = shard_column
+
+    def write(self, shard: Shard, chunks: Iterable[pd.DataFrame]) -> int:
+        return self.__dao.replace_shard(
+            chunks,
+            target_table_name=self.__table_name,
+            shard_column=self.__shard_column,
+            shard_id=shard.shard_id,
+            target_schema_name=self.__schema,
+        )
+
+    def on_worker_start(self) -> None:
+        self.__dao.engine.dispose(close=False)
+
+
+class CsvShardSink(AbstractShardSink):
+    """
+    Writes one CSV file per shard into a directory. Files are written under a temporary
+    name and renamed when complete, so a crashed shard never leaves partial output behind.
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        self.__directory = Path(directory)
+
+    @property
+    def directory(self) -> Path:
+        return self.__directory
+
+    def path(self, shard: Shard) -> Path:
+        return self.directory / f"{shard.shard_id}.csv"
+
+    def write(self, shard: Shard, chunks: Iterable[pd.DataFrame]) -> int:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self.path(shard)
+        tmp = target.with_suffix(f".{os.getpid()}.tmp")
+        cnt = 0
+        try:
+            with open(tmp, "w", newline="") as f:
+                for idx, chunk in enumerate(chunks):
+                    chunk.to_csv(f, header=idx == 0, index=False)
+                    cnt += chunk.shape[0]
+            os.replace(tmp, target)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return cnt
+
+    def merge(self, shards: List[Shard], output_path: Union[str, Path]) -> int:
+        """
+        Concatenates the output files of the given shards, in order, into one CSV file.
+        """
+        cnt = 0
+        with open(output_path, "w", newline="") as f:
+            for shard in shards:
+                path = self.path(shard)
+                if not path.exists() or path.stat().st_size == 0:
+                    continue
+                for chunk in pd.read_csv(path, chunksize=100000):
+                    chunk.to_csv(f, header=cnt == 0, index=False)
+                    cnt += chunk.shape[0]
+        return cnt
+
+
+class FileShardStateStore(AbstractShardStateStore):
+    """
+    Remembers finished shards as marker files, e.g. on a mounted blob container.
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        self.__directory = Path(directory)
+
+    def __marker(self, shard_id: str) -> Path:
+        return self.__directory / f"{shard_id}.done"
+
+    def is_done(self, shard_id: str) -> bool:
+        return self.__marker(shard_id).exists()
+
+    def mark_done(self, shard_id: str, n_rows: int) -> None:
+        self.__directory.mkdir(parents=True, exist_ok=True)
+        payload = {"shard_id": shard_id, "n_rows": n_rows, "finished_at": time.time()}
+        self.__marker(shard_id).write_text(json.dumps(payload))
+
+
+class BatchScoringJob:
+    """
+    Scores shards chunk by chunk: every chunk read from the source is passed through
+    `score_fn` and streamed to the sink, so memory is bounded by `chunksize` rows.
+    Shards already marked as done in the state store are skipped, which makes an
+    interrupted run resumable.
+    """
+
+    def __init__(
+        self,
+        source: AbstractShardSource,
+        sink: AbstractShardSink,
+        score_fn: ScoreFunction,
+        state_store: Optional[AbstractShardStateStore] = None,
+        chunksize: int = 10000,
+    ):
+        self.__source = source
+        self.__sink = sink
+        self.__score_fn = score_fn
+        self.__state_store = state_store
+        self.__chunksize = chunksize
+
+    @property
+    def source(self) -> AbstractShardSource:
+        return self.__source
+
+    @property
+    def sink(self) -> AbstractShardSink:
+        return self.__sink
+
+    def on_worker_start(self) -> None:
+        self.__source.on_worker_start()
+        self.__sink.on_worker_start()
+
+    def run_shard(self, shard: Shard) -> ShardResult:
+        if self.__state_store and self.__state_store.is_done(shard.shard_id):
+            logger.info(f"Shard '{shard.shard_id}' is already done, skipping it.")
+            return ShardResult(shard.shard_id, SKIPPED)
+        start = time.perf_counter()
+        try:
+            with timer("batch.score_shard") as operation:
+                chunks = self.__source.read(shard, self.__chunksize)
+                n_rows = self.__sink.write(shard, (self.__score_fn(c) for c in chunks))
+                operation.add(rows=n_rows)
+        except Exception as e:
+            logger.exception(f"Scoring shard '{shard.shard_id}' failed.")
+            return ShardResult(
+                shard.shard_id,
+                FAILED,
+                seconds=time.perf_counter() - start,
+                error=repr(e),
+            )
+        if self.__state_store:
+            self.__state_store.mark_done(shard.shard_id, n_rows)
+        seconds = time.perf_counter() - start
+        logger.info(
+            f"Scored {n_rows} rows of shard '{shard.shard_id}' in {seconds:.1f}s."
+        )
+        return ShardResult(shard.shard_id, DONE, n_rows=n_rows, seconds=seconds)
+
+
+class LocalShardExecutor:
+    """
+    Runs shards of a job on a pool of local processes. On Azure, every node of the
+    partitioned pipeline runs one executor on its own subset of shards, see `select_node_shards`.
+    """
+
+    def __init__(self, n_processes: int = 1, start_method: Optional[str] = None):
+        self.__n_processes = n_processes
+        if start_method is None:
+            methods = multiprocessing.get_all_start_methods()
+            start_method = "fork" if "fork" in methods else "spawn"
+        self.__start_method = start_method
+
+    def run(self, job: BatchScoringJob, shards: List[Shard]) -> List[ShardResult]:
+        if self.__n_processes <= 1 or len(shards) <= 1:
+            return [job.run_shard(shard) for shard in shards]
+        # The job is handed to the workers through the initializer, with the "fork"
+        # start method it is inherited instead of pickled.
+        with ProcessPoolExecutor(
+            max_workers=min(self.__n_processes, len(shards)),
+            mp_context=multiprocessing.get_context(self.__start_method),
+            initializer=_init_worker,
+            initargs=(job,),
+        ) as executor:
+            return list(executor.map(_run_shard, shards))
+
+
+def select_node_shards(
+    shards: List[Shard], node_index: int, node_count: int
+) -> List[Shard]:
+    """
+    :return: the shards node `node_index` of `node_count` nodes is responsible for
+    """
+    if not 0 <= node_index < node_count:
+        raise ValueError(f"node_index must be in [0, {node_count}), got {node_index}.")
+    return shards[node_index::node_count]
+
+
+_worker_job: Optional[BatchScoringJob] = None
+
+
+def _init_worker(job: BatchScoringJob) -> None:
+    global _worker_job
+    _worker_job = job
+    job.on_worker_start()
+
+
+def _run_shard(shard: Shard) -> ShardResult:
+    assert _worker_job is not None
+    return _worker_job.run_shard(shard)
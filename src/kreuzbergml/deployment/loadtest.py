@@ -0,0 +1,444 @@
+"""
+Local load testing and right-sizing of entry scripts before they are deployed.
+
+An entry script (`score.py` with `init()` and `run(raw_data)`) is served either in-process
+or by a local HTTP server subprocess whose CPU cores are restricted. An open-loop load
+generator sends requests with Poisson arrivals at a fixed rate, independently of how fast
+earlier requests complete, so a saturated server shows up as growing latency instead of a
+silently reduced request rate. `recommend_deployment_config` runs the load test for each
+candidate configuration and returns the cheapest one meeting a target p99 latency.
+
+The server can be started on its own with::
+
+    python -m kreuzbergml.deployment.loadtest --entry-script score.py --cpu-cores 1
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Payload = Union[str, Dict[str, Any]]
+
+SCORE_PATH = "/score"
+STATS_PATH = "/stats"
+
+
+@dataclass(frozen=True)
+class DeploymentConfig:
+    cpu_cores: int
+    memory_gb: float
+    vm_size: Optional[str] = None
+
+    def endpoint_kwargs(self, compute_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        :param compute_name: name of the compute target a VM configuration is deployed to, required for VM configurations
+        :return: keyword arguments of `AzureApp.create_real_time_endpoint` for this configuration
+        """
+        if self.vm_size:
+            # The endpoint is only deployed to a VM if both its name and size are given.
+            if not compute_name:
+                raise ValueError(
+                    f"A compute name is required to deploy to a {self.vm_size} VM."
+                )
+            return {
+                "deployment_target_compute_name": compute_name,
+                "deployment_target_vm_size": self.vm_size,
+            }
+        return {"aci_cpu_cores": self.cpu_cores, "aci_memory_gb": self.memory_gb}
+
+
+# Container instance configurations, cheapest first.
+DEFAULT_ACI_CONFIGS = [
+    DeploymentConfig(cpu_cores, memory_gb)
+    for cpu_cores in (1, 2, 4)
+    for memory_gb in (0.5, 1, 2, 4, 8)
+    if memory_gb >= cpu_cores * 0.5
+]
+
+# Cores and memory of the VM sizes commonly used for `deployment_target_vm_size`, cheapest first.
+DEFAULT_VM_CONFIGS = [
+    DeploymentConfig(1, 3.5, "STANDARD_DS1_V2"),
+    DeploymentConfig(2, 7, "STANDARD_DS2_V2"),
+    DeploymentConfig(2, 14, "STANDARD_DS11_V2"),
+    DeploymentConfig(4, 14, "STANDARD_DS3_V2"),
+    DeploymentConfig(4, 28, "STANDARD_DS12_V2"),
+]
+
+
+@dataclass
+class LoadTestReport:
+    n_requests: int
+    n_errors: int
+    duration_seconds: float
+    offered_rate: float
+    throughput: float
+    p50_latency_ms: float
+    p90_latency_ms: float
+    p99_latency_ms: float
+    peak_rss_bytes: int
+
+    @property
+    def error_rate(self) -> float:
+        return self.n_errors / self.n_requests if self.n_requests else 0.0
+
+
+@dataclass
+class Recommendation:
+    config: Optional[DeploymentConfig]
+    target_p99_ms: float
+    reports: Dict[DeploymentConfig, LoadTestReport] = field(default_factory=dict)
+
+
+def peak_rss_bytes() -> int:
+    """
+    :return: peak resident set size of the current process, or 0 where it cannot be measured
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def load_entry_script(entry_script: Union[str, Path]) -> ModuleType:
+    """
+    Imports the entry script as a module and calls its `init()`.
+    """
+    path = Path(entry_script).resolve()
+    spec = importlib.util.spec_from_file_location(f"_entry_script_{path.stem}", path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Cannot import entry script '{path}'.")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore[union-attr]
+    if hasattr(module, "init"):
+        module.init()
+    return module
+
+
+def limit_cpu_cores(cpu_cores: int) -> None:
+    """
+    Restricts the current process to the first `cpu_cores` CPUs it may run on.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        logger.warning("CPU affinity is not supported on this platform, not limiting.")
+        return
+    cpus = sorted(os.sched_getaffinity(0))
+    if cpu_cores > len(cpus):
+        logger.warning(
+            f"Only {len(cpus)} CPUs are available, cannot emulate {cpu_cores} cores."
+        )
+    os.sched_setaffinity(0, cpus[:cpu_cores])
+
+
+class AbstractTarget(ABC):
+    """
+    Something a load test sends payloads to.
+    """
+
+    @abstractmethod
+    def score(self, payload: str) -> None:
+        """
+        Scores a JSON payload; raises an exception if the request failed.
+        """
+
+    @abstractmethod
+    def peak_rss_bytes(self) -> int:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "AbstractTarget":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class InProcessTarget(AbstractTarget):
+    """
+    Calls the entry script's `run()` directly. Cheap to set up, but the load generator
+    shares the interpreter and the peak RSS includes the test process.
+    """
+
+    def __init__(self, entry_script: Union[str, Path]):
+        self.__module = load_entry_script(entry_script)
+
+    def score(self, payload: str) -> None:
+        self.__module.run(payload)
+
+    def peak_rss_bytes(self) -> int:
+        return peak_rss_bytes()
+
+
+class LocalHttpTarget(AbstractTarget):
+    """
+    Serves the entry script from a subprocess restricted to `cpu_cores` CPUs, similar to
+    the scoring container of a deployment. Memory is not hard-limited: address space
+    limits also count reserved but unused memory, so the peak RSS is compared with the
+    memory of a configuration instead.
+    """
+
+    def __init__(
+        self,
+        entry_script: Union[str, Path],
+        cpu_cores: Optional[int] = None,
+        startup_timeout: float = 60.0,
+        request_timeout: float = 30.0,
+    ):
+        # The port is handed over in a file: stdout belongs to the entry script, whose
+        # output is discarded so that printing on every request cannot fill a pipe.
+        self.__port_dir = tempfile.mkdtemp(prefix="kreuzbergml-loadtest-")
+        port_file = Path(self.__port_dir) / "port"
+        command = [
+            sys.executable,
+            "-m",
+            __name__,
+            "--entry-script",
+            str(Path(entry_script).resolve()),
+            "--port",
+            "0",
+            "--port-file",
+            str(port_file),
+        ]
+        env = dict(os.environ)
+        if cpu_cores:
+            command += ["--cpu-cores", str(cpu_cores)]
+            # Native thread pools would otherwise size themselves to the host.
+            for variable in (
+                "OMP_NUM_THREADS",
+                "OPENBLAS_NUM_THREADS",
+                "MKL_NUM_THREADS",
+            ):
+                env[variable] = str(cpu_cores)
+        package_root = str(Path(__file__).resolve().parents[2])
+        env["PYTHONPATH"] = os.pathsep.join(
+            p for p in (package_root, env.get("PYTHONPATH")) if p
+        )
+        self.__request_timeout = request_timeout
+        self.__process = subprocess.Popen(command, stdout=subprocess.DEVNULL, env=env)
+        try:
+            port = self.__wait_for_port(port_file, startup_timeout)
+        except BaseException:
+            self.close()
+            raise
+        self.__url = f"http://127.0.0.1:{port}"
+
+    def __wait_for_port(self, port_file: Path, timeout: float) -> int:
+        deadline = time.monotonic() + timeout
+        while not port_file.exists():
+            if self.__process.poll() is not None:
+                raise RuntimeError(
+                    f"Scoring server exited with code {self.__process.returncode} "
+                    "before it started."
+                )
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Scoring server did not start within {timeout}s.")
+            time.sleep(0.05)
+        return int(port_file.read_text())
+
+    @property
+    def url(self) -> str:
+        return self.__url
+
+    def score(self, payload: str) -> None:
+        request = urllib.request.Request(
+            self.__url + SCORE_PATH,
+            data=payload.encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(
+            request, timeout=self.__request_timeout
+        ) as response:
+            response.read()
+
+    def peak_rss_bytes(self) -> int:
+        with urllib.request.urlopen(self.__url + STATS_PATH) as response:
+            return json.loads(response.read())["peak_rss_bytes"]
+
+    def close(self) -> None:
+        if self.__process.poll() is None:
+            self.__process.terminate()
+            self.__process.wait()
+        shutil.rmtree(self.__port_dir, ignore_errors=True)
+
+
+def run_load_test(
+    target: AbstractTarget,
+    payloads: Union[Payload, Sequence[Payload]],
+    rate: float = 10.0,
+    duration_seconds: float = 10.0,
+    max_concurrency: int = 64,
+    random_state: Optional[int] = None,
+) -> LoadTestReport:
+    """
+    Sends requests with exponentially distributed inter-arrival times at `rate` requests per
+    second. Latency is measured from the scheduled arrival of a request, so time spent waiting
+    for a free client connection counts as queueing delay of the server.
+    :param payloads: JSON payload or list of payloads, used round robin
+    :param max_concurrency: maximum number of outstanding requests
+    """
+    if isinstance(payloads, (str, dict)):
+        payloads = [payloads]
+    bodies = [p if isinstance(p, str) else json.dumps(p) for p in payloads]
+    rng = np.random.default_rng(random_state)
+    n_requests = max(1, int(rate * duration_seconds))
+    arrivals = np.cumsum(rng.exponential(1.0 / rate, size=n_requests))
+    latencies = np.zeros(n_requests)
+    errors = np.zeros(n_requests, dtype=bool)
+
+    def send(i: int, scheduled_at: float) -> None:
+        try:
+            target.score(bodies[i % len(bodies)])
+        except Exception as e:
+            errors[i] = True
+            logger.debug(f"Request {i} failed: {e}")
+        latencies[i] = time.perf_counter() - scheduled_at
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for i, arrival in enumerate(arrivals):
+            scheduled_at = start + arrival
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, i, scheduled_at)
+    duration = time.perf_counter() - start
+
+    ok = latencies[~errors] * 1000.0
+    p50, p90, p99 = np.percentile(ok, [50, 90, 99]) if len(ok) else (math.nan,) * 3
+    report = LoadTestReport(
+        n_requests=n_requests,
+        n_errors=int(errors.sum()),
+        duration_seconds=duration,
+        offered_rate=rate,
+        throughput=len(ok) / duration,
+        p50_latency_ms=float(p50),
+        p90_latency_ms=float(p90),
+        p99_latency_ms=float(p99),
+        peak_rss_bytes=target.peak_rss_bytes(),
+    )
+    logger.info(
+        f"{report.n_requests} requests at {rate:.1f}/s: throughput={report.throughput:.1f}/s, "
+        f"p50={report.p50_latency_ms:.1f}ms, p99={report.p99_latency_ms:.1f}ms, "
+        f"errors={report.n_errors}, peak_rss={report.peak_rss_bytes / 2 ** 20:.0f}MiB"
+    )
+    return report
+
+
+def recommend_deployment_config(
+    entry_script: Union[str, Path],
+    payloads: Union[Payload, Sequence[Payload]],
+    target_p99_ms: float,
+    rate: float = 10.0,
+    duration_seconds: float = 10.0,
+    candidates: Optional[Sequence[DeploymentConfig]] = None,
+    max_error_rate: float = 0.0,
+    random_state: Optional[int] = 0,
+) -> Recommendation:
+    """
+    Load tests the entry script under each candidate's CPU limit, cheapest candidate first,
+    and recommends the first one whose p99 latency, error rate and peak RSS fit.
+    Candidates with the same number of cores share one load test.
+    :param candidates: configurations ordered by cost, by default `DEFAULT_ACI_CONFIGS`
+    """
+    if candidates is None:
+        candidates = DEFAULT_ACI_CONFIGS
+    recommendation = Recommendation(config=None, target_p99_ms=target_p99_ms)
+    reports_by_cores: Dict[int, LoadTestReport] = {}
+    for config in candidates:
+        report = reports_by_cores.get(config.cpu_cores)
+        if report is None:
+            with LocalHttpTarget(entry_script, cpu_cores=config.cpu_cores) as target:
+                report = run_load_test(
+                    target, payloads, rate, duration_seconds, random_state=random_state
+                )
+            reports_by_cores[config.cpu_cores] = report
+        recommendation.reports[config] = report
+        fits_latency = report.p99_latency_ms <= target_p99_ms
+        fits_memory = report.peak_rss_bytes <= config.memory_gb * 2**30
+        if fits_latency and fits_memory and report.error_rate <= max_error_rate:
+            recommendation.config = config
+            logger.info(f"Recommended deployment configuration: {config}.")
+            return recommendation
+    logger.warning(f"No candidate configuration meets p99 <= {target_p99_ms}ms.")
+    return recommendation
+
+
+def serve(
+    entry_script: Union[str, Path],
+    port: int = 0,
+    port_file: Optional[Union[str, Path]] = None,
+) -> None:
+    """
+    Serves the entry script on `POST /score` and its peak RSS on `GET /stats`. Once the
+    server is ready, its port is written to `port_file` or, if not given, printed.
+    """
+    module = load_entry_script(entry_script)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                result = module.run(body.decode())
+                self.__respond(200, json.dumps(result, default=str))
+            except Exception as e:
+                self.__respond(500, json.dumps({"error": str(e)}))
+
+        def do_GET(self) -> None:
+            self.__respond(200, json.dumps({"peak_rss_bytes": peak_rss_bytes()}))
+
+        def __respond(self, status: int, body: str) -> None:
+            data = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    if port_file is None:
+        print(server.server_address[1], flush=True)
+    else:
+        # Written under a temporary name, so a reader never sees a partial port.
+        tmp = Path(f"{port_file}.tmp")
+        tmp.write_text(str(server.server_address[1]))
+        os.replace(tmp, port_file)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve an entry script locally.")
+    parser.add_argument("--entry-script", required=True)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--port-file", default=None)
+    parser.add_argument("--cpu-cores", type=int, default=None)
+    args = parser.parse_args()
+    if args.cpu_cores:
+        limit_cpu_cores(args.cpu_cores)
+    serve(args.entry_script, args.port, args.port_file)
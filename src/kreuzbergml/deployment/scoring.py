@@ -0,0 +1,282 @@
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from kreuzbergml.instrumentation.metrics import timer
+
+logger = logging.getLogger(__name__)
+
+PredictFunction = Callable[[Any], Any]
+
+
+@dataclass
+class ScoringMetrics:
+    n_requests: int
+    n_batches: int
+    p50_latency_ms: float
+    p99_latency_ms: float
+    mean_batch_size: float
+    max_batch_size: int
+
+
+@dataclass
+class _Request:
+    rows: Any
+    n_rows: int
+    future: Future
+    arrived_at: float
+
+
+class MicroBatchScorer:
+    """
+    Coalesces concurrent scoring requests into micro-batches and runs one vectorized
+    `predict` call per batch. A batch is closed when it holds `max_batch_size` rows or
+    `max_wait_ms` milliseconds after its first request arrived, whichever comes first.
+
+    Typical usage in an entry script::
+
+        def init():
+            global scorer
+            scorer = MicroBatchScorer(joblib.load(model_path).predict).start()
+
+        def run(raw_data):
+            return scorer.run_json(raw_data)
+    """
+
+    def __init__(
+        self,
+        predict_fn: PredictFunction,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        metrics_window: int = 10000,
+    ):
+        """
+        :param predict_fn: vectorized prediction function, e.g. `model.predict`
+        :param max_batch_size: maximum number of rows per batch; larger requests are scored alone
+        :param max_wait_ms: latency budget a request may wait for other requests to join its batch
+        :param metrics_window: number of most recent requests and batches the metrics are computed on
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.__predict_fn = predict_fn
+        self.__max_batch_size = max_batch_size
+        self.__max_wait = max_wait_ms / 1000.0
+        self.__queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self.__thread: Optional[threading.Thread] = None
+        self.__lock = threading.Lock()
+        self.__submit_lock = threading.Lock()
+        self.__stopping = False
+        self.__latencies: Deque[float] = deque(maxlen=metrics_window)
+        self.__batch_sizes: Deque[int] = deque(maxlen=metrics_window)
+        self.__n_requests = 0
+        self.__n_batches = 0
+        self.__carry: Optional[_Request] = None
+
+    @property
+    def max_batch_size(self) -> int:
+        return self.__max_batch_size
+
+    @property
+    def running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self) -> "MicroBatchScorer":
+        with self.__submit_lock:
+            if not self.running:
+                self.__stopping = False
+                self.__thread = threading.Thread(
+                    target=self.__serve, name="MicroBatchScorer", daemon=True
+                )
+                self.__thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Scores all requests submitted so far and stops the batching thread. Requests
+        submitted once stopping has begun are rejected.
+        """
+        with self.__submit_lock:
+            thread = self.__thread
+            if thread is None or self.__stopping:
+                return
+            self.__stopping = True
+            if thread.is_alive():
+                self.__queue.put(None)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning("The batching thread did not stop within the timeout.")
+            return
+        self.__fail_queued(RuntimeError("The scorer was stopped."))
+        with self.__submit_lock:
+            self.__thread = None
+
+    def __enter__(self) -> "MicroBatchScorer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def submit(self, rows: Any) -> Future:
+        """
+        :param rows: 2D array-like or DataFrame with one or more rows to score
+        :return: future resolving to the predictions for these rows
+        """
+        request = _Request(rows, _n_rows(rows), Future(), time.perf_counter())
+        # Requests are queued under the lock, so none can follow the stop sentinel.
+        with self.__submit_lock:
+            if not self.running or self.__stopping:
+                raise RuntimeError("The scorer is not running, call start() first.")
+            self.__queue.put(request)
+        return request.future
+
+    def predict(self, rows: Any, timeout: Optional[float] = None) -> Any:
+        return self.submit(rows).result(timeout)
+
+    def run_json(self, raw_data: str, timeout: Optional[float] = None) -> List[Any]:
+        """
+        Scores a JSON payload of the form `{"data": [[...], ...]}` or `{"data": [{...}, ...]}`,
+        as sent to Azure ML real-time endpoints. Records are converted to a DataFrame.
+        """
+        data = json.loads(raw_data)["data"]
+        rows = pd.DataFrame(data) if data and isinstance(data[0], dict) else data
+        predictions = self.predict(rows, timeout)
+        return np.asarray(predictions).tolist()
+
+    def metrics(self) -> ScoringMetrics:
+        with self.__lock:
+            latencies = np.array(self.__latencies)
+            batch_sizes = np.array(self.__batch_sizes)
+            n_requests, n_batches = self.__n_requests, self.__n_batches
+        return ScoringMetrics(
+            n_requests=n_requests,
+            n_batches=n_batches,
+            p50_latency_ms=_percentile_ms(latencies, 50),
+            p99_latency_ms=_percentile_ms(latencies, 99),
+            mean_batch_size=float(batch_sizes.mean()) if batch_sizes.size else 0.0,
+            max_batch_size=int(batch_sizes.max()) if batch_sizes.size else 0,
+        )
+
+    def __fail_queued(self, error: Exception) -> None:
+        requests: List[Optional[_Request]] = [self.__carry]
+        self.__carry = None
+        while True:
+            try:
+                requests.append(self.__queue.get_nowait())
+            except queue.Empty:
+                break
+        for request in requests:
+            if request is not None and request.future.set_running_or_notify_cancel():
+                request.future.set_exception(error)
+
+    def __serve(self) -> None:
+        while True:
+            batch, stop = self.__next_batch()
+            if batch:
+                self.__score(batch)
+            if stop:
+                break
+
+    def __next_batch(self) -> Tuple[List[_Request], bool]:
+        first = self.__carry or self.__queue.get()
+        self.__carry = None
+        if first is None:
+            return [], True
+        batch = [first]
+        n_rows = first.n_rows
+        deadline = first.arrived_at + self.__max_wait
+        while n_rows < self.__max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = (
+                    self.__queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self.__queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            if n_rows + request.n_rows > self.__max_batch_size:
+                self.__carry = request
+                break
+            batch.append(request)
+            n_rows += request.n_rows
+        return batch, False
+
+    def __score(self, batch: List[_Request]) -> None:
+        # Cancelled requests are dropped; the others can no longer be cancelled.
+        batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+        if len(batch) > 1:
+            try:
+                results = self.__predict(batch)
+            except Exception:
+                # E.g. one request with a wrong number of features, which must not
+                # fail the requests batched with it.
+                logger.warning(
+                    f"Scoring a batch of {len(batch)} requests failed, "
+                    "scoring them one at a time.",
+                    exc_info=True,
+                )
+            else:
+                self.__complete(batch, results)
+                return
+        for request in batch:
+            try:
+                results = self.__predict([request])
+            except Exception as e:
+                logger.exception("Scoring a request failed.")
+                request.future.set_exception(e)
+            else:
+                self.__complete([request], results)
+
+    def __predict(self, batch: List[_Request]) -> List[Any]:
+        with timer("scoring.predict_batch") as operation:
+            predictions = self.__predict_fn(_concat([r.rows for r in batch]))
+            operation.add(rows=sum(r.n_rows for r in batch))
+        offset = 0
+        results = []
+        for request in batch:
+            results.append(_slice(predictions, offset, offset + request.n_rows))
+            offset += request.n_rows
+        return results
+
+    def __complete(self, batch: List[_Request], results: List[Any]) -> None:
+        finished_at = time.perf_counter()
+        with self.__lock:
+            self.__n_requests += len(batch)
+            self.__n_batches += 1
+            self.__batch_sizes.append(sum(r.n_rows for r in batch))
+            self.__latencies.extend(finished_at - r.arrived_at for r in batch)
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+
+
+def _n_rows(rows: Any) -> int:
+    if isinstance(rows, pd.DataFrame):
+        return len(rows)
+    return len(np.atleast_2d(np.asarray(rows)))
+
+
+def _concat(batch: List[Any]) -> Any:
+    if all(isinstance(rows, pd.DataFrame) for rows in batch):
+        return pd.concat(batch, ignore_index=True) if len(batch) > 1 else batch[0]
+    return np.concatenate([np.atleast_2d(np.asarray(rows)) for rows in batch])
+
+
+def _slice(predictions: Any, start: int, stop: int) -> Any:
+    if isinstance(predictions, (pd.DataFrame, pd.Series)):
+        return predictions.iloc[start:stop]
+    return np.asarray(predictions)[start:stop]
+
+
+def _percentile_ms(values: np.ndarray, q: float) -> float:
+    return float(np.percentile(values, q) * 1000.0) if values.size else 0.0
@@ -0,0 +1,165 @@
+"""
+Import-time benchmark and budget of kreuzbergml modules.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, which reports
+the cumulative import time of every module, and the top-level packages loaded by the
+import are recorded. A budget limits the import time of a module and lists packages it
+must not load, e.g. scikit-learn or the azureml SDK, which are imported on first use.
+Run the benchmark with::
+
+    python -m kreuzbergml.import_time
+"""
+
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prints the top-level packages loaded after importing the module given as argument.
+# `__import__` is used because `-X importtime` does not time `importlib.import_module`.
+_IMPORT_SCRIPT = """
+import json, sys
+__import__(sys.argv[1])
+print(json.dumps(sorted({name.split(".")[0] for name in sys.modules})))
+"""
+
+
+@dataclass
+class ImportBudget:
+    module: str
+    max_seconds: float
+    forbidden_packages: Tuple[str, ...] = ()
+
+
+@dataclass
+class ImportTimeResult:
+    module: str
+    seconds: float
+    loaded_packages: List[str]
+    heaviest_imports: List[Tuple[str, float]] = field(default_factory=list)
+
+    def violations(self, budget: ImportBudget) -> List[str]:
+        violations = [
+            f"{self.module} loads {package}"
+            for package in budget.forbidden_packages
+            if package in self.loaded_packages
+        ]
+        if self.seconds > budget.max_seconds:
+            violations.append(
+                f"{self.module} takes {self.seconds:.3f}s to import, "
+                f"budget is {budget.max_seconds:.3f}s"
+            )
+        return violations
+
+
+DEFAULT_IMPORT_BUDGETS = [
+    ImportBudget("kreuzbergml.model.param_factory", 1.0, ("sklearn",)),
+    ImportBudget("kreuzbergml.model.optimizer", 1.0, ("sklearn",)),
+    ImportBudget("kreuzbergml.model.scheduler", 1.0, ("sklearn",)),
+    ImportBudget("kreuzbergml.model.artifact", 1.0, ("sklearn", "joblib")),
+    ImportBudget(
+        "kreuzbergml.deployment.azure.app", 1.0, ("azureml", "sklearn", "joblib")
+    ),
+    ImportBudget(
+        "kreuzbergml.deployment.azure.database", 1.0, ("azureml", "sqlalchemy")
+    ),
+    ImportBudget("kreuzbergml.deployment.scoring", 2.0, ("sklearn", "sqlalchemy")),
+    ImportBudget("kreuzbergml.data.postgres", 2.0, ("sqlalchemy",)),
+    ImportBudget("kreuzbergml.deployment.batch", 2.0, ("sklearn", "sqlalchemy")),
+]
+
+
+def measure_import_time(
+    module: str, repeat: int = 3, n_heaviest: int = 5
+) -> ImportTimeResult:
+    """
+    :param repeat: number of fresh interpreters the module is imported in, the median time is reported
+    :param n_heaviest: number of top-level dependencies with the largest import time to report
+    """
+    env = dict(os.environ)
+    package_root = str(Path(__file__).resolve().parents[1])
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (package_root, env.get("PYTHONPATH")) if p
+    )
+    timings = []
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _IMPORT_SCRIPT, module],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        timings.append(_parse_import_times(completed.stderr))
+    loaded_packages = json.loads(completed.stdout.strip().splitlines()[-1])
+    last = timings[-1]
+    top_level = [
+        (name, seconds)
+        for name, seconds in last.items()
+        if "." not in name and name != module.split(".")[0]
+    ]
+    return ImportTimeResult(
+        module=module,
+        seconds=statistics.median(t[module] for t in timings),
+        loaded_packages=loaded_packages,
+        heaviest_imports=sorted(top_level, key=lambda x: -x[1])[:n_heaviest],
+    )
+
+
+def check_import_budgets(
+    budgets: Iterable[ImportBudget] = DEFAULT_IMPORT_BUDGETS, repeat: int = 3
+) -> List[str]:
+    """
+    :return: budget violations, empty if all modules are within their budget
+    """
+    violations = []
+    for budget in budgets:
+        result = measure_import_time(budget.module, repeat=repeat)
+        heaviest = ", ".join(
+            f"{n} {s * 1000:.0f}ms" for n, s in result.heaviest_imports
+        )
+        logger.info(
+            f"{result.module}: {result.seconds * 1000:.0f}ms "
+            f"(budget {budget.max_seconds * 1000:.0f}ms), heaviest imports: {heaviest}"
+        )
+        violations.extend(result.violations(budget))
+    return violations
+
+
+def _parse_import_times(stderr: str) -> Dict[str, float]:
+    """
+    :return: cumulative import time in seconds by module name, from `-X importtime` output
+    """
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line.split(":", 1)[1].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        times[parts[2].strip()] = int(parts[1]) / 1e6
+    return times
+
+
+def _print_report(budgets: Sequence[ImportBudget]) -> None:
+    for budget in budgets:
+        result = measure_import_time(budget.module)
+        status = "OK" if not result.violations(budget) else "OVER BUDGET"
+        heaviest = ", ".join(
+            f"{n} {s * 1000:.0f}ms" for n, s in result.heaviest_imports
+        )
+        print(
+            f"{result.module:45s} {result.seconds * 1000:7.0f}ms "
+            f"/ {budget.max_seconds * 1000:5.0f}ms  {status:11s} {heaviest}"
+        )
+
+
+if __name__ == "__main__":
+    _print_report(DEFAULT_IMPORT_BUDGETS)
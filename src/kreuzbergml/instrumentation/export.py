@@ -0,0 +1,124 @@
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from .metrics import MetricsRegistry, get_registry
+
+PROMETHEUS_PREFIX = "kreuzbergml"
+PROMETHEUS = "prometheus"
+JSON = "json"
+
+
+def to_dict(registry: Optional[MetricsRegistry] = None) -> Dict[str, Any]:
+    registry = registry or get_registry()
+    operations = {}
+    for name, stats in sorted(registry.operations().items()):
+        histogram = stats.seconds
+        operations[name] = {
+            "count": histogram.count,
+            "errors": stats.errors,
+            "seconds_total": histogram.total,
+            "seconds_mean": (
+                histogram.total / histogram.count if histogram.count else 0.0
+            ),
+            "seconds_buckets": dict(
+                zip(
+                    [str(b) for b in histogram.buckets] + ["+Inf"],
+                    histogram.cumulative_counts(),
+                )
+            ),
+            "rows": stats.rows,
+            "bytes": stats.bytes,
+            "peak_memory_bytes": stats.peak_memory_bytes,
+        }
+    return {
+        "operations": operations,
+        "counters": dict(sorted(registry.counters().items())),
+    }
+
+
+def to_json(registry: Optional[MetricsRegistry] = None) -> str:
+    return json.dumps(to_dict(registry), indent=2)
+
+
+def to_prometheus_text(registry: Optional[MetricsRegistry] = None) -> str:
+    """
+    :return: metrics in the Prometheus text exposition format, the operation name is the `operation` label
+    """
+    registry = registry or get_registry()
+    operations = sorted(registry.operations().items())
+    seconds = f"{PROMETHEUS_PREFIX}_operation_seconds"
+    lines = [f"# TYPE {seconds} histogram"]
+    for name, stats in operations:
+        histogram = stats.seconds
+        bounds = [_format_value(b) for b in histogram.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, histogram.cumulative_counts()):
+            lines.append(f"{seconds}_bucket{{{_labels(name, le=bound)}}} {count}")
+        lines.append(
+            f"{seconds}_sum{{{_labels(name)}}} {_format_value(histogram.total)}"
+        )
+        lines.append(f"{seconds}_count{{{_labels(name)}}} {histogram.count}")
+    for metric, attribute, kind in (
+        ("operation_errors_total", "errors", "counter"),
+        ("operation_rows_total", "rows", "counter"),
+        ("operation_bytes_total", "bytes", "counter"),
+        ("operation_peak_memory_bytes", "peak_memory_bytes", "gauge"),
+    ):
+        samples = [
+            f"{PROMETHEUS_PREFIX}_{metric}{{{_labels(name)}}} {getattr(stats, attribute)}"
+            for name, stats in operations
+            if getattr(stats, attribute) is not None
+        ]
+        if samples:
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{metric} {kind}")
+            lines.extend(samples)
+    counters = sorted(registry.counters().items())
+    if counters:
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_events_total counter")
+        lines.extend(
+            f'{PROMETHEUS_PREFIX}_events_total{{event="{_escape(name)}"}} {_format_value(value)}'
+            for name, value in counters
+        )
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(
+    path: Union[str, Path],
+    format: str = PROMETHEUS,
+    registry: Optional[MetricsRegistry] = None,
+) -> Path:
+    """
+    Writes the metrics atomically, e.g. into the directory of the node exporter's textfile
+    collector, which expects the extension `.prom`.
+    :param format: "prometheus" or "json"
+    """
+    if format == PROMETHEUS:
+        text = to_prometheus_text(registry)
+    elif format == JSON:
+        text = to_json(registry)
+    else:
+        raise ValueError(f"Unknown metrics format '{format}'.")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _labels(operation: str, **labels: str) -> str:
+    pairs: List[str] = [f'operation="{_escape(operation)}"']
+    pairs.extend(f'{key}="{value}"' for key, value in labels.items())
+    return ",".join(pairs)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
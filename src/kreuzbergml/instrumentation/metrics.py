@@ -0,0 +1,320 @@
+"""
+Timers, counters and histograms of library operations.
+
+Instrumentation is disabled by default; a disabled `timer` returns a shared no-op context
+manager, so instrumented code pays about one function call. Enable it with `enable()` or
+by setting the environment variable `KREUZBERGML_METRICS=1`, then export the collected
+metrics with `kreuzbergml.instrumentation.export`.
+
+    with timer("postgres.copy") as operation:
+        ...
+        operation.add(rows=len(df), bytes=n_bytes)
+
+Metrics are collected per process; operations running in worker processes are recorded
+in the registry of that process.
+"""
+
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar, cast
+
+logger = logging.getLogger(__name__)
+
+ENABLE_ENVIRONMENT_VARIABLE = "KREUZBERGML_METRICS"
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0, 300.0)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass
+class Histogram:
+    buckets: Sequence[float] = DEFAULT_BUCKETS
+    counts: List[int] = field(default_factory=list)
+    total: float = 0.0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        if not self.counts:
+            # The last count is the +Inf bucket.
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative_counts(self) -> List[int]:
+        cumulative, running = [], 0
+        for count in self.counts:
+            running += count
+            cumulative.append(running)
+        return cumulative
+
+
+@dataclass
+class OperationStats:
+    seconds: Histogram = field(default_factory=Histogram)
+    errors: int = 0
+    rows: int = 0
+    bytes: int = 0
+    peak_memory_bytes: Optional[int] = None
+
+
+class Operation:
+    """
+    Context manager of a timed operation; rows and bytes processed are added with `add`.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.bytes = 0
+
+    def __enter__(self) -> "Operation":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+    def add(self, rows: int = 0, bytes: int = 0) -> None:
+        self.rows += rows
+        self.bytes += bytes
+
+
+class _NoOpOperation(Operation):
+    def add(self, rows: int = 0, bytes: int = 0) -> None:
+        pass
+
+
+_NO_OP = _NoOpOperation("no-op")
+
+
+class _TimedOperation(Operation):
+    def __init__(self, registry: "MetricsRegistry", name: str):
+        super().__init__(name)
+        self.__registry = registry
+        self.__start = 0.0
+        self.__profile: Optional[_ReleasingProfile] = None
+
+    def __enter__(self) -> "Operation":
+        self.__registry._enter_memory_scope()
+        self.__profile = self.__registry._start_profile(self.name)
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        seconds = time.perf_counter() - self.__start
+        if self.__profile is not None:
+            self.__profile.__exit__(exc_type, *exc_info)
+        peak = self.__registry._exit_memory_scope()
+        self.__registry.record(
+            self.name,
+            seconds,
+            rows=self.rows,
+            bytes=self.bytes,
+            error=exc_type is not None,
+            peak_memory_bytes=peak,
+        )
+
+
+class MetricsRegistry:
+    def __init__(
+        self, enabled: bool = False, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.enabled = enabled
+        self.__buckets = buckets
+        self.__operations: Dict[str, OperationStats] = {}
+        self.__counters: Dict[str, float] = {}
+        self.__lock = threading.Lock()
+        self.__track_memory = False
+        self.__memory_scopes = threading.local()
+        self.__profiled: Dict[str, Optional[str]] = {}
+        self.__profiling = threading.Lock()
+
+    @property
+    def track_memory(self) -> bool:
+        return self.__track_memory
+
+    def enable(self, track_memory: bool = False) -> None:
+        """
+        :param track_memory: if True, the peak of memory allocated during each operation is recorded with tracemalloc, which slows down allocations considerably. With concurrent operations, the peak includes allocations of other threads.
+        """
+        self.enabled = True
+        self.__track_memory = track_memory
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self.__track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.__track_memory = False
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__operations.clear()
+            self.__counters.clear()
+
+    def profile(self, name: str, output_dir: Optional[str] = None) -> None:
+        """
+        Profiles every run of the named operation with cProfile, see `OperationProfile`.
+        Runs overlapping with another profiled run are not profiled.
+        """
+        self.__profiled[name] = output_dir
+
+    def timer(self, name: str) -> Operation:
+        if not self.enabled:
+            return _NO_OP
+        return _TimedOperation(self, name)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def record(
+        self,
+        name: str,
+        seconds: float,
+        rows: int = 0,
+        bytes: int = 0,
+        error: bool = False,
+        peak_memory_bytes: Optional[int] = None,
+    ) -> None:
+        with self.__lock:
+            stats = self.__operations.get(name)
+            if stats is None:
+                stats = OperationStats(seconds=Histogram(self.__buckets))
+                self.__operations[name] = stats
+            stats.seconds.observe(seconds)
+            stats.rows += rows
+            stats.bytes += bytes
+            stats.errors += int(error)
+            if peak_memory_bytes is not None:
+                stats.peak_memory_bytes = max(
+                    stats.peak_memory_bytes or 0, peak_memory_bytes
+                )
+
+    def operations(self) -> Dict[str, OperationStats]:
+        with self.__lock:
+            return dict(self.__operations)
+
+    def counters(self) -> Dict[str, float]:
+        with self.__lock:
+            return dict(self.__counters)
+
+    def _start_profile(self, name: str) -> Optional["_ReleasingProfile"]:
+        if name not in self.__profiled or not self.__profiling.acquire(blocking=False):
+            return None
+        from .profiling import OperationProfile
+
+        profile = OperationProfile(name, self.__profiled[name])
+        try:
+            profile.__enter__()
+        except ValueError as e:
+            # Raised if another profiler, e.g. of the caller, is active.
+            self.__profiling.release()
+            logger.warning(f"Cannot profile '{name}': {e}")
+            return None
+        # Only one profiler can run at a time, the lock is released with the profiler.
+        return _ReleasingProfile(profile, self.__profiling)
+
+    def _enter_memory_scope(self) -> None:
+        if not self.__track_memory:
+            return
+        stack = self.__memory_stack()
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        stack.append([current, 0])
+        if hasattr(tracemalloc, "reset_peak"):
+            # Python 3.8 has no reset_peak, the peak then covers all earlier allocations.
+            tracemalloc.reset_peak()
+
+    def _exit_memory_scope(self) -> Optional[int]:
+        if not self.__track_memory:
+            return None
+        stack = self.__memory_stack()
+        if not stack:
+            return None
+        start, child_peak = stack.pop()
+        peak = max(tracemalloc.get_traced_memory()[1], child_peak)
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        return max(0, peak - start)
+
+    def __memory_stack(self) -> List[List[int]]:
+        stack = getattr(self.__memory_scopes, "stack", None)
+        if stack is None:
+            stack = self.__memory_scopes.stack = []
+        return stack
+
+
+class _ReleasingProfile:
+    def __init__(self, profile: Any, lock: threading.Lock):
+        self.__profile = profile
+        self.__lock = lock
+
+    def __exit__(self, *exc_info: Any) -> None:
+        try:
+            self.__profile.__exit__(*exc_info)
+        finally:
+            self.__lock.release()
+
+
+_registry = MetricsRegistry(enabled=os.environ.get(ENABLE_ENVIRONMENT_VARIABLE) == "1")
+
+
+def get_registry() -> MetricsRegistry:
+    return _registry
+
+
+def enable(track_memory: bool = False) -> None:
+    _registry.enable(track_memory)
+
+
+def disable() -> None:
+    _registry.disable()
+
+
+def is_enabled() -> bool:
+    return _registry.enabled
+
+
+def timer(name: str) -> Operation:
+    """
+    :return: context manager timing the named operation, a no-op while instrumentation is disabled
+    """
+    if not _registry.enabled:
+        return _NO_OP
+    return _TimedOperation(_registry, name)
+
+
+def increment(name: str, value: float = 1) -> None:
+    if _registry.enabled:
+        _registry.increment(name, value)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """
+    Decorator timing every call of the function as the named operation.
+    """
+
+    def decorator(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _registry.enabled:
+                return fn(*args, **kwargs)
+            with _TimedOperation(_registry, name):
+                return fn(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorator
@@ -0,0 +1,53 @@
+import cProfile
+import io
+import logging
+import pstats
+import time
+from pathlib import Path
+from typing import Any, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class OperationProfile:
+    """
+    Context manager profiling a single operation with cProfile. The top functions are
+    logged at DEBUG level and, if `output_dir` is given, the statistics are saved as
+    `<name>-<timestamp>.prof`, e.g. for `snakeviz` or `python -m pstats`. Operations
+    timed with `kreuzbergml.instrumentation.metrics` are profiled on every run after
+    `get_registry().profile(name)`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        output_dir: Optional[Union[str, Path]] = None,
+        sort: str = "cumulative",
+        limit: int = 25,
+    ):
+        self.name = name
+        self.__output_dir = Path(output_dir) if output_dir is not None else None
+        self.__sort = sort
+        self.__limit = limit
+        self.__profiler = cProfile.Profile()
+        self.path: Optional[Path] = None
+
+    def __enter__(self) -> "OperationProfile":
+        self.__profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.__profiler.disable()
+        if self.__output_dir is not None:
+            self.__output_dir.mkdir(parents=True, exist_ok=True)
+            self.path = self.__output_dir / f"{self.name}-{time.time_ns()}.prof"
+            self.__profiler.dump_stats(self.path)
+            logger.info(f"Saved profile of '{self.name}' to '{self.path}'.")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Profile of '{self.name}':\n{self.report()}")
+
+    def report(self) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(self.__profiler, stream=stream)
+        stats.sort_stats(self.__sort).print_stats(self.__limit)
+        return stream.getvalue()
@@ -0,0 +1,536 @@
+"""
+Model artifacts whose NumPy arrays are memory-mapped on load.
+
+`save_model_artifact` pickles the model with every numeric NumPy array written to an
+aligned position in a separate arrays file, plus a manifest. With `load_model_artifact`
+the arrays file is mapped read-only and the arrays are views of it instead of copies:
+loading takes milliseconds and scoring processes on one host share the mapped pages.
+
+scikit-learn's `Tree` copies its node and value arrays into its own buffers when it is
+unpickled, so the trees of tree and forest models are loaded as `MappedTree` instead,
+which predicts from the mapped arrays. Gradient boosting keeps regular, copied trees,
+as it predicts in compiled code. `benchmark_artifact_load` shows the effect per model class.
+"""
+
+import json
+import logging
+import math
+import os
+import pickle
+import subprocess
+import sys
+import warnings
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+
+import numpy as np
+
+from .benchmark import get_all_factories, installed_sklearn_version, qualified_name
+from .param_factory import AbstractGridSearchParamsFactory
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT_VERSION = 2
+MANIFEST_FILE_NAME = "manifest.json"
+MODEL_FILE_NAME = "model.pkl"
+ARRAYS_FILE_NAME = "arrays.bin"
+DEFAULT_ARTIFACT_NAME = "model"
+
+# Arrays start at multiples of a cache line in the arrays file.
+_ARRAY_ALIGNMENT = 64
+# Value of `children_left` at leaf nodes, see `sklearn.tree._tree.TREE_LEAF`.
+_TREE_LEAF = -1
+
+
+@dataclass
+class ArtifactManifest:
+    model_class: str
+    format_version: int = ARTIFACT_FORMAT_VERSION
+    sklearn_version: str = field(default_factory=installed_sklearn_version)
+    model_file: str = MODEL_FILE_NAME
+    arrays_file: str = ARRAYS_FILE_NAME
+    created_at: str = field(
+        default_factory=lambda: datetime.now(timezone.utc).isoformat()
+    )
+
+
+@dataclass
+class ArtifactLoadRecord:
+    model_class: str
+    artifact_format: str
+    artifact_bytes: int
+    load_seconds: float
+    rss_bytes: int
+    private_bytes: int
+
+
+class MappedTree:
+    """
+    Read-only stand-in for scikit-learn's `Tree` which predicts from the node and value
+    arrays of a model artifact without copying them. Supports what the tree and forest
+    estimators use for predictions and feature importances; pickling it gives a regular `Tree`.
+    """
+
+    def __init__(
+        self,
+        n_features: int,
+        n_classes: np.ndarray,
+        n_outputs: int,
+        state: Dict[str, Any],
+    ):
+        """
+        :param n_features: `n_features` of the original tree
+        :param n_classes: `n_classes` of the original tree
+        :param n_outputs: `n_outputs` of the original tree
+        :param state: state of the original tree, see `Tree.__getstate__`
+        """
+        self.__n_features = n_features
+        self.__n_classes = n_classes
+        self.__n_outputs = n_outputs
+        self.__state = state
+        self.__nodes = state["nodes"]
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        from sklearn.tree._tree import Tree
+
+        state = {
+            k: np.asarray(v) if isinstance(v, np.ndarray) else v
+            for k, v in self.__state.items()
+        }
+        return (
+            Tree,
+            (self.__n_features, np.asarray(self.__n_classes), self.__n_outputs),
+            state,
+        )
+
+    @property
+    def n_features(self) -> int:
+        return self.__n_features
+
+    @property
+    def n_classes(self) -> np.ndarray:
+        return self.__n_classes
+
+    @property
+    def n_outputs(self) -> int:
+        return self.__n_outputs
+
+    @property
+    def max_n_classes(self) -> int:
+        return int(np.max(self.__n_classes))
+
+    @property
+    def max_depth(self) -> int:
+        return self.__state["max_depth"]
+
+    @property
+    def node_count(self) -> int:
+        return self.__state["node_count"]
+
+    @property
+    def capacity(self) -> int:
+        return self.node_count
+
+    @property
+    def n_leaves(self) -> int:
+        return int(np.count_nonzero(self.children_left == _TREE_LEAF))
+
+    @property
+    def children_left(self) -> np.ndarray:
+        return self.__nodes["left_child"]
+
+    @property
+    def children_right(self) -> np.ndarray:
+        return self.__nodes["right_child"]
+
+    @property
+    def feature(self) -> np.ndarray:
+        return self.__nodes["feature"]
+
+    @property
+    def threshold(self) -> np.ndarray:
+        return self.__nodes["threshold"]
+
+    @property
+    def impurity(self) -> np.ndarray:
+        return self.__nodes["impurity"]
+
+    @property
+    def n_node_samples(self) -> np.ndarray:
+        return self.__nodes["n_node_samples"]
+
+    @property
+    def weighted_n_node_samples(self) -> np.ndarray:
+        return self.__nodes["weighted_n_node_samples"]
+
+    @property
+    def missing_go_to_left(self) -> Optional[np.ndarray]:
+        if "missing_go_to_left" not in self.__nodes.dtype.names:
+            return None
+        return self.__nodes["missing_go_to_left"]
+
+    @property
+    def value(self) -> np.ndarray:
+        return self.__state["values"]
+
+    def apply(self, X: Any) -> np.ndarray:
+        """
+        :return: index of the leaf each sample ends up in
+        """
+        return self.__paths(X)[0]
+
+    def predict(self, X: Any) -> np.ndarray:
+        X = _dense(X)
+        out = self.value.take(self.apply(X), axis=0, mode="clip")
+        if self.n_outputs == 1:
+            out = out.reshape(X.shape[0], self.max_n_classes)
+        return out
+
+    def decision_path(self, X: Any) -> Any:
+        """
+        :return: CSR matrix of shape (n_samples, node_count), nonzero at the nodes each sample passes
+        """
+        from scipy.sparse import csr_matrix
+
+        X = _dense(X)
+        _, rows, nodes = self.__paths(X)
+        order = np.lexsort((nodes, rows))
+        indptr = np.zeros(X.shape[0] + 1, dtype=np.intp)
+        np.cumsum(np.bincount(rows, minlength=X.shape[0]), out=indptr[1:])
+        return csr_matrix(
+            (np.ones(len(rows), dtype=np.intp), nodes[order], indptr),
+            shape=(X.shape[0], self.node_count),
+        )
+
+    def compute_feature_importances(self, normalize: bool = True) -> np.ndarray:
+        left, right = self.children_left, self.children_right
+        split = np.flatnonzero(left != _TREE_LEAF)
+        weighted_impurity = self.weighted_n_node_samples * self.impurity
+        children_impurity = (
+            weighted_impurity[left[split]] + weighted_impurity[right[split]]
+        )
+        decrease = weighted_impurity[split] - children_impurity
+        importances = np.zeros(self.n_features)
+        np.add.at(importances, self.feature[split], decrease)
+        importances /= self.weighted_n_node_samples[0]
+        if normalize:
+            total = importances.sum()
+            if total > 0.0:
+                importances /= total
+        return importances
+
+    def compute_node_depths(self) -> np.ndarray:
+        """
+        :return: depth of each node, 1 at the root
+        """
+        left, right = self.children_left, self.children_right
+        depths = np.zeros(self.node_count, dtype=np.int64)
+        level, depth = np.zeros(1, dtype=np.intp), 1
+        while level.size:
+            depths[level] = depth
+            split = level[left[level] != _TREE_LEAF]
+            level, depth = np.concatenate((left[split], right[split])), depth + 1
+        return depths
+
+    def __paths(self, X: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Moves all samples down the tree one level at a time, sending a sample left if its
+        feature value is at most the node's threshold, as `Tree.apply` does.
+
+        :return: leaf of each sample, and the (sample, node) pairs of all nodes passed
+        """
+        X = _dense(X)
+        left, right = self.children_left, self.children_right
+        missing_go_to_left = self.missing_go_to_left
+        leaves = np.zeros(X.shape[0], dtype=np.intp)
+        rows, nodes = [np.arange(X.shape[0])], [leaves.copy()]
+        active = np.flatnonzero(left[leaves] != _TREE_LEAF)
+        while active.size:
+            current = leaves[active]
+            values = X[active, self.feature[current]]
+            go_left = values <= self.threshold[current]
+            if missing_go_to_left is not None:
+                go_left = np.where(
+                    np.isnan(values), missing_go_to_left[current] != 0, go_left
+                )
+            leaves[active] = np.where(go_left, left[current], right[current])
+            rows.append(active)
+            nodes.append(leaves[active])
+            active = active[left[leaves[active]] != _TREE_LEAF]
+        return leaves, np.concatenate(rows), np.concatenate(nodes)
+
+
+def _dense(X: Any) -> np.ndarray:
+    return X.toarray() if hasattr(X, "toarray") else np.asarray(X)
+
+
+def _is_tree(obj: Any) -> bool:
+    if isinstance(obj, MappedTree):
+        return True
+    cls = type(obj)
+    return cls.__module__ == "sklearn.tree._tree" and cls.__name__ == "Tree"
+
+
+class _ArtifactPickler(pickle.Pickler):
+    """
+    Appends numeric arrays to the arrays file and pickles references to them. Trees are
+    pickled as their constructor arguments and state, whose arrays are appended as well.
+    """
+
+    def __init__(self, file: Any, arrays_file: BinaryIO):
+        from sklearn.ensemble import (
+            GradientBoostingClassifier,
+            GradientBoostingRegressor,
+        )
+
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.__arrays_file = arrays_file
+        # Keeps the saved arrays alive, so that their ids are not reused.
+        self.__saved: Dict[int, Tuple[Tuple[Any, ...], np.ndarray]] = {}
+        # Gradient boosting predicts in Cython, which only accepts regular trees.
+        self.__native_tree_owners = (
+            GradientBoostingClassifier,
+            GradientBoostingRegressor,
+        )
+        self.__native_trees: Set[int] = set()
+
+    def persistent_id(self, obj: Any) -> Any:
+        if isinstance(obj, self.__native_tree_owners) and hasattr(obj, "estimators_"):
+            # Called before the estimators are pickled.
+            self.__native_trees.update(id(e.tree_) for e in obj.estimators_.ravel())
+        if type(obj) in (np.ndarray, np.memmap) and not obj.dtype.hasobject:
+            if id(obj) not in self.__saved:
+                self.__saved[id(obj)] = self.__append(obj), obj
+            return self.__saved[id(obj)][0]
+        if _is_tree(obj):
+            _, args, state = obj.__reduce__()
+            return "tree", args, state, id(obj) not in self.__native_trees
+        return None
+
+    def __append(self, array: np.ndarray) -> Tuple[Any, ...]:
+        fortran = array.flags.f_contiguous and not array.flags.c_contiguous
+        f = self.__arrays_file
+        f.write(b"\0" * (-f.tell() % _ARRAY_ALIGNMENT))
+        offset = f.tell()
+        # tofile writes in C order, the transpose of a Fortran array is C-contiguous.
+        (array.T if fortran else np.ascontiguousarray(array)).tofile(f)
+        return "array", offset, array.dtype, array.shape, fortran
+
+
+class _ArtifactUnpickler(pickle.Unpickler):
+    def __init__(self, file: Any, arrays_path: Path, mmap_mode: Optional[str]):
+        super().__init__(file)
+        self.__mmap_mode = mmap_mode
+        # All arrays are views of this buffer, so loading maps the arrays file only once.
+        self.__buffer: np.ndarray
+        if mmap_mode is None:
+            self.__buffer = np.fromfile(arrays_path, dtype=np.uint8)
+        elif arrays_path.stat().st_size == 0:
+            # Empty files cannot be mapped.
+            self.__buffer = np.zeros(0, dtype=np.uint8)
+        else:
+            self.__buffer = np.memmap(
+                arrays_path, dtype=np.uint8, mode=mmap_mode  # type: ignore[call-overload]
+            )
+
+    def persistent_load(self, pid: Any) -> Any:
+        if pid[0] == "array":
+            _, offset, dtype, shape, fortran = pid
+            end = offset + dtype.itemsize * math.prod(shape)
+            array = self.__buffer[offset:end].view(dtype)
+            return array.reshape(shape, order="F" if fortran else "C")
+        if pid[0] == "tree":
+            _, (n_features, n_classes, n_outputs), state, mappable = pid
+            if mappable and self.__mmap_mode is not None:
+                return MappedTree(n_features, n_classes, n_outputs, state)
+            from sklearn.tree._tree import Tree
+
+            tree = Tree(n_features, n_classes, n_outputs)
+            tree.__setstate__(state)
+            return tree
+        raise pickle.UnpicklingError(f"Unknown persistent id {pid[0]!r}.")
+
+
+def save_model_artifact(model: Any, directory: Union[str, Path]) -> Path:
+    """
+    :param directory: directory the model file, the arrays file and the manifest are written to, created if missing
+    :return: the artifact directory
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = ArtifactManifest(model_class=qualified_name(type(model)))
+    with open(directory / manifest.model_file, "wb") as f, open(
+        directory / manifest.arrays_file, "wb"
+    ) as arrays_file:
+        _ArtifactPickler(f, arrays_file).dump(model)
+    (directory / MANIFEST_FILE_NAME).write_text(json.dumps(asdict(manifest), indent=2))
+    logger.info(f"Saved {manifest.model_class} artifact to '{directory}'.")
+    return directory
+
+
+def read_manifest(directory: Union[str, Path]) -> ArtifactManifest:
+    path = Path(directory) / MANIFEST_FILE_NAME
+    payload = json.loads(path.read_text())
+    version = payload.get("format_version")
+    if version != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"Model artifact '{directory}' has format version {version}, "
+            f"expected {ARTIFACT_FORMAT_VERSION}. Please package the model again."
+        )
+    if payload.get("sklearn_version") != installed_sklearn_version():
+        logger.warning(
+            f"Model artifact '{directory}' was created with scikit-learn "
+            f"{payload.get('sklearn_version')}, installed is {installed_sklearn_version()}."
+        )
+    return ArtifactManifest(**payload)
+
+
+def load_model_artifact(
+    directory: Union[str, Path], mmap_mode: Optional[str] = "r"
+) -> Any:
+    """
+    :param mmap_mode: memory-map mode of the arrays, "r" maps them read-only; None copies them into memory and loads regular trees
+    """
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    with open(directory / manifest.model_file, "rb") as f:
+        return _ArtifactUnpickler(f, directory / manifest.arrays_file, mmap_mode).load()
+
+
+def package_model(
+    model: Any, code_path: Union[str, Path], name: str = DEFAULT_ARTIFACT_NAME
+) -> Path:
+    """
+    Saves the model as an artifact inside the code directory deployed with the entry script,
+    which loads it with `load_model_artifact(Path(__file__).parent / name)` in its `init()`.
+    """
+    return save_model_artifact(model, Path(code_path) / name)
+
+
+# Runs in a fresh interpreter, so that the measurement is not affected by pages the
+# benchmark process already holds. The model's module is imported before measuring, so
+# only the loading itself is measured; prints load time and memory as JSON.
+_LOAD_SCRIPT = """
+import importlib, json, sys, time
+from kreuzbergml.model.artifact import _memory_usage, load_model_artifact
+artifact_format, path, model_module = sys.argv[1:4]
+importlib.import_module(model_module)
+before = _memory_usage()
+start = time.perf_counter()
+if artifact_format == "pickle":
+    import pickle
+    with open(path, "rb") as f:
+        model = pickle.load(f)
+else:
+    model = load_model_artifact(path)
+load_seconds = time.perf_counter() - start
+after = _memory_usage()
+print(json.dumps({
+    "load_seconds": load_seconds,
+    "rss_bytes": after[0] - before[0],
+    "private_bytes": after[1] - before[1],
+}))
+"""
+
+
+def benchmark_artifact_load(
+    factories: Optional[Iterable[AbstractGridSearchParamsFactory]] = None,
+    directory: Union[str, Path] = ".",
+    n_samples: int = 5000,
+    n_features: int = 20,
+    random_state: int = 0,
+) -> List[ArtifactLoadRecord]:
+    """
+    Fits each factory's model class with its default parameters, saves it as a plain pickle
+    and as a memory-mapped artifact, and measures load time and memory growth of loading
+    each in a new process. Model classes shared by several factories are measured once.
+    `rss_bytes` includes mapped file pages shared with other processes, `private_bytes` does not.
+    """
+    from sklearn.datasets import make_classification
+
+    factories = list(factories) if factories is not None else get_all_factories()
+    directory = Path(directory)
+    X, y = make_classification(
+        n_samples=n_samples,
+        n_features=n_features,
+        n_informative=min(n_features, 10),
+        n_redundant=0,
+        random_state=random_state,
+    )
+    model_classes: Dict[str, Type] = {}
+    for factory in factories:
+        model_class = factory.get_model_class()
+        model_classes.setdefault(qualified_name(model_class), model_class)
+
+    records = []
+    for name, model_class in model_classes.items():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model = model_class().fit(X, y)
+        pickle_path = directory / f"{model_class.__name__}.pkl"
+        with open(pickle_path, "wb") as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        artifact_path = save_model_artifact(model, directory / model_class.__name__)
+        sizes = {
+            "pickle": pickle_path.stat().st_size,
+            "mmap": sum(p.stat().st_size for p in artifact_path.iterdir()),
+        }
+        for artifact_format, path in (("pickle", pickle_path), ("mmap", artifact_path)):
+            measured = _measure_load(artifact_format, path, model_class.__module__)
+            record = ArtifactLoadRecord(
+                model_class=name,
+                artifact_format=artifact_format,
+                artifact_bytes=sizes[artifact_format],
+                **measured,
+            )
+            logger.info(
+                f"{name} ({artifact_format}): {record.load_seconds * 1000:.1f}ms, "
+                f"rss +{record.rss_bytes / 2 ** 20:.1f}MiB, "
+                f"private +{record.private_bytes / 2 ** 20:.1f}MiB"
+            )
+            records.append(record)
+    return records
+
+
+def _measure_load(
+    artifact_format: str, path: Path, model_module: str
+) -> Dict[str, Any]:
+    env = dict(os.environ)
+    package_root = str(Path(__file__).resolve().parents[2])
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (package_root, env.get("PYTHONPATH")) if p
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", _LOAD_SCRIPT, artifact_format, str(path), model_module],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _memory_usage() -> Tuple[int, int]:
+    """
+    :return: resident and private resident bytes of the current process, zeros where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            _, resident, shared = (int(v) for v in f.read().split()[:3])
+    except OSError:
+        return 0, 0
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    return resident * page_size, (resident - shared) * page_size
@@ -0,0 +1,197 @@
+import json
+import logging
+import platform
+import time
+import tracemalloc
+import warnings
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type, Union
+
+import numpy as np
+
+from .param_factory import AbstractGridSearchParamsFactory
+from .search_space import SearchSpace
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_FORMAT_VERSION = 1
+DEFAULT_BENCHMARK_PATH = Path.home() / ".kreuzbergml" / "fit_cost_benchmark.json"
+DEFAULT_DATASET_SHAPES = ((1000, 20), (5000, 20), (5000, 100), (20000, 50))
+
+
+def installed_sklearn_version() -> str:
+    import sklearn
+
+    return sklearn.__version__
+
+
+def qualified_name(cls: Type) -> str:
+    """
+    :return: module and qualified name of the class, which identify model classes in benchmarks and artifacts
+    """
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+@dataclass
+class BenchmarkRecord:
+    factory: str
+    model_class: str
+    n_samples: int
+    n_features: int
+    params: Dict[str, Any]
+    fit_seconds: Optional[float] = None
+    predict_seconds: Optional[float] = None
+    peak_memory_bytes: Optional[int] = None
+    error: Optional[str] = None
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+
+@dataclass
+class BenchmarkResults:
+    records: List[BenchmarkRecord] = field(default_factory=list)
+    format_version: int = BENCHMARK_FORMAT_VERSION
+    sklearn_version: str = field(default_factory=installed_sklearn_version)
+    python_version: str = platform.python_version()
+    machine: str = platform.machine()
+    created_at: str = field(
+        default_factory=lambda: datetime.now(timezone.utc).isoformat()
+    )
+
+    def for_factory(self, factory_name: str) -> List[BenchmarkRecord]:
+        return [r for r in self.records if r.factory == factory_name]
+
+    def extend(self, other: "BenchmarkResults") -> None:
+        self.records.extend(other.records)
+
+    def save(self, path: Union[str, Path] = DEFAULT_BENCHMARK_PATH) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = asdict(self)
+        path.write_text(json.dumps(payload, indent=2, default=_json_default))
+        logger.info(f"Saved {len(self.records)} benchmark records to '{path}'.")
+        return path
+
+    @classmethod
+    def load(
+        cls, path: Union[str, Path] = DEFAULT_BENCHMARK_PATH
+    ) -> "BenchmarkResults":
+        payload = json.loads(Path(path).read_text())
+        version = payload.get("format_version")
+        if version != BENCHMARK_FORMAT_VERSION:
+            raise ValueError(
+                f"Benchmark file '{path}' has format version {version}, "
+                f"expected {BENCHMARK_FORMAT_VERSION}. Please re-run the benchmark."
+            )
+        if payload.get("sklearn_version") != installed_sklearn_version():
+            logger.warning(
+                f"Benchmark file '{path}' was created with scikit-learn "
+                f"{payload.get('sklearn_version')}, installed is {installed_sklearn_version()}."
+            )
+        records = [BenchmarkRecord(**record) for record in payload.pop("records")]
+        return cls(records=records, **payload)
+
+
+def get_all_factories() -> List[AbstractGridSearchParamsFactory]:
+    return [
+        factory_class()
+        for factory_class in AbstractGridSearchParamsFactory.__subclasses__()
+    ]
+
+
+def run_benchmark(
+    factories: Optional[Iterable[AbstractGridSearchParamsFactory]] = None,
+    dataset_shapes: Sequence[Tuple[int, int]] = DEFAULT_DATASET_SHAPES,
+    n_param_samples: int = 5,
+    measure_memory: bool = True,
+    random_state: int = 0,
+) -> BenchmarkResults:
+    """
+    Measures fit time, predict time and peak memory of each factory's model class on synthetic
+    classification datasets. Parameter settings are sampled from the factory's grid.
+    :param factories: factories to benchmark, all factories by default
+    :param dataset_shapes: (n_samples, n_features) of the synthetic datasets
+    :param n_param_samples: number of parameter settings sampled per factory and dataset shape
+    :param measure_memory: if True, every fit is repeated under tracemalloc to record the peak of memory allocated during the fit. Allocations made by native libraries bypassing Python's allocator (e.g. libsvm) are not seen.
+    :param random_state: seed for the datasets and the parameter sampling
+    :return: benchmark records, see `BenchmarkResults.save` to persist them
+    """
+    from sklearn.datasets import make_classification
+
+    factories = list(factories) if factories is not None else get_all_factories()
+    rng = np.random.default_rng(random_state)
+    results = BenchmarkResults()
+    for n_samples, n_features in dataset_shapes:
+        X, y = make_classification(
+            n_samples=n_samples,
+            n_features=n_features,
+            n_informative=min(n_features, 10),
+            n_redundant=0,
+            random_state=random_state,
+        )
+        for factory in factories:
+            space = SearchSpace.from_factory(factory, continuous_log_axes=False)
+            for _ in range(n_param_samples):
+                params = space.sample(rng)
+                record = benchmark_fit(factory, params, X, y, measure_memory)
+                results.records.append(record)
+    return results
+
+
+def benchmark_fit(
+    factory: AbstractGridSearchParamsFactory,
+    params: Dict[str, Any],
+    X: np.ndarray,
+    y: np.ndarray,
+    measure_memory: bool = True,
+) -> BenchmarkRecord:
+    model_class = factory.get_model_class()
+    record = BenchmarkRecord(
+        factory=type(factory).__name__,
+        model_class=qualified_name(model_class),
+        n_samples=int(X.shape[0]),
+        n_features=int(X.shape[1]),
+        params=params,
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            model = model_class(**params)
+            start = time.perf_counter()
+            model.fit(X, y)
+            record.fit_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            model.predict(X)
+            record.predict_seconds = time.perf_counter() - start
+            if measure_memory:
+                record.peak_memory_bytes = _peak_fit_memory(model_class, params, X, y)
+        except Exception as e:
+            logger.debug(
+                f"Benchmark of {record.model_class} with {params} failed: {e!r}"
+            )
+            record.error = repr(e)
+    return record
+
+
+def _peak_fit_memory(
+    model_class: Type, params: Dict[str, Any], X: np.ndarray, y: np.ndarray
+) -> int:
+    tracemalloc.start()
+    try:
+        model_class(**params).fit(X, y)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return int(peak)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
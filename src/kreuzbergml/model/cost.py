@@ -0,0 +1,273 @@
+import itertools
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .benchmark import (
+    DEFAULT_BENCHMARK_PATH,
+    BenchmarkRecord,
+    BenchmarkResults,
+    get_all_factories,
+)
+from .param_factory import AbstractGridSearchParamsFactory
+from .search_space import is_real_number
+
+_TARGETS = ("fit_seconds", "predict_seconds", "peak_memory_bytes")
+_EPSILON = 1e-12
+
+
+@dataclass
+class TaskCost:
+    params: Dict[str, Any]
+    fit_seconds: float
+    predict_seconds: float
+    peak_memory_bytes: int
+
+    @property
+    def seconds(self) -> float:
+        return self.fit_seconds + self.predict_seconds
+
+
+@dataclass
+class SearchCostEstimate:
+    n_tasks: int
+    total_seconds: float
+    wall_seconds: float
+    peak_memory_bytes: int
+    tasks: List[TaskCost] = field(default_factory=list)
+
+
+class _ParamEncoder:
+    """
+    Turns a parameter setting into a numeric feature vector. Positive real values, e.g.
+    `alpha` or `tol`, are log-scaled, integers such as `n_estimators` are scaled with
+    log(1 + x) and other numbers are used as they are. Tuples (e.g. `hidden_layer_sizes`) are described by their total size and length and
+    everything else is one-hot encoded against the values seen in the grid.
+    """
+
+    def __init__(self, param_dict: Dict[str, Iterable]):
+        self.__columns: List[tuple] = []
+        for name, values in param_dict.items():
+            values = list(values)
+            if all(_is_integer(v) for v in values):
+                self.__columns.append((name, "count", None))
+            elif all(is_real_number(v) and v > 0 for v in values):
+                self.__columns.append((name, "log", None))
+            elif all(is_real_number(v) for v in values):
+                self.__columns.append((name, "linear", None))
+            elif all(isinstance(v, (tuple, list)) for v in values):
+                self.__columns.append((name, "size", None))
+                self.__columns.append((name, "depth", None))
+            else:
+                for value in _unique(values)[1:]:
+                    self.__columns.append((name, "onehot", value))
+
+    @property
+    def n_features(self) -> int:
+        return len(self.__columns)
+
+    def encode(self, params: Dict[str, Any]) -> List[float]:
+        features = []
+        for name, kind, choice in self.__columns:
+            value = params.get(name)
+            if kind == "count":
+                features.append(
+                    math.log1p(abs(float(value))) if value is not None else 0.0
+                )
+            elif kind == "log":
+                # Values outside the grid may be 0, which has no logarithm.
+                features.append(
+                    math.log(max(float(value), _EPSILON)) if value is not None else 0.0
+                )
+            elif kind == "linear":
+                features.append(float(value) if value is not None else 0.0)
+            elif kind == "size":
+                features.append(math.log1p(sum(value)) if value is not None else 0.0)
+            elif kind == "depth":
+                features.append(float(len(value)) if value is not None else 0.0)
+            else:
+                features.append(1.0 if _same_value(value, choice) else 0.0)
+        return features
+
+
+class _LogLinearRegressor:
+    def __init__(self, coefficients: np.ndarray):
+        self.__coefficients = coefficients
+
+    @classmethod
+    def fit(cls, X: np.ndarray, y: np.ndarray, alpha: float) -> "_LogLinearRegressor":
+        penalty = alpha * np.eye(X.shape[1])
+        penalty[0, 0] = 0.0  # the intercept is not regularized
+        coefficients = np.linalg.solve(X.T @ X + penalty, X.T @ np.log(y))
+        return cls(coefficients)
+
+    def predict(self, x: np.ndarray) -> float:
+        return float(np.exp(x @ self.__coefficients))
+
+
+class _FactoryCostModel:
+    def __init__(
+        self,
+        encoder: _ParamEncoder,
+        regressors: Dict[str, _LogLinearRegressor],
+    ):
+        self.encoder = encoder
+        self.regressors = regressors
+
+    def features(
+        self, params: Dict[str, Any], n_samples: int, n_features: int
+    ) -> np.ndarray:
+        base = [1.0, math.log(n_samples), math.log(n_features)]
+        return np.array(base + self.encoder.encode(params))
+
+
+class FitCostModel:
+    """
+    Predicts fit time, predict time and peak memory of a parameter setting from benchmark
+    results (see `kreuzbergml.model.benchmark.run_benchmark`). Per factory, the logarithm of
+    each quantity is modelled as a linear function of log(n_samples), log(n_features) and
+    the encoded parameters.
+    """
+
+    def __init__(self, models: Dict[str, _FactoryCostModel]):
+        self.__models = models
+
+    @property
+    def factory_names(self) -> List[str]:
+        return list(self.__models)
+
+    @classmethod
+    def from_results(
+        cls,
+        results: BenchmarkResults,
+        factories: Sequence[AbstractGridSearchParamsFactory],
+        alpha: float = 1e-2,
+    ) -> "FitCostModel":
+        models = {}
+        for factory in factories:
+            name = type(factory).__name__
+            records = [r for r in results.for_factory(name) if not r.failed]
+            if not records:
+                continue
+            encoder = _ParamEncoder(factory.get_param_dict())
+            model = _FactoryCostModel(encoder, {})
+            X = np.array(
+                [model.features(r.params, r.n_samples, r.n_features) for r in records]
+            )
+            for target in _TARGETS:
+                y = np.array([_target_value(r, target) for r in records])
+                model.regressors[target] = _LogLinearRegressor.fit(X, y, alpha)
+            models[name] = model
+        return cls(models)
+
+    @classmethod
+    def from_file(
+        cls,
+        path: Union[str, Path] = DEFAULT_BENCHMARK_PATH,
+        factories: Optional[Sequence[AbstractGridSearchParamsFactory]] = None,
+    ) -> "FitCostModel":
+        factories = factories if factories is not None else get_all_factories()
+        return cls.from_results(BenchmarkResults.load(path), factories)
+
+    def has_factory(self, factory: AbstractGridSearchParamsFactory) -> bool:
+        return type(factory).__name__ in self.__models
+
+    def predict(
+        self,
+        factory: AbstractGridSearchParamsFactory,
+        params: Dict[str, Any],
+        n_samples: int,
+        n_features: int,
+        n_predict_samples: Optional[int] = None,
+    ) -> TaskCost:
+        name = type(factory).__name__
+        if name not in self.__models:
+            raise ValueError(
+                f"No benchmark results for '{name}', run the benchmark for this factory first."
+            )
+        model = self.__models[name]
+        x = model.features(params, n_samples, n_features)
+        fit_seconds = model.regressors["fit_seconds"].predict(x)
+        predict_seconds = model.regressors["predict_seconds"].predict(x)
+        if n_predict_samples is not None:
+            # The benchmark predicts on the training set, predict time scales linearly with rows.
+            predict_seconds *= n_predict_samples / n_samples
+        return TaskCost(
+            params=params,
+            fit_seconds=fit_seconds,
+            predict_seconds=predict_seconds,
+            peak_memory_bytes=int(model.regressors["peak_memory_bytes"].predict(x)),
+        )
+
+    def estimate_search(
+        self,
+        factory: AbstractGridSearchParamsFactory,
+        n_samples: int,
+        n_features: int,
+        param_grid: Optional[Dict[str, Iterable]] = None,
+        cv: int = 5,
+        n_workers: int = 1,
+    ) -> SearchCostEstimate:
+        """
+        Estimates the cost of an exhaustive cross-validated grid search.
+        :param param_grid: grid to search, the factory's `get_param_dict()` by default
+        :param cv: number of cross-validation folds, each fold fits on (cv - 1) / cv of the rows
+        :param n_workers: number of parallel workers, used for the wall time and memory estimate
+        :return: total (CPU) seconds, estimated wall seconds and peak memory of the search
+        """
+        param_grid = param_grid if param_grid is not None else factory.get_param_dict()
+        train_samples = max(1, n_samples * (cv - 1) // cv)
+        test_samples = max(1, n_samples // cv)
+        tasks = []
+        for params in iterate_grid(param_grid):
+            cost = self.predict(
+                factory, params, train_samples, n_features, test_samples
+            )
+            cost.fit_seconds *= cv
+            cost.predict_seconds *= cv
+            tasks.append(cost)
+        if not tasks:
+            return SearchCostEstimate(0, 0.0, 0.0, 0)
+        total_seconds = sum(task.seconds for task in tasks)
+        longest = max(task.seconds for task in tasks)
+        largest = sorted((task.peak_memory_bytes for task in tasks), reverse=True)
+        return SearchCostEstimate(
+            n_tasks=len(tasks),
+            total_seconds=total_seconds,
+            wall_seconds=max(total_seconds / n_workers, longest),
+            peak_memory_bytes=sum(largest[:n_workers]),
+            tasks=tasks,
+        )
+
+
+def iterate_grid(param_grid: Dict[str, Iterable]) -> Iterable[Dict[str, Any]]:
+    names = list(param_grid)
+    for values in itertools.product(*(list(param_grid[name]) for name in names)):
+        yield dict(zip(names, values))
+
+
+def _target_value(record: BenchmarkRecord, target: str) -> float:
+    value = getattr(record, target)
+    # Guard the logarithm against timer resolution and empty allocations.
+    return max(float(value or 0.0), 1e-6 if target != "peak_memory_bytes" else 1.0)
+
+
+def _same_value(a: Any, b: Any) -> bool:
+    if isinstance(a, (list, tuple)) or isinstance(b, (list, tuple)):
+        return a is not None and b is not None and tuple(a) == tuple(b)
+    return a == b
+
+
+def _unique(values: List[Any]) -> List[Any]:
+    unique: List[Any] = []
+    for value in values:
+        if not any(_same_value(value, u) for u in unique):
+            unique.append(value)
+    return unique
+
+
+def _is_integer(value: Any) -> bool:
+    return is_real_number(value) and isinstance(value, (int, np.integer))
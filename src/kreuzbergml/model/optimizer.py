@@ -0,0 +1,335 @@
+import logging
+import math
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .param_factory import AbstractGridSearchParamsFactory
+from .search_space import (
+    AbstractDimension,
+    CategoricalDimension,
+    LogUniformDimension,
+    SearchSpace,
+)
+
+logger = logging.getLogger(__name__)
+
+Objective = Callable[[Dict[str, Any]], float]
+
+
+@dataclass
+class Trial:
+    number: int
+    params: Dict[str, Any]
+    score: Optional[float] = None
+    duration: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+
+class TPEOptimizer:
+    """
+    Sequential model-based optimizer using the Tree-structured Parzen Estimator.
+    The search space is taken from a parameter factory, see `SearchSpace.from_factory`.
+    Suggestions are requested with `ask` and results reported back with `tell`;
+    `optimize` runs the whole loop with a fit-count and/or wall-clock budget.
+    """
+
+    def __init__(
+        self,
+        factory: AbstractGridSearchParamsFactory,
+        maximize: bool = True,
+        n_startup_trials: int = 10,
+        n_ei_candidates: int = 24,
+        gamma: float = 0.25,
+        prior_weight: float = 1.0,
+        random_state: Optional[int] = None,
+    ):
+        self.__factory = factory
+        self.__space = SearchSpace.from_factory(factory)
+        self.__maximize = maximize
+        self.__n_startup_trials = n_startup_trials
+        self.__n_ei_candidates = n_ei_candidates
+        self.__gamma = gamma
+        self.__prior_weight = prior_weight
+        self.__rng = np.random.default_rng(random_state)
+        self.__trials: List[Trial] = []
+        self.__pending: Dict[int, Trial] = {}
+
+    @property
+    def factory(self) -> AbstractGridSearchParamsFactory:
+        return self.__factory
+
+    @property
+    def space(self) -> SearchSpace:
+        return self.__space
+
+    @property
+    def trials(self) -> List[Trial]:
+        return self.__trials
+
+    @property
+    def pending_trials(self) -> List[Trial]:
+        return list(self.__pending.values())
+
+    @property
+    def best_trial(self) -> Optional[Trial]:
+        completed = [t for t in self.trials if not t.failed and t.score is not None]
+        if not completed:
+            return None
+        return max(completed, key=lambda t: self.__sign * float(t.score or 0.0))
+
+    @property
+    def best_params(self) -> Optional[Dict[str, Any]]:
+        best = self.best_trial
+        return best.params if best else None
+
+    @property
+    def best_score(self) -> Optional[float]:
+        best = self.best_trial
+        return best.score if best else None
+
+    @property
+    def __sign(self) -> float:
+        return 1.0 if self.__maximize else -1.0
+
+    def ask(self, n: int = 1) -> List[Trial]:
+        """
+        Suggests `n` new parameter settings. Suggestions which are asked for but not yet told
+        are treated as bad observations ("constant liar"), so a batch spreads out over the
+        search space and parallel workers do not evaluate the same point.
+        """
+        trials = []
+        for _ in range(n):
+            params = self.__suggest()
+            trial = Trial(number=len(self.trials) + len(self.__pending), params=params)
+            self.__pending[trial.number] = trial
+            trials.append(trial)
+        return trials
+
+    def tell(
+        self,
+        trial: Trial,
+        score: Optional[float] = None,
+        duration: Optional[float] = None,
+        error: Optional[str] = None,
+    ) -> Trial:
+        self.__pending.pop(trial.number, None)
+        trial.score = score
+        trial.duration = duration
+        trial.error = error
+        self.__trials.append(trial)
+        return trial
+
+    def optimize(
+        self,
+        objective: Objective,
+        max_fits: Optional[int] = None,
+        max_time: Optional[float] = None,
+        n_workers: int = 1,
+        executor: Optional[Executor] = None,
+    ) -> Optional[Trial]:
+        """
+        Runs the optimization loop until the budget is spent.
+        :param objective: callable that receives a parameter dictionary and returns a score
+        :param max_fits: maximum number of objective evaluations
+        :param max_time: wall-clock budget in seconds; no new evaluation is started once it is spent, running ones are awaited
+        :param n_workers: number of evaluations kept in flight at the same time
+        :param executor: executor used to run the objective, by default a thread pool with `n_workers` threads
+        :return: the best trial or None if no evaluation succeeded
+        """
+        if max_fits is None and max_time is None:
+            raise ValueError("Either max_fits or max_time must be given as budget.")
+        own_executor = executor is None
+        pool = executor or ThreadPoolExecutor(max_workers=n_workers)
+        start = time.perf_counter()
+        submitted = 0
+        running: Dict[Future, Trial] = {}
+
+        def budget_left() -> bool:
+            if max_fits is not None and submitted >= max_fits:
+                return False
+            if max_time is not None and time.perf_counter() - start >= max_time:
+                return False
+            return True
+
+        try:
+            while True:
+                free_slots = n_workers - len(running)
+                if max_fits is not None:
+                    free_slots = min(free_slots, max_fits - submitted)
+                if free_slots > 0 and budget_left():
+                    for trial in self.ask(free_slots):
+                        future = pool.submit(_timed_call, objective, trial.params)
+                        running[future] = trial
+                        submitted += 1
+                if not running:
+                    break
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    trial = running.pop(future)
+                    self.__tell_future(trial, future)
+        finally:
+            if own_executor:
+                pool.shutdown(wait=True)
+        best = self.best_trial
+        if best:
+            logger.info(
+                f"Optimization finished after {submitted} fits in "
+                f"{time.perf_counter() - start:.1f}s, best score {best.score}."
+            )
+        return best
+
+    def __tell_future(self, trial: Trial, future: Future) -> None:
+        try:
+            score, duration = future.result()
+        except Exception as e:
+            logger.warning(f"Trial {trial.number} with {trial.params} failed: {e!r}")
+            self.tell(trial, error=repr(e))
+        else:
+            self.tell(trial, score=score, duration=duration)
+
+    def __suggest(self) -> Dict[str, Any]:
+        # Pending trials only shape the densities; modelling starts after enough real results.
+        n_completed = sum(
+            1 for t in self.trials if not t.failed and t.score is not None
+        )
+        if n_completed < self.__n_startup_trials:
+            return self.space.sample(self.__rng)
+        observations = self.__observations()
+        good, bad = self.__split(observations)
+        return {
+            dim.name: self.__suggest_dimension(
+                dim, [p[dim.name] for p in good], [p[dim.name] for p in bad]
+            )
+            for dim in self.space.dimensions
+        }
+
+    def __observations(self) -> List[Tuple[Dict[str, Any], float]]:
+        completed = [
+            (t.params, -self.__sign * t.score)
+            for t in self.trials
+            if not t.failed and t.score is not None
+        ]
+        if not completed:
+            return []
+        worst_loss = max(loss for _, loss in completed)
+        lies = [(t.params, worst_loss) for t in self.__pending.values()]
+        return completed + lies
+
+    def __split(
+        self, observations: List[Tuple[Dict[str, Any], float]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        ordered = sorted(observations, key=lambda observation: observation[1])
+        n_good = max(1, int(math.ceil(self.__gamma * len(ordered))))
+        good = [params for params, _ in ordered[:n_good]]
+        bad = [params for params, _ in ordered[n_good:]]
+        return good, bad
+
+    def __suggest_dimension(
+        self, dim: AbstractDimension, good: List[Any], bad: List[Any]
+    ) -> Any:
+        if isinstance(dim, LogUniformDimension):
+            return self.__suggest_log_uniform(dim, good, bad)
+        if isinstance(dim, CategoricalDimension):
+            return self.__suggest_categorical(dim, good, bad)
+        raise TypeError(f"Unsupported dimension type {type(dim).__name__}.")
+
+    def __suggest_categorical(
+        self, dim: CategoricalDimension, good: List[Any], bad: List[Any]
+    ) -> Any:
+        n_choices = len(dim.choices)
+        l_probs = self.__categorical_probs(dim, good)
+        g_probs = self.__categorical_probs(dim, bad)
+        candidates = self.__rng.choice(
+            n_choices, size=self.__n_ei_candidates, p=l_probs
+        )
+        ratios = np.log(l_probs[candidates]) - np.log(g_probs[candidates])
+        return dim.choices[int(candidates[int(np.argmax(ratios))])]
+
+    def __categorical_probs(
+        self, dim: CategoricalDimension, values: List[Any]
+    ) -> np.ndarray:
+        counts = np.full(len(dim.choices), self.__prior_weight / len(dim.choices))
+        for value in values:
+            counts[dim.index(value)] += 1
+        return counts / counts.sum()
+
+    def __suggest_log_uniform(
+        self, dim: LogUniformDimension, good: List[float], bad: List[float]
+    ) -> float:
+        low, high = dim.log_low, dim.log_high
+        l_mus, l_sigmas = self.__parzen_components(dim, good)
+        g_mus, g_sigmas = self.__parzen_components(dim, bad)
+        components = self.__rng.integers(len(l_mus), size=self.__n_ei_candidates)
+        candidates = self.__rng.normal(l_mus[components], l_sigmas[components])
+        candidates = np.clip(candidates, low, high)
+        ratios = _log_mixture_density(
+            candidates, l_mus, l_sigmas
+        ) - _log_mixture_density(candidates, g_mus, g_sigmas)
+        return dim.from_log(float(candidates[int(np.argmax(ratios))]))
+
+    def __parzen_components(
+        self, dim: LogUniformDimension, values: List[float]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gaussian kernels at the observed points plus a wide prior kernel in the middle of the range.
+        The bandwidth shrinks as more points are observed.
+        """
+        low, high = dim.log_low, dim.log_high
+        width = high - low
+        mus = np.array([dim.to_log(v) for v in values] + [(low + high) / 2])
+        sigma = width / min(100.0, 1.0 + len(values))
+        sigmas = np.full(len(mus), max(sigma, width / 100.0))
+        sigmas[-1] = width
+        return mus, sigmas
+
+
+def cross_validation_objective(
+    factory: AbstractGridSearchParamsFactory,
+    X: Any,
+    y: Any,
+    cv: int = 5,
+    scoring: Optional[str] = None,
+    fixed_params: Optional[Dict[str, Any]] = None,
+) -> Objective:
+    """
+    :return: objective returning the mean cross-validation score of the factory's model class
+    """
+    from sklearn.model_selection import cross_val_score
+
+    model_class = factory.get_model_class()
+
+    def objective(params: Dict[str, Any]) -> float:
+        model = model_class(**{**(fixed_params or {}), **params})
+        return float(np.mean(cross_val_score(model, X, y, cv=cv, scoring=scoring)))
+
+    return objective
+
+
+def _timed_call(objective: Objective, params: Dict[str, Any]) -> Tuple[float, float]:
+    start = time.perf_counter()
+    score = objective(params)
+    return float(score), time.perf_counter() - start
+
+
+def _log_mixture_density(
+    x: np.ndarray, mus: np.ndarray, sigmas: np.ndarray
+) -> np.ndarray:
+    z = (x[:, None] - mus[None, :]) / sigmas[None, :]
+    log_kernels = -0.5 * z**2 - np.log(sigmas[None, :] * math.sqrt(2 * math.pi))
+    max_log = log_kernels.max(axis=1, keepdims=True)
+    log_sum = np.log(np.exp(log_kernels - max_log).sum(axis=1))
+    return max_log[:, 0] + log_sum - math.log(len(mus))
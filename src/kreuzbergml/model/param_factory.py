@@ -2,17 +2,15 @@ from abc import ABC, abstractmethod
 from typing import Dict, Iterable
 
 import numpy as np
-import sklearn.ensemble
-import sklearn.linear_model
-import sklearn.neighbors
-import sklearn.neural_network
-import sklearn.svm
-import sklearn.tree
 
 
 class AbstractGridSearchParamsFactory(ABC):
     @abstractmethod
     def get_model_class(self):
+        """
+        Model classes are imported here rather than at module level, so that importing the
+        factories does not import scikit-learn.
+        """
         pass
 
     @abstractmethod
@@ -22,7 +20,9 @@ class AbstractGridSearchParamsFactory(ABC):
 
 class L2RegularizedLRParamsFactory(AbstractGridSearchParamsFactory):
     def get_model_class(self):
-        return sklearn.linear_model.LogisticRegression
+        from sklearn.linear_model import LogisticRegression
+
+        return LogisticRegression
 
     def get_param_dict(self) -> Dict[str, Iterable]:
         param_dict = {
@@ -35,7 +35,9 @@ class L2RegularizedLRParamsFactory(AbstractGridSearchParamsFactory):
 
 class ENRegularizedLRParamsFactory(AbstractGridSearchParamsFactory):
     def get_model_class(self):
-        return sklearn.linear_model.LogisticRegression
+        from sklearn.linear_model import LogisticRegression
+
+        return LogisticRegression
 
     def get_param_dict(self) -> Dict[str, Iterable]:
         param_dict = {
@@ -49,7 +51,9 @@ class ENRegularizedLRParamsFactory(AbstractGridSearchParamsFactory):
 
 class RFCParamsFactory(AbstractGridSearchParamsFactory):
     def get_model_class(self):
-        return sklearn.ensemble.RandomForestClassifier
+        from sklearn.ensemble import RandomForestClassifier
+
+        return RandomForestClassifier
 
     def get_param_dict(self) -> Dict[str, Iterable]:
         param_dict = {
@@ -63,7 +67,9 @@ class RFCParamsFactory(AbstractGridSearchParamsFactory):
 
 class SVCParamsFactory(AbstractGridSearchParamsFactory):
     def get_model_class(self):
-        return sklearn.svm.SVC
+        from sklearn.svm import SVC
+
+        return SVC
 
     def get_param_dict(self) -> Dict[str, Iterable]:
         param_dict = {
@@ -76,7 +82,9 @@ class SVCParamsFactory(AbstractGridSearchParamsFactory):
 
 class LinSVCParamsFactory(AbstractGridSearchParamsFactory):
     def get_model_class(self):
-        return sklearn.svm.LinearSVC
+        from sklearn.svm import LinearSVC
+
+        return LinearSVC
 
     def get_param_dict(self) -> Dict[str, Iterable]:
         param_dict = {
@@ -89,7 +97,9 @@ class LinSVCParamsFactory(AbstractGridSearchParamsFactory):
 
 class MLPCParamsFactory(AbstractGridSearchParamsFactory):
     def get_model_class(self):
-        return sklearn.neural_network.MLPClassifier
+        from sklearn.neural_network import MLPClassifier
+
+        return MLPClassifier
 
     def get_param_dict(self) -> Dict[str, Iterable]:
         param_dict = {
@@ -110,7 +120,9 @@ class MLPCParamsFactory(AbstractGridSearchParamsFactory):
 
 class DTCParamsFactory(AbstractGridSearchParamsFactory):
     def get_model_class(self):
-        return sklearn.tree.DecisionTreeClassifier
+        from sklearn.tree import DecisionTreeClassifier
+
+        return DecisionTreeClassifier
 
     def get_param_dict(self) -> Dict[str, Iterable]:
         param_dict = {
@@ -124,7 +136,9 @@ class DTCParamsFactory(AbstractGridSearchParamsFactory):
 
 class KNCParamsFactory(AbstractGridSearchParamsFactory):
     def get_model_class(self):
-        return sklearn.neighbors.KNeighborsClassifier
+        from sklearn.neighbors import KNeighborsClassifier
+
+        return KNeighborsClassifier
 
     def get_param_dict(self) -> Dict[str, Iterable]:
         param_dict = {
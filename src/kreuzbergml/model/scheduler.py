@@ -0,0 +1,307 @@
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .cost import FitCostModel, iterate_grid
+from .param_factory import AbstractGridSearchParamsFactory
+
+logger = logging.getLogger(__name__)
+
+TaskFunction = Callable[[Dict[str, Any]], Any]
+
+DONE = "done"
+FAILED = "failed"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+
+
+@dataclass
+class SearchTask:
+    task_id: int
+    params: Dict[str, Any]
+    estimated_seconds: float = 1.0
+    n_jobs: int = 1
+
+    @property
+    def estimated_wall_seconds(self) -> float:
+        return self.estimated_seconds / self.n_jobs
+
+
+@dataclass
+class TaskReport:
+    task: SearchTask
+    status: str
+    workers: List[int] = field(default_factory=list)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+@dataclass
+class WorkerReport:
+    worker: int
+    n_tasks: int
+    busy_seconds: float
+    utilization: float
+
+
+@dataclass
+class ScheduleReport:
+    tasks: List[TaskReport]
+    workers: List[WorkerReport]
+    wall_seconds: float
+
+    @property
+    def utilization(self) -> float:
+        if not self.workers or self.wall_seconds <= 0:
+            return 0.0
+        busy = sum(worker.busy_seconds for worker in self.workers)
+        return busy / (self.wall_seconds * len(self.workers))
+
+    def by_status(self, status: str) -> List[TaskReport]:
+        return [report for report in self.tasks if report.status == status]
+
+
+@dataclass
+class _RunningTask:
+    task: SearchTask
+    process: multiprocessing.process.BaseProcess
+    connection: Connection
+    workers: List[int]
+    started_at: float
+    timeout: Optional[float]
+
+
+class CostAwareScheduler:
+    """
+    Runs heterogeneous search tasks on `n_workers` cores. Tasks are started longest-first
+    (by estimated wall time) and a task occupies as many cores as its `n_jobs`; when the
+    next task in line does not fit, smaller tasks are started on the remaining cores.
+    Every task runs in its own process, so runaway fits can be terminated.
+    """
+
+    def __init__(
+        self,
+        n_workers: Optional[int] = None,
+        task_timeout: Optional[float] = None,
+        timeout_factor: Optional[float] = None,
+        poll_interval: float = 0.05,
+        start_method: Optional[str] = None,
+    ):
+        """
+        :param n_workers: number of cores to use, all cores by default
+        :param task_timeout: a task running longer than this many seconds is terminated
+        :param timeout_factor: a task running longer than `timeout_factor` times its estimated wall time is terminated
+        :param poll_interval: seconds between checks for finished and runaway tasks
+        :param start_method: multiprocessing start method, "fork" where available by default
+        """
+        self.__n_workers = n_workers or os.cpu_count() or 1
+        self.__task_timeout = task_timeout
+        self.__timeout_factor = timeout_factor
+        self.__poll_interval = poll_interval
+        if start_method is None:
+            methods = multiprocessing.get_all_start_methods()
+            start_method = "fork" if "fork" in methods else "spawn"
+        self.__context = multiprocessing.get_context(start_method)
+        self.__cancelled = threading.Event()
+
+    @property
+    def n_workers(self) -> int:
+        return self.__n_workers
+
+    def cancel(self) -> None:
+        """
+        Terminates running tasks and skips pending ones. Can be called from another thread.
+        """
+        self.__cancelled.set()
+
+    def run(self, tasks: Iterable[SearchTask], fn: TaskFunction) -> ScheduleReport:
+        """
+        :param tasks: tasks to run; `fn` receives each task's `params`
+        :param fn: function executed in a child process, its return value must be picklable
+        :return: per-task and per-worker report
+        """
+        self.__cancelled.clear()
+        pending = sorted(tasks, key=lambda t: t.estimated_wall_seconds, reverse=True)
+        for task in pending:
+            if task.n_jobs > self.n_workers:
+                raise ValueError(
+                    f"Task {task.task_id} needs {task.n_jobs} cores, "
+                    f"only {self.n_workers} workers are available."
+                )
+        free_workers = list(range(self.n_workers))
+        busy_seconds = [0.0] * self.n_workers
+        task_counts = [0] * self.n_workers
+        running: Dict[Connection, _RunningTask] = {}
+        reports: List[TaskReport] = []
+        start = time.perf_counter()
+
+        def finish(running_task: _RunningTask, report: TaskReport) -> None:
+            report.workers = running_task.workers
+            report.started_at = running_task.started_at - start
+            report.finished_at = time.perf_counter() - start
+            for worker in running_task.workers:
+                busy_seconds[worker] += report.duration or 0.0
+                task_counts[worker] += 1
+                free_workers.append(worker)
+            free_workers.sort()
+            reports.append(report)
+
+        while pending or running:
+            if self.__cancelled.is_set():
+                for connection, running_task in list(running.items()):
+                    self.__terminate(running_task)
+                    finish(running_task, TaskReport(running_task.task, CANCELLED))
+                    del running[connection]
+                reports.extend(TaskReport(task, CANCELLED) for task in pending)
+                pending = []
+                break
+
+            while pending and free_workers:
+                fitting = [t for t in pending if t.n_jobs <= len(free_workers)]
+                if not fitting:
+                    break
+                pending.remove(fitting[0])
+                workers = free_workers[: fitting[0].n_jobs]
+                del free_workers[: fitting[0].n_jobs]
+                running_task = self.__start(fitting[0], fn, workers)
+                running[running_task.connection] = running_task
+
+            for ready in wait(list(running), timeout=self.__poll_interval):
+                running_task = running.pop(ready)  # type: ignore[call-overload]
+                finish(running_task, self.__collect(running_task))
+
+            now = time.perf_counter()
+            for connection, running_task in list(running.items()):
+                timeout = running_task.timeout
+                if timeout is not None and now - running_task.started_at > timeout:
+                    self.__terminate(running_task)
+                    logger.warning(
+                        f"Task {running_task.task.task_id} with {running_task.task.params} "
+                        f"was terminated after {timeout:.1f}s."
+                    )
+                    finish(running_task, TaskReport(running_task.task, TIMEOUT))
+                    del running[connection]
+
+        wall_seconds = time.perf_counter() - start
+        worker_reports = [
+            WorkerReport(
+                worker=worker,
+                n_tasks=task_counts[worker],
+                busy_seconds=busy_seconds[worker],
+                utilization=(
+                    busy_seconds[worker] / wall_seconds if wall_seconds else 0.0
+                ),
+            )
+            for worker in range(self.n_workers)
+        ]
+        return ScheduleReport(
+            tasks=reports, workers=worker_reports, wall_seconds=wall_seconds
+        )
+
+    def __start(
+        self, task: SearchTask, fn: TaskFunction, workers: List[int]
+    ) -> _RunningTask:
+        parent_connection, child_connection = self.__context.Pipe(duplex=False)
+        process = self.__context.Process(  # type: ignore[attr-defined]
+            target=_run_task, args=(fn, task.params, child_connection), daemon=True
+        )
+        process.start()
+        child_connection.close()
+        return _RunningTask(
+            task=task,
+            process=process,
+            connection=parent_connection,
+            workers=workers,
+            started_at=time.perf_counter(),
+            timeout=self.__timeout_for(task),
+        )
+
+    def __timeout_for(self, task: SearchTask) -> Optional[float]:
+        timeouts = []
+        if self.__task_timeout is not None:
+            timeouts.append(self.__task_timeout)
+        if self.__timeout_factor is not None:
+            timeouts.append(self.__timeout_factor * task.estimated_wall_seconds)
+        return min(timeouts) if timeouts else None
+
+    @staticmethod
+    def __collect(running_task: _RunningTask) -> TaskReport:
+        try:
+            status, payload = running_task.connection.recv()
+        except EOFError:
+            running_task.process.join()
+            exitcode = running_task.process.exitcode
+            status, payload = FAILED, f"Process exited with code {exitcode}."
+        running_task.connection.close()
+        running_task.process.join()
+        if status == DONE:
+            return TaskReport(running_task.task, DONE, result=payload)
+        return TaskReport(running_task.task, FAILED, error=payload)
+
+    @staticmethod
+    def __terminate(running_task: _RunningTask) -> None:
+        running_task.process.terminate()
+        running_task.process.join()
+        running_task.connection.close()
+
+
+def build_search_tasks(
+    factory: AbstractGridSearchParamsFactory,
+    n_samples: int,
+    n_features: int,
+    n_workers: int,
+    param_grid: Optional[Dict[str, Iterable]] = None,
+    cost_model: Optional[FitCostModel] = None,
+    cv: int = 5,
+) -> List[SearchTask]:
+    """
+    Creates one task per grid point. Costs are estimated with `cost_model` when it knows the
+    factory, otherwise all tasks are assumed equally expensive. Tasks of estimators with an
+    `n_jobs` parameter (e.g. RandomForest) that would otherwise straggle behind the rest of
+    the search get several cores, and `n_jobs` is set in their params accordingly.
+    """
+    param_grid = param_grid if param_grid is not None else factory.get_param_dict()
+    grid = list(iterate_grid(param_grid))
+    if cost_model is not None and cost_model.has_factory(factory):
+        estimate = cost_model.estimate_search(
+            factory, n_samples, n_features, param_grid=param_grid, cv=cv
+        )
+        costs = [task.seconds for task in estimate.tasks]
+    else:
+        costs = [1.0] * len(grid)
+    supports_n_jobs = "n_jobs" in factory.get_model_class()().get_params()
+    ideal_makespan = sum(costs) / n_workers if costs else 0.0
+    tasks = []
+    for task_id, (params, cost) in enumerate(zip(grid, costs)):
+        n_jobs = 1
+        if supports_n_jobs and ideal_makespan > 0 and cost > ideal_makespan:
+            n_jobs = min(n_workers, math.ceil(cost / ideal_makespan))
+        if supports_n_jobs:
+            params = {**params, "n_jobs": n_jobs}
+        tasks.append(SearchTask(task_id, params, estimated_seconds=cost, n_jobs=n_jobs))
+    return tasks
+
+
+def _run_task(fn: TaskFunction, params: Dict[str, Any], connection: Connection) -> None:
+    try:
+        result = fn(params)
+    except Exception as e:
+        connection.send((FAILED, repr(e)))
+    else:
+        connection.send((DONE, result))
+    finally:
+        connection.close()
@@ -0,0 +1,156 @@
+import math
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from .param_factory import AbstractGridSearchParamsFactory
+
+
+class AbstractDimension(ABC):
+    def __init__(self, name: str):
+        self.__name = name
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @abstractmethod
+    def sample(self, rng: np.random.Generator) -> Any:
+        pass
+
+
+class CategoricalDimension(AbstractDimension):
+    def __init__(self, name: str, choices: Sequence[Any]):
+        super().__init__(name)
+        if len(choices) == 0:
+            raise ValueError(f"Parameter '{name}' has no values to choose from.")
+        self.__choices = [_to_python_scalar(choice) for choice in choices]
+
+    @property
+    def choices(self) -> List[Any]:
+        return self.__choices
+
+    def index(self, value: Any) -> int:
+        for idx, choice in enumerate(self.choices):
+            if choice == value:
+                return idx
+        raise ValueError(f"Value {value!r} is not a choice of parameter '{self.name}'.")
+
+    def sample(self, rng: np.random.Generator) -> Any:
+        return self.choices[int(rng.integers(len(self.choices)))]
+
+
+class LogUniformDimension(AbstractDimension):
+    """
+    Continuous dimension whose values are searched uniformly in log10 space.
+    """
+
+    def __init__(self, name: str, low: float, high: float):
+        super().__init__(name)
+        if not 0 < low < high:
+            raise ValueError(
+                f"Parameter '{name}' needs 0 < low < high, got low={low}, high={high}."
+            )
+        self.__low = float(low)
+        self.__high = float(high)
+
+    @property
+    def low(self) -> float:
+        return self.__low
+
+    @property
+    def high(self) -> float:
+        return self.__high
+
+    @property
+    def log_low(self) -> float:
+        return math.log10(self.low)
+
+    @property
+    def log_high(self) -> float:
+        return math.log10(self.high)
+
+    def to_log(self, value: float) -> float:
+        return math.log10(value)
+
+    def from_log(self, log_value: float) -> float:
+        return float(min(max(10**log_value, self.low), self.high))
+
+    def sample(self, rng: np.random.Generator) -> float:
+        return self.from_log(rng.uniform(self.log_low, self.log_high))
+
+
+class SearchSpace:
+    def __init__(self, dimensions: Iterable[AbstractDimension]):
+        self.__dimensions = list(dimensions)
+
+    @property
+    def dimensions(self) -> List[AbstractDimension]:
+        return self.__dimensions
+
+    @property
+    def names(self) -> List[str]:
+        return [dim.name for dim in self.dimensions]
+
+    def sample(self, rng: np.random.Generator) -> Dict[str, Any]:
+        return {dim.name: dim.sample(rng) for dim in self.dimensions}
+
+    @classmethod
+    def from_param_dict(
+        cls, param_dict: Dict[str, Iterable], continuous_log_axes: bool = True
+    ) -> "SearchSpace":
+        """
+        Builds a search space from a grid search parameter dictionary.
+        :param param_dict: mapping of parameter names to the grid values, as returned by `get_param_dict()`
+        :param continuous_log_axes: if True, numeric axes whose values are log-spaced (e.g. created with `np.logspace`) are searched continuously between their first and last value; all other axes are categorical.
+        :return: search space with one dimension per parameter
+        """
+        dimensions: List[AbstractDimension] = []
+        for name, values in param_dict.items():
+            values = list(values)
+            if continuous_log_axes and is_log_spaced(values):
+                dimensions.append(
+                    LogUniformDimension(name, low=min(values), high=max(values))
+                )
+            else:
+                dimensions.append(CategoricalDimension(name, values))
+        return cls(dimensions)
+
+    @classmethod
+    def from_factory(
+        cls, factory: AbstractGridSearchParamsFactory, continuous_log_axes: bool = True
+    ) -> "SearchSpace":
+        return cls.from_param_dict(factory.get_param_dict(), continuous_log_axes)
+
+
+def is_log_spaced(values: Sequence[Any], rtol: float = 1e-6) -> bool:
+    """
+    :return: True if values are at least three distinct positive non-integer numbers with a constant ratio between neighbours.
+    """
+    if len(values) < 3:
+        return False
+    if not all(is_real_number(value) for value in values):
+        return False
+    if all(float(value).is_integer() for value in values):
+        # Integer axes such as `n_estimators=[8, 16, 32, 64]` are kept as grids.
+        return False
+    floats = sorted(float(value) for value in values)
+    if floats[0] <= 0:
+        return False
+    ratios = [b / a for a, b in zip(floats, floats[1:])]
+    if ratios[0] <= 1 + rtol:
+        return False
+    return all(math.isclose(ratio, ratios[0], rel_tol=rtol) for ratio in ratios)
+
+
+def is_real_number(value: Any) -> bool:
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(
+        value, (bool, np.bool_)
+    )
+
+
+def _to_python_scalar(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
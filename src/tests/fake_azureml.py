@@ -0,0 +1,297 @@
+"""
+Minimal local stand-in for the parts of the azureml SDK used by kreuzbergml.deployment.azure.
+`install` registers the fake modules in `sys.modules`; every fake records its calls in `CALLS`.
+"""
+
+import importlib
+import sys
+import time
+import types
+from collections import Counter
+from typing import Any, Dict
+
+CALLS: Counter = Counter()
+
+# Number of status polls before a long-running operation reaches its final state, and the
+# seconds a call starting such an operation blocks.
+POLLS_UNTIL_DONE = 2
+SUBMIT_SECONDS = 0.0
+# Final status of environment image builds.
+BUILD_STATUS = "Succeeded"
+
+
+class UserErrorException(Exception):
+    pass
+
+
+class ComputeTargetException(Exception):
+    pass
+
+
+class ServicePrincipalAuthentication:
+    def __init__(self, **kwargs):
+        CALLS["ServicePrincipalAuthentication"] += 1
+        self.kwargs = kwargs
+
+
+class InteractiveLoginAuthentication:
+    def __init__(self, **kwargs):
+        CALLS["InteractiveLoginAuthentication"] += 1
+        self.kwargs = kwargs
+
+
+class Workspace:
+    def __init__(self, **kwargs):
+        CALLS["Workspace"] += 1
+        self.kwargs = kwargs
+
+
+class ComputeTarget:
+    existing: Dict[str, "ComputeTarget"] = {}
+
+    def __init__(self, workspace=None, name=None):
+        CALLS["ComputeTarget"] += 1
+        if name not in self.existing:
+            raise ComputeTargetException(f"Compute target '{name}' not found.")
+        self.name = name
+
+    @classmethod
+    def create(cls, workspace, name, provisioning_configuration):
+        CALLS["ComputeTarget.create"] += 1
+        time.sleep(SUBMIT_SECONDS)
+        target = cls.__new__(cls)
+        target.name = name
+        target.provisioning_state = "Creating"
+        target._operation = _Operation("Succeeded")
+        cls.existing[name] = target
+        return target
+
+    def refresh_state(self):
+        CALLS["ComputeTarget.refresh_state"] += 1
+        self.provisioning_state = self._operation.poll(self.provisioning_state)
+
+    def wait_for_completion(self, show_output=False):
+        CALLS["ComputeTarget.wait_for_completion"] += 1
+        self.provisioning_state = "Succeeded"
+
+    def delete(self):
+        CALLS["ComputeTarget.delete"] += 1
+        self.existing.pop(self.name, None)
+
+
+class _Operation:
+    """
+    Long-running operation which reaches `final_state` after `POLLS_UNTIL_DONE` polls.
+    """
+
+    def __init__(self, final_state):
+        self.final_state = final_state
+        self.polls = 0
+
+    def poll(self, state):
+        self.polls += 1
+        return self.final_state if self.polls >= POLLS_UNTIL_DONE else state
+
+
+class Webservice:
+    final_states: Dict[str, str] = {}
+
+    def __init__(self, name):
+        self.name = name
+        self.state = "Transitioning"
+        self._operation = _Operation(self.final_states.get(name, "Healthy"))
+
+    def update_deployment_state(self):
+        CALLS["Webservice.update_deployment_state"] += 1
+        self.state = self._operation.poll(self.state)
+
+    def wait_for_deployment(self, show_output=False):
+        CALLS["Webservice.wait_for_deployment"] += 1
+        self.state = self._operation.final_state
+
+
+class Model:
+    @staticmethod
+    def deploy(workspace, name, **kwargs):
+        CALLS["Model.deploy"] += 1
+        time.sleep(SUBMIT_SECONDS)
+        return Webservice(name)
+
+
+class AciWebservice:
+    @staticmethod
+    def deploy_configuration(**kwargs):
+        return kwargs
+
+
+class RunConfiguration:
+    pass
+
+
+class PublishedPipeline:
+    def __init__(self, name):
+        self.name = name
+
+
+class Pipeline:
+    def __init__(self, workspace, steps, **kwargs):
+        self.steps = steps
+
+    def publish(self, name, description=None):
+        CALLS["Pipeline.publish"] += 1
+        time.sleep(SUBMIT_SECONDS)
+        return PublishedPipeline(name)
+
+
+class PipelineEndpoint:
+    existing: Dict[str, "PipelineEndpoint"] = {}
+
+    def __init__(self, name, pipeline):
+        self.name = name
+        self.pipelines = [pipeline]
+        self.status = "Active"
+        self.endpoint = f"https://fake/{name}"
+
+    @classmethod
+    def list(cls, workspace, active_only=True):
+        return list(cls.existing.values())
+
+    @classmethod
+    def get(cls, workspace, name):
+        return cls.existing[name]
+
+    @classmethod
+    def publish(cls, workspace, name, pipeline, description=None):
+        CALLS["PipelineEndpoint.publish"] += 1
+        cls.existing[name] = cls(name, pipeline)
+        return cls.existing[name]
+
+    def add_default(self, pipeline):
+        self.pipelines.append(pipeline)
+
+
+class AmlCompute:
+    @staticmethod
+    def provisioning_configuration(**kwargs):
+        return kwargs
+
+
+class Datastore:
+    existing: Dict[str, object] = {}
+
+    @classmethod
+    def get(cls, workspace, name):
+        CALLS["Datastore.get"] += 1
+        if name not in cls.existing:
+            raise UserErrorException(f"Datastore '{name}' not found.")
+        return cls.existing[name]
+
+    @classmethod
+    def register_azure_postgre_sql(cls, workspace, datastore_name, **kwargs):
+        CALLS["Datastore.register_azure_postgre_sql"] += 1
+        datastore = {"name": datastore_name, **kwargs}
+        cls.existing[datastore_name] = datastore
+        return datastore
+
+
+class Environment:
+    registered: Dict[str, "Environment"] = {}
+
+    def __init__(self, name):
+        self.name = name
+        self.docker = types.SimpleNamespace(base_image=None)
+
+    @classmethod
+    def get(cls, workspace, name):
+        CALLS["Environment.get"] += 1
+        if name not in cls.registered:
+            raise Exception(
+                "Error retrieving the environment definition. Code: 404\n"
+                f": Environment '{name}' not found."
+            )
+        return cls.registered[name]
+
+    @classmethod
+    def from_conda_specification(cls, name, file_path):
+        CALLS["Environment.from_conda_specification"] += 1
+        return cls(name)
+
+    def register(self, workspace):
+        CALLS["Environment.register"] += 1
+        self.registered[self.name] = self
+        return self
+
+    def build(self, workspace):
+        CALLS["Environment.build"] += 1
+        return types.SimpleNamespace(
+            wait_for_completion=lambda show_output=False: None,
+            get_status=lambda: BUILD_STATUS,
+        )
+
+
+class _Placeholder:
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+
+_MODULES: Dict[str, Dict[str, Any]] = {
+    "azureml": {},
+    "azureml.core": {
+        "ComputeTarget": ComputeTarget,
+        "Datastore": Datastore,
+        "Environment": Environment,
+        "Model": Model,
+        "RunConfiguration": RunConfiguration,
+        "Webservice": Webservice,
+        "Workspace": Workspace,
+    },
+    "azureml.core.authentication": {
+        "InteractiveLoginAuthentication": InteractiveLoginAuthentication,
+        "ServicePrincipalAuthentication": ServicePrincipalAuthentication,
+    },
+    "azureml.core.compute": {"AmlCompute": AmlCompute},
+    "azureml.core.model": {"InferenceConfig": _Placeholder},
+    "azureml.core.webservice": {"AciWebservice": AciWebservice},
+    "azureml.data": {},
+    "azureml.data.azure_postgre_sql_datastore": {
+        "AzurePostgreSqlDatastore": _Placeholder
+    },
+    "azureml.exceptions": {
+        "ComputeTargetException": ComputeTargetException,
+        "UserErrorException": UserErrorException,
+    },
+    "azureml.pipeline": {},
+    "azureml.pipeline.core": {
+        "Pipeline": Pipeline,
+        "PipelineEndpoint": PipelineEndpoint,
+    },
+    "azureml.pipeline.steps": {"PythonScriptStep": _Placeholder},
+}
+
+_KREUZBERGML_AZURE_MODULES = [
+    "kreuzbergml.deployment.azure.app",
+    "kreuzbergml.deployment.azure.database",
+]
+
+
+def install(monkeypatch) -> Dict[str, types.ModuleType]:
+    """
+    Replaces the azureml modules for the duration of a test and returns kreuzbergml's
+    Azure modules keyed by their last name component. These import the SDK only when
+    their methods are called, so they pick up the fakes without being re-imported.
+    """
+    CALLS.clear()
+    ComputeTarget.existing = {}
+    Datastore.existing = {}
+    Environment.registered = {}
+    Webservice.final_states = {}
+    PipelineEndpoint.existing = {}
+    for name, attributes in _MODULES.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        monkeypatch.setitem(sys.modules, name, module)
+    return {
+        name.rsplit(".", 1)[-1]: importlib.import_module(name)
+        for name in _KREUZBERGML_AZURE_MODULES
+    }
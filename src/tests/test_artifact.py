@@ -0,0 +1,115 @@
+import json
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from kreuzbergml.model.artifact import (
+    MANIFEST_FILE_NAME,
+    MappedTree,
+    benchmark_artifact_load,
+    load_model_artifact,
+    package_model,
+    read_manifest,
+    save_model_artifact,
+)
+from kreuzbergml.model.param_factory import (
+    DTCParamsFactory,
+    L2RegularizedLRParamsFactory,
+)
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_classification(n_samples=200, n_features=5, random_state=0)
+
+
+@pytest.mark.parametrize(
+    "model", [LogisticRegression(), RandomForestClassifier(n_estimators=5)]
+)
+def test_artifact_round_trip(model, data, tmp_path):
+    X, y = data
+    model.fit(X, y)
+    directory = save_model_artifact(model, tmp_path / "model")
+
+    loaded = load_model_artifact(directory)
+    np.testing.assert_array_equal(loaded.predict(X), model.predict(X))
+    manifest = read_manifest(directory)
+    assert manifest.model_class == f"{type(model).__module__}.{type(model).__name__}"
+
+
+def test_linear_model_arrays_are_memory_mapped(data, tmp_path):
+    X, y = data
+    model = LogisticRegression().fit(X, y)
+    directory = package_model(model, tmp_path)
+
+    assert directory == tmp_path / "model"
+    assert isinstance(load_model_artifact(directory).coef_, np.memmap)
+    assert not isinstance(
+        load_model_artifact(directory, mmap_mode=None).coef_, np.memmap
+    )
+
+
+def test_tree_arrays_are_memory_mapped(data, tmp_path):
+    X, y = data
+    X = X.copy()
+    X[::7, 0] = np.nan
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    directory = save_model_artifact(model, tmp_path)
+
+    loaded = load_model_artifact(directory)
+    for estimator in loaded.estimators_:
+        tree = estimator.tree_
+        assert isinstance(tree, MappedTree)
+        assert isinstance(tree.value, np.memmap)
+        assert isinstance(tree.children_left, np.memmap)
+        assert not tree.value.flags.writeable
+    np.testing.assert_array_equal(loaded.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(loaded.apply(X), model.apply(X))
+    assert (loaded.decision_path(X)[0] != model.decision_path(X)[0]).nnz == 0
+    np.testing.assert_allclose(loaded.feature_importances_, model.feature_importances_)
+
+    copied = load_model_artifact(directory, mmap_mode=None)
+    assert not isinstance(copied.estimators_[0].tree_, MappedTree)
+    np.testing.assert_array_equal(copied.predict_proba(X), model.predict_proba(X))
+
+
+@pytest.mark.parametrize(
+    "model",
+    [RandomForestClassifier(n_estimators=5), GradientBoostingRegressor(n_estimators=5)],
+)
+def test_loaded_trees_can_be_saved_again(model, data, tmp_path):
+    X, y = data
+    model.fit(X, y)
+    loaded = load_model_artifact(save_model_artifact(model, tmp_path / "first"))
+    np.testing.assert_array_equal(loaded.predict(X), model.predict(X))
+
+    again = load_model_artifact(save_model_artifact(loaded, tmp_path / "second"))
+    np.testing.assert_array_equal(again.predict(X), model.predict(X))
+
+
+def test_unknown_format_version_is_rejected(data, tmp_path):
+    X, y = data
+    directory = save_model_artifact(LogisticRegression().fit(X, y), tmp_path)
+    manifest = json.loads((directory / MANIFEST_FILE_NAME).read_text())
+    manifest["format_version"] = 0
+    (directory / MANIFEST_FILE_NAME).write_text(json.dumps(manifest))
+    with pytest.raises(ValueError):
+        load_model_artifact(directory)
+
+
+def test_benchmark_artifact_load(tmp_path):
+    records = benchmark_artifact_load(
+        [DTCParamsFactory(), L2RegularizedLRParamsFactory()],
+        directory=tmp_path,
+        n_samples=500,
+    )
+    assert [(r.model_class.rsplit(".", 1)[-1], r.artifact_format) for r in records] == [
+        ("DecisionTreeClassifier", "pickle"),
+        ("DecisionTreeClassifier", "mmap"),
+        ("LogisticRegression", "pickle"),
+        ("LogisticRegression", "mmap"),
+    ]
+    assert all(r.load_seconds > 0 and r.artifact_bytes > 0 for r in records)
@@ -0,0 +1,151 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from kreuzbergml.deployment.azure.environment import (
+    EnvironmentCache,
+    compute_environment_hash,
+)
+from tests import fake_azureml
+
+CONDA_SPEC = """\
+name: scoring
+dependencies:
+  - python=3.8
+  - pip:
+    - scikit-learn==1.2.2
+    - git+https://github.com/org/repo.git#egg=repo
+"""
+
+
+@pytest.fixture
+def conda_file(tmp_path):
+    path = tmp_path / "conda.yml"
+    path.write_text(CONDA_SPEC)
+    return path
+
+
+def test_hash_ignores_comments_and_whitespace(conda_file, tmp_path):
+    reformatted = tmp_path / "reformatted.yml"
+    commented = CONDA_SPEC.replace("python=3.8", "python=3.8   # pinned")
+    reformatted.write_text(f"# scoring environment\n\n{commented}\n\n")
+    assert compute_environment_hash(conda_file) == compute_environment_hash(reformatted)
+
+    changed = tmp_path / "changed.yml"
+    changed.write_text(CONDA_SPEC.replace("1.2.2", "1.3.0"))
+    assert compute_environment_hash(conda_file) != compute_environment_hash(changed)
+
+    other_egg = tmp_path / "other_egg.yml"
+    other_egg.write_text(CONDA_SPEC.replace("#egg=repo", "#egg=other"))
+    assert compute_environment_hash(conda_file) != compute_environment_hash(other_egg)
+
+    assert compute_environment_hash(conda_file) != compute_environment_hash(
+        conda_file, base_image="mcr.microsoft.com/azureml/openmpi4.1.0-ubuntu20.04"
+    )
+
+
+def test_environment_cache_reuses_registered_environments(conda_file):
+    registry = {}
+    builds = []
+
+    def build(name, conda_file, base_image):
+        builds.append(name)
+        registry[name] = f"env:{name}"
+        return registry[name]
+
+    cache = EnvironmentCache(registry.get, build, expected_build_seconds=300)
+    first = cache.get_or_create(conda_file)
+    assert cache.get_or_create(conda_file) == first
+    assert len(builds) == 1
+
+    # A new process only finds the environment in the registry.
+    other_cache = EnvironmentCache(registry.get, build, expected_build_seconds=300)
+    assert other_cache.get_or_create(conda_file) == first
+    assert len(builds) == 1
+    assert other_cache.stats.reused == 1
+    assert other_cache.stats.seconds_saved == 300
+
+    cache.get_or_create(conda_file, base_image="custom-image")
+    assert len(builds) == 2
+    assert cache.stats.built == 2 and cache.stats.reused == 1
+    assert cache.stats.seconds_saved == pytest.approx(cache.stats.mean_build_seconds)
+
+
+def test_different_environments_build_concurrently(conda_file, tmp_path):
+    other_file = tmp_path / "other.yml"
+    other_file.write_text(CONDA_SPEC.replace("1.2.2", "1.3.0"))
+    # Both builds have to be running at the same time to pass the barrier.
+    barrier = threading.Barrier(2, timeout=5)
+    builds = []
+
+    def build(name, conda_file, base_image):
+        builds.append(name)
+        barrier.wait()
+        return f"env:{name}"
+
+    cache = EnvironmentCache(lambda name: None, build)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        envs = list(
+            executor.map(cache.get_or_create, [conda_file, other_file, conda_file])
+        )
+
+    assert envs[0] == envs[2] != envs[1]
+    assert len(builds) == 2
+    assert cache.stats.built == 2 and cache.stats.reused == 1
+
+
+def test_azure_app_builds_environment_once(monkeypatch, conda_file):
+    app_module = fake_azureml.install(monkeypatch)["app"]
+    app = app_module.AzureApp(
+        tenant_id="tenant", subscription_id="subscription", db_host="db"
+    )
+    env = app.get_env(str(conda_file))
+    assert app.get_env(str(conda_file)) is env
+    assert env.name.startswith("kreuzbergml-env-")
+    assert fake_azureml.CALLS["Environment.build"] == 1
+
+    variables = app.get_environment_variables(
+        db_access=True, custom_environment_variables={"run_id": "42"}
+    )
+    assert variables["db_host"] == "db"
+    assert variables["run_id"] == "42"
+    assert "blob_string" not in variables
+
+
+def test_azure_app_does_not_register_failed_environment_builds(monkeypatch, conda_file):
+    app_module = fake_azureml.install(monkeypatch)["app"]
+    monkeypatch.setattr(fake_azureml, "BUILD_STATUS", "Failed")
+    app = app_module.AzureApp(tenant_id="tenant", subscription_id="subscription")
+
+    with pytest.raises(RuntimeError, match="Failed"):
+        app.get_env(str(conda_file))
+    assert fake_azureml.Environment.registered == {}
+
+    monkeypatch.setattr(fake_azureml, "BUILD_STATUS", "Succeeded")
+    app.get_env(str(conda_file))
+    assert fake_azureml.CALLS["Environment.build"] == 2
+
+
+def test_azure_app_raises_environment_lookup_errors(monkeypatch, conda_file):
+    app_module = fake_azureml.install(monkeypatch)["app"]
+
+    def get(workspace, name):
+        raise Exception("Error retrieving the environment definition. Code: 503")
+
+    monkeypatch.setattr(fake_azureml.Environment, "get", get)
+    app = app_module.AzureApp(tenant_id="tenant", subscription_id="subscription")
+
+    with pytest.raises(Exception, match="Code: 503"):
+        app.get_env(str(conda_file))
+    assert fake_azureml.CALLS["Environment.build"] == 0
+
+
+def test_environment_variables_leave_out_unset_settings(monkeypatch):
+    app_module = fake_azureml.install(monkeypatch)["app"]
+    app = app_module.AzureApp(tenant_id="tenant", subscription_id="subscription")
+
+    variables = app.get_environment_variables(db_access=True)
+
+    assert variables["tenant_id"] == "tenant"
+    assert None not in variables.values() and "db_host" not in variables
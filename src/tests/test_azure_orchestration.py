@@ -0,0 +1,176 @@
+import time
+
+import pytest
+
+from kreuzbergml.deployment.azure.orchestration import (
+    POLL_FAILED,
+    START_FAILED,
+    TIMED_OUT,
+    DeploymentOrchestrator,
+    DeploymentStepError,
+    wait_all,
+)
+from tests import fake_azureml
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    app_module = fake_azureml.install(monkeypatch)["app"]
+    (tmp_path / "conda.yml").write_text("dependencies:\n  - python=3.8\n")
+    monkeypatch.chdir(tmp_path)
+    return app_module.AzureApp(
+        tenant_id="tenant",
+        subscription_id="subscription",
+        compute_name="cpu-cluster",
+        model_name="model",
+    )
+
+
+class Handle:
+    def __init__(self, states):
+        self.states = list(states)
+
+    def poll(self):
+        return self.states.pop(0)
+
+
+def test_polls_with_backoff_until_terminal_state():
+    sleeps = []
+    orchestrator = DeploymentOrchestrator(
+        initial_poll_interval=1, max_poll_interval=4, sleep=sleeps.append
+    )
+    handle = Handle(["Transitioning"] * 4 + ["Healthy"])
+    with orchestrator:
+        result = orchestrator.submit("service", lambda: handle, Handle.poll).result()
+
+    assert sleeps == [1, 2, 4, 4, 4]
+    assert result.state == "Healthy" and result.value is handle
+    assert result.timings.polls == 5
+    assert result.timings.total_seconds >= result.timings.wait_seconds
+
+
+def test_failed_and_timed_out_steps_raise():
+    with DeploymentOrchestrator(sleep=lambda _: None, timeout=0.0) as orchestrator:
+        failed = orchestrator.submit("failed", lambda: Handle(["Failed"]), Handle.poll)
+        timed_out = orchestrator.submit(
+            "slow", lambda: Handle(["Transitioning"]), Handle.poll
+        )
+        published = orchestrator.submit("publish", lambda: "endpoint")
+        with pytest.raises(DeploymentStepError) as error:
+            wait_all([published, failed, timed_out])
+
+    assert error.value.result.state == "Failed"
+    assert timed_out.exception().result.state == TIMED_OUT
+    assert published.result().value == "endpoint"
+
+
+def test_step_failing_to_start_is_a_step_error_and_others_are_awaited():
+    def start():
+        raise RuntimeError("quota exceeded")
+
+    def slow_poll(handle):
+        time.sleep(0.2)
+        return handle.poll()
+
+    with DeploymentOrchestrator(sleep=lambda _: None) as orchestrator:
+        slow = orchestrator.submit("slow", lambda: Handle(["Healthy"]), slow_poll)
+        broken = orchestrator.submit("broken", start, Handle.poll)
+        with pytest.raises(DeploymentStepError) as error:
+            wait_all([broken, slow])
+        assert slow.done()
+
+    assert error.value.result.state == START_FAILED
+    assert isinstance(error.value.__cause__, RuntimeError)
+    assert slow.result().state == "Healthy"
+
+
+def test_transient_poll_errors_are_retried_with_backoff():
+    sleeps = []
+    states = [ConnectionError("reset"), ConnectionError("reset"), "Healthy"]
+
+    def poll(handle):
+        state = states.pop(0)
+        if isinstance(state, Exception):
+            raise state
+        return state
+
+    with DeploymentOrchestrator(
+        initial_poll_interval=1, max_poll_errors=3, sleep=sleeps.append
+    ) as orchestrator:
+        result = orchestrator.submit("service", lambda: "handle", poll).result()
+        assert result.state == "Healthy" and sleeps == [1, 2, 4]
+
+        failing = orchestrator.submit("unreachable", lambda: "handle", lambda _: 1 / 0)
+        with pytest.raises(DeploymentStepError) as error:
+            failing.result()
+    assert error.value.result.state == POLL_FAILED
+    assert error.value.result.timings.polls == 3
+
+
+def test_waiting_steps_do_not_occupy_start_slots():
+    with DeploymentOrchestrator(
+        max_workers=2, initial_poll_interval=0.2
+    ) as orchestrator:
+        start = time.perf_counter()
+        futures = [
+            orchestrator.submit(
+                f"service-{i}", lambda: Handle(["Healthy"]), Handle.poll
+            )
+            for i in range(10)
+        ]
+        results = wait_all(futures)
+        elapsed = time.perf_counter() - start
+
+    assert all(r.state == "Healthy" for r in results)
+    # Ten steps waiting 0.2s each would take 1s if only two could wait at a time.
+    assert elapsed < 0.6
+
+
+def test_orchestrated_steps_reject_wait(app):
+    with DeploymentOrchestrator() as orchestrator:
+        with pytest.raises(ValueError):
+            orchestrator.submit_real_time_endpoint(app, wait=True)
+        with pytest.raises(ValueError):
+            orchestrator.submit_compute_target(app, wait=True)
+        with pytest.raises(ValueError):
+            orchestrator.submit_pipeline_endpoint(app, wait=False)
+    with pytest.raises(RuntimeError):
+        orchestrator.submit("late", lambda: None)
+
+
+def test_deploys_endpoints_concurrently(app, monkeypatch):
+    monkeypatch.setattr(fake_azureml, "SUBMIT_SECONDS", 0.2)
+    fake_azureml.Webservice.final_states["broken-service"] = "Unhealthy"
+    names = [f"service-{i}" for i in range(4)]
+
+    start = time.perf_counter()
+    with DeploymentOrchestrator(initial_poll_interval=0.01) as orchestrator:
+        compute = orchestrator.submit_compute_target(app, max_nodes=2)
+        services = [
+            orchestrator.submit_real_time_endpoint(app, endpoint_azure_name=name)
+            for name in names
+        ]
+        broken = orchestrator.submit_real_time_endpoint(
+            app, endpoint_azure_name="broken-service"
+        )
+        results = wait_all([compute, *services])
+        pipeline = orchestrator.submit_pipeline_endpoint(
+            app, partitioned=True, node_count=2
+        ).result()
+    elapsed = time.perf_counter() - start
+
+    # Six submissions of 0.2s each take well under their serial time.
+    assert elapsed < 6 * 0.2
+    assert [r.value.name for r in results[1:]] == names
+    assert all(r.state == "Healthy" for r in results[1:])
+    assert results[0].state == "Succeeded"
+    assert broken.exception().result.state == "Unhealthy"
+    assert pipeline.value.name == "partitioned-batch-endpoint"
+    assert pipeline.timings.polls == 0
+
+    calls = fake_azureml.CALLS
+    assert calls["Model.deploy"] == 5
+    assert calls["Webservice.wait_for_deployment"] == 0
+    assert calls["ComputeTarget.wait_for_completion"] == 0
+    assert calls["ComputeTarget.create"] == 1
+    assert calls["Environment.build"] == 1
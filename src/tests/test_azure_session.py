@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from kreuzbergml.deployment.azure.session import AzureSession
+from tests import fake_azureml
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def azure(monkeypatch):
+    modules = fake_azureml.install(monkeypatch)
+    return modules["app"], modules["database"]
+
+
+def test_session_caches_until_ttl_expires():
+    clock = FakeClock()
+    session = AzureSession(ttl_seconds=10, clock=clock)
+    loads = []
+
+    def loader():
+        loads.append(clock.now)
+        return object()
+
+    first = session.get_workspace(loader)
+    assert session.get_workspace(loader) is first
+    clock.now = 11
+    assert session.get_workspace(loader) is not first
+    assert loads == [0, 11]
+
+    stats = session.stats()["workspace"]
+    assert (stats.hits, stats.misses, stats.evictions) == (1, 2, 1)
+    assert session.hits == 1 and session.misses == 2
+
+    session.get_compute_target("cpu", loader)
+    session.invalidate(("compute_target", "cpu"))
+    session.get_compute_target("cpu", loader)
+    assert session.stats()["compute_target"].misses == 2
+
+
+def test_session_loads_once_under_concurrency():
+    session = AzureSession()
+    loads = []
+
+    def slow_loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return "workspace"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(session.get("ws", slow_loader)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["workspace"] * 8
+    assert len(loads) == 1
+    assert session.hits == 7 and session.misses == 1
+
+
+def test_session_keeps_no_lock_of_finished_loads():
+    session = AzureSession(ttl_seconds=0)
+    for i in range(100):
+        session.get_datastore(f"db-{i}", lambda: "db")
+    with pytest.raises(KeyError):
+        session.get_datastore("missing", lambda: {}["missing"])
+    assert not session._AzureSession__key_locks
+
+
+def test_session_does_not_cache_failed_loads():
+    session = AzureSession()
+
+    def failing_loader():
+        raise KeyError("missing")
+
+    with pytest.raises(KeyError):
+        session.get_datastore("db", failing_loader)
+    assert session.get_datastore("db", lambda: "db") == "db"
+
+
+def test_azure_app_and_database_share_cached_workspace(azure):
+    app_module, database_module = azure
+    app = app_module.AzureApp(
+        tenant_id="tenant",
+        subscription_id="subscription",
+        service_principle_id="sp",
+        service_principle_password="secret",
+        compute_name="cpu-cluster",
+    )
+    database = database_module.AzureDatabase(
+        app, "datastore", "server", "db", "user", "password"
+    )
+
+    assert app.get_workspace() is app.get_workspace()
+    app.get_or_create_compute_target()
+    app.get_or_create_compute_target()
+    database.get_or_register_postgres_db()
+    database.get_or_register_postgres_db()
+
+    calls = fake_azureml.CALLS
+    assert calls["Workspace"] == 1
+    assert calls["ServicePrincipalAuthentication"] == 1
+    assert calls["ComputeTarget.create"] == 1
+    assert calls["ComputeTarget"] == 1
+    assert calls["Datastore.register_azure_postgre_sql"] == 1
+    assert calls["Datastore.get"] == 1
+    assert app.session.stats()["workspace"].hits >= 4
+
+    assert app.delete_compute_instance()
+    assert not app.delete_compute_instance()
+
+
+def test_concurrent_calls_create_missing_compute_target_once(azure, monkeypatch):
+    app_module, _ = azure
+    monkeypatch.setattr(fake_azureml, "SUBMIT_SECONDS", 0.1)
+    app = app_module.AzureApp(
+        tenant_id="tenant", subscription_id="subscription", compute_name="gpu"
+    )
+    threads = [
+        threading.Thread(target=app.get_or_create_compute_target) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fake_azureml.CALLS["ComputeTarget.create"] == 1
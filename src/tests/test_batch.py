@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+from kreuzbergml.deployment.batch import (
+    DONE,
+    FAILED,
+    SKIPPED,
+    BatchScoringJob,
+    CsvFileSource,
+    CsvShardSink,
+    FileShardStateStore,
+    LocalShardExecutor,
+    Shard,
+    select_node_shards,
+)
+
+
+def _score(df):
+    return df.assign(score=df["x"] * 2)
+
+
+def _score_failing_on_negative(df):
+    if (df["x"] < 0).any():
+        raise ValueError("negative x")
+    return _score(df)
+
+
+@pytest.fixture
+def input_files(tmp_path):
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    for i in range(4):
+        xs = range(i * 25, (i + 1) * 25)
+        pd.DataFrame({"id": list(xs), "x": list(xs)}).to_csv(
+            input_dir / f"part-{i}.csv", index=False
+        )
+    return input_dir
+
+
+def test_select_node_shards():
+    shards = [Shard(str(i)) for i in range(5)]
+    assigned = [select_node_shards(shards, i, 2) for i in range(2)]
+    assert [s.shard_id for s in assigned[0]] == ["0", "2", "4"]
+    assert [s.shard_id for s in assigned[1]] == ["1", "3"]
+    with pytest.raises(ValueError):
+        select_node_shards(shards, 2, 2)
+
+
+def test_local_executor_partitions_and_merges(input_files, tmp_path):
+    source = CsvFileSource(str(input_files / "*.csv"))
+    sink = CsvShardSink(tmp_path / "output")
+    job = BatchScoringJob(source, sink, _score, chunksize=10)
+    shards = source.partition()
+
+    results = LocalShardExecutor(n_processes=2).run(job, shards)
+
+    assert [r.status for r in results] == [DONE] * 4
+    assert sum(r.n_rows for r in results) == 100
+    merged_path = tmp_path / "merged.csv"
+    assert sink.merge(shards, merged_path) == 100
+    merged = pd.read_csv(merged_path)
+    assert merged["id"].tolist() == list(range(100))
+    assert (merged["score"] == merged["x"] * 2).all()
+
+
+def test_job_is_resumable_and_idempotent(input_files, tmp_path):
+    bad = pd.read_csv(input_files / "part-2.csv")
+    bad.loc[3, "x"] = -1
+    bad.to_csv(input_files / "part-2.csv", index=False)
+
+    source = CsvFileSource(str(input_files / "*.csv"))
+    sink = CsvShardSink(tmp_path / "output")
+    state = FileShardStateStore(tmp_path / "state")
+    shards = source.partition()
+
+    job = BatchScoringJob(source, sink, _score_failing_on_negative, state, chunksize=10)
+    first = {r.shard_id: r for r in LocalShardExecutor().run(job, shards)}
+    assert first["part-2"].status == FAILED
+    assert "negative x" in first["part-2"].error
+    assert not sink.path(Shard("part-2")).exists()
+    assert not list(sink.directory.glob("*.tmp"))
+    assert sum(r.status == DONE for r in first.values()) == 3
+
+    job = BatchScoringJob(source, sink, _score, state, chunksize=10)
+    second = {r.shard_id: r for r in LocalShardExecutor(2).run(job, shards)}
+    assert second["part-2"].status == DONE
+    assert sum(r.status == SKIPPED for r in second.values()) == 3
+    assert sink.merge(shards, tmp_path / "merged.csv") == 100
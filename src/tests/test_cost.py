@@ -0,0 +1,92 @@
+import json
+import math
+
+import pytest
+
+from kreuzbergml.model.benchmark import (
+    BENCHMARK_FORMAT_VERSION,
+    BenchmarkResults,
+    get_all_factories,
+    run_benchmark,
+)
+from kreuzbergml.model.cost import FitCostModel, _ParamEncoder, iterate_grid
+from kreuzbergml.model.param_factory import (
+    DTCParamsFactory,
+    KNCParamsFactory,
+    MLPCParamsFactory,
+)
+
+SHAPES = ((200, 5), (800, 5), (800, 20), (2000, 10))
+
+
+@pytest.fixture(scope="module")
+def benchmark_results():
+    factories = [DTCParamsFactory(), KNCParamsFactory()]
+    return run_benchmark(factories, dataset_shapes=SHAPES, n_param_samples=3)
+
+
+def test_get_all_factories():
+    names = {type(factory).__name__ for factory in get_all_factories()}
+    assert {"SVCParamsFactory", "RFCParamsFactory", "MLPCParamsFactory"} <= names
+
+
+def test_benchmark_results_roundtrip(benchmark_results, tmp_path):
+    assert len(benchmark_results.records) == len(SHAPES) * 2 * 3
+    ok = [r for r in benchmark_results.records if not r.failed]
+    assert ok
+    assert all(r.fit_seconds > 0 and r.peak_memory_bytes > 0 for r in ok)
+
+    path = benchmark_results.save(tmp_path / "bench.json")
+    loaded = BenchmarkResults.load(path)
+    assert loaded.records == benchmark_results.records
+    assert loaded.format_version == BENCHMARK_FORMAT_VERSION
+
+    payload = json.loads(path.read_text())
+    payload["format_version"] = BENCHMARK_FORMAT_VERSION + 1
+    path.write_text(json.dumps(payload))
+    with pytest.raises(ValueError):
+        BenchmarkResults.load(path)
+
+
+def test_fit_cost_model_estimates(benchmark_results):
+    factory = DTCParamsFactory()
+    cost_model = FitCostModel.from_results(
+        benchmark_results, [factory, KNCParamsFactory(), MLPCParamsFactory()]
+    )
+    assert cost_model.has_factory(factory)
+    assert not cost_model.has_factory(MLPCParamsFactory())
+
+    params = {
+        "criterion": "gini",
+        "max_depth": 5,
+        "min_samples_split": 2,
+        "min_samples_leaf": 1,
+    }
+    small = cost_model.predict(factory, params, n_samples=200, n_features=5)
+    large = cost_model.predict(factory, params, n_samples=20000, n_features=50)
+    assert 0 < small.fit_seconds < large.fit_seconds
+    assert 0 < small.peak_memory_bytes < large.peak_memory_bytes
+
+    grid = {"criterion": ["gini"], "max_depth": [3, 5], "min_samples_split": [2]}
+    estimate = cost_model.estimate_search(
+        factory, 1000, 10, param_grid=grid, cv=5, n_workers=2
+    )
+    assert estimate.n_tasks == len(list(iterate_grid(grid))) == 2
+    assert estimate.wall_seconds <= estimate.total_seconds
+    assert estimate.total_seconds == pytest.approx(
+        sum(task.seconds for task in estimate.tasks)
+    )
+
+    with pytest.raises(ValueError):
+        cost_model.predict(MLPCParamsFactory(), {}, 100, 10)
+
+
+def test_param_encoder_separates_small_log_spaced_values():
+    encoder = _ParamEncoder(
+        {"alpha": [1e-4, 1e-3, 1e-2], "n_estimators": [10, 100], "shift": [-1.0, 1.0]}
+    )
+    alphas = [encoder.encode({"alpha": a})[0] for a in (1e-4, 1e-3, 1e-2)]
+    assert alphas == pytest.approx([math.log(1e-4), math.log(1e-3), math.log(1e-2)])
+    assert encoder.encode({"alpha": 0.0})[0] == pytest.approx(math.log(1e-12))
+    assert encoder.encode({"n_estimators": 100})[1] == pytest.approx(math.log1p(100))
+    assert encoder.encode({"shift": -1.0})[2] == -1.0
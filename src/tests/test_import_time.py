@@ -0,0 +1,19 @@
+from kreuzbergml.import_time import (
+    ImportBudget,
+    check_import_budgets,
+    measure_import_time,
+)
+
+
+def test_modules_stay_within_import_budget():
+    assert check_import_budgets(repeat=1) == []
+
+
+def test_factories_resolve_model_classes_on_first_use():
+    result = measure_import_time("kreuzbergml.model.param_factory", repeat=1)
+    assert "numpy" in result.loaded_packages
+    assert "sklearn" not in result.loaded_packages
+    assert result.seconds > 0
+
+    too_strict = ImportBudget("kreuzbergml.model.param_factory", 0.0, ("numpy",))
+    assert len(result.violations(too_strict)) == 2
@@ -0,0 +1,127 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from kreuzbergml.data_quality.data_frame_statistics import DataFrameStatistics
+from kreuzbergml.deployment.batch import BatchScoringJob, CsvFileSource, CsvShardSink
+from kreuzbergml.deployment.scoring import MicroBatchScorer
+from kreuzbergml.instrumentation import metrics
+from kreuzbergml.instrumentation.export import (
+    to_dict,
+    to_prometheus_text,
+    write_metrics,
+)
+from kreuzbergml.instrumentation.metrics import MetricsRegistry, get_registry, timer
+
+THIS_DIR = Path(__file__).parent
+
+
+@pytest.fixture
+def registry():
+    registry = get_registry()
+    registry.reset()
+    registry.enable()
+    yield registry
+    registry.disable()
+    registry.reset()
+
+
+def test_disabled_timer_records_nothing():
+    registry = get_registry()
+    registry.reset()
+    with timer("noop") as operation:
+        operation.add(rows=3)
+    metrics.increment("noop")
+    assert registry.operations() == {} and registry.counters() == {}
+
+
+def test_timer_records_rows_bytes_errors_and_histogram(registry):
+    for _ in range(2):
+        with timer("op") as operation:
+            operation.add(rows=5, bytes=100)
+    with pytest.raises(ValueError):
+        with timer("op"):
+            raise ValueError("bad")
+    metrics.increment("event", 2)
+
+    stats = registry.operations()["op"]
+    assert stats.seconds.count == 3 and stats.errors == 1
+    assert stats.rows == 10 and stats.bytes == 200
+    assert stats.seconds.cumulative_counts()[-1] == 3
+    assert stats.peak_memory_bytes is None
+    assert registry.counters() == {"event": 2}
+
+
+def test_peak_memory_of_nested_operations(registry):
+    registry.enable(track_memory=True)
+    with timer("outer"):
+        with timer("inner"):
+            data = bytearray(10_000_000)
+        del data
+    peaks = {n: s.peak_memory_bytes for n, s in registry.operations().items()}
+    assert peaks["inner"] >= 10_000_000
+    assert peaks["outer"] >= peaks["inner"]
+
+
+def test_prometheus_and_json_export(tmp_path):
+    registry = MetricsRegistry(enabled=True, buckets=(0.1, 1.0))
+    registry.record("postgres.copy", 0.5, rows=10, bytes=2048)
+    registry.record("postgres.copy", 2.0, error=True)
+    registry.increment("scoring.requests", 3)
+
+    text = to_prometheus_text(registry)
+    assert (
+        'kreuzbergml_operation_seconds_bucket{operation="postgres.copy",le="0.1"} 0'
+        in text
+    )
+    assert (
+        'kreuzbergml_operation_seconds_bucket{operation="postgres.copy",le="1"} 1'
+        in text
+    )
+    assert (
+        'kreuzbergml_operation_seconds_bucket{operation="postgres.copy",le="+Inf"} 2'
+        in text
+    )
+    assert 'kreuzbergml_operation_errors_total{operation="postgres.copy"} 1' in text
+    assert 'kreuzbergml_operation_bytes_total{operation="postgres.copy"} 2048' in text
+    assert 'kreuzbergml_events_total{event="scoring.requests"} 3' in text
+
+    as_dict = to_dict(registry)
+    assert as_dict["operations"]["postgres.copy"]["rows"] == 10
+    path = tmp_path / "metrics.json"
+    write_metrics(path, format="json", registry=registry)
+    assert json.loads(path.read_text()) == json.loads(json.dumps(as_dict))
+
+
+def test_profile_hook_saves_profile(registry, tmp_path):
+    registry.profile("profiled", str(tmp_path))
+    with timer("profiled"):
+        sum(range(1000))
+    with timer("not_profiled"):
+        pass
+    profiles = list(tmp_path.glob("*.prof"))
+    assert len(profiles) == 1 and profiles[0].name.startswith("profiled-")
+
+
+def test_data_quality_scoring_and_batch_are_instrumented(registry, tmp_path):
+    df = pd.read_csv(THIS_DIR / "sample_data" / "census_1000.csv")
+    DataFrameStatistics(df).calc_statistics()
+
+    with MicroBatchScorer(lambda rows: rows.sum(axis=1), max_wait_ms=1) as scorer:
+        scorer.predict(np.array([[1, 2], [3, 4]]), timeout=5)
+
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    pd.DataFrame({"x": range(7)}).to_csv(input_dir / "part-0.csv", index=False)
+    source = CsvFileSource(str(input_dir / "*.csv"))
+    job = BatchScoringJob(source, CsvShardSink(tmp_path / "output"), lambda c: c)
+    job.run_shard(source.partition()[0])
+
+    operations = registry.operations()
+    assert operations["data_quality.calc_statistics"].seconds.count == 1
+    assert operations["data_quality.get_duplicate_columns"].seconds.count >= 1
+    assert operations["scoring.predict_batch"].rows == 2
+    assert operations["batch.score_shard"].rows == 7
@@ -0,0 +1,128 @@
+import json
+
+import pytest
+
+from kreuzbergml.deployment.loadtest import (
+    DeploymentConfig,
+    InProcessTarget,
+    LocalHttpTarget,
+    recommend_deployment_config,
+    run_load_test,
+)
+
+SCORE_PY = """\
+import json
+import time
+
+model = None
+
+
+def init():
+    global model
+    model = sum
+
+
+def run(raw_data):
+    data = json.loads(raw_data)["data"]
+    if data is None:
+        raise ValueError("no data")
+    time.sleep(0.002)
+    return [model(row) for row in data]
+"""
+
+
+@pytest.fixture
+def entry_script(tmp_path):
+    path = tmp_path / "score.py"
+    path.write_text(SCORE_PY)
+    return path
+
+
+def test_in_process_load_test_reports_latency_and_errors(entry_script):
+    payloads = [{"data": [[1, 2]]}, json.dumps({"data": None})]
+    with InProcessTarget(entry_script) as target:
+        report = run_load_test(
+            target, payloads, rate=200, duration_seconds=0.5, random_state=0
+        )
+
+    assert report.n_requests == 100
+    assert report.n_errors == 50
+    assert report.error_rate == 0.5
+    assert 2 <= report.p50_latency_ms <= report.p90_latency_ms <= report.p99_latency_ms
+    assert report.throughput > 0
+    assert report.peak_rss_bytes > 0
+
+
+def test_http_target_serves_entry_script(entry_script):
+    with LocalHttpTarget(entry_script, cpu_cores=1) as target:
+        report = run_load_test(
+            target, {"data": [[1, 2, 3]]}, rate=50, duration_seconds=0.4
+        )
+    assert report.n_requests == 20 and report.n_errors == 0
+    assert report.peak_rss_bytes > 0
+
+
+def test_http_target_ignores_output_of_entry_script(tmp_path):
+    path = tmp_path / "score.py"
+    path.write_text(
+        SCORE_PY.replace(
+            "    model = sum\n", "    model = sum\n    print('Init complete')\n"
+        ).replace("    time.sleep(0.002)\n", "    print('x' * 4096)\n")
+    )
+    with LocalHttpTarget(path) as target:
+        report = run_load_test(
+            target, {"data": [[1, 2]]}, rate=100, duration_seconds=1, random_state=0
+        )
+    assert report.n_requests == 100 and report.n_errors == 0
+
+
+def test_http_target_reports_failed_startup(tmp_path):
+    path = tmp_path / "score.py"
+    path.write_text("def init():\n    raise RuntimeError('no model')\n")
+    with pytest.raises(RuntimeError, match="exited"):
+        LocalHttpTarget(path)
+
+
+def test_vm_config_endpoint_kwargs_name_the_compute_target():
+    config = DeploymentConfig(2, 7, "STANDARD_DS2_V2")
+    assert config.endpoint_kwargs("scoring-vm") == {
+        "deployment_target_compute_name": "scoring-vm",
+        "deployment_target_vm_size": "STANDARD_DS2_V2",
+    }
+    with pytest.raises(ValueError):
+        config.endpoint_kwargs()
+
+
+def test_recommends_cheapest_config_meeting_target(entry_script):
+    candidates = [
+        DeploymentConfig(1, 0.01),
+        DeploymentConfig(1, 1),
+        DeploymentConfig(2, 1),
+    ]
+    recommendation = recommend_deployment_config(
+        entry_script,
+        {"data": [[1, 2]]},
+        target_p99_ms=2000,
+        rate=50,
+        duration_seconds=0.4,
+        candidates=candidates,
+    )
+
+    # 10MB is less than any Python process needs, so the next candidate is recommended.
+    assert recommendation.config == DeploymentConfig(1, 1)
+    assert list(recommendation.reports) == candidates[:2]
+    assert recommendation.config.endpoint_kwargs() == {
+        "aci_cpu_cores": 1,
+        "aci_memory_gb": 1,
+    }
+
+    impossible = recommend_deployment_config(
+        entry_script,
+        {"data": [[1, 2]]},
+        target_p99_ms=0.001,
+        rate=50,
+        duration_seconds=0.2,
+        candidates=candidates,
+    )
+    assert impossible.config is None
+    assert len(impossible.reports) == 3
@@ -0,0 +1,70 @@
+import io
+import json
+import logging
+import queue
+
+from kreuzbergml.config.logging import (
+    NonBlockingQueueHandler,
+    RateLimitFilter,
+    SamplingFilter,
+    benchmark_score_logger,
+    configure_async_score_logger,
+    shutdown_async_logging,
+)
+
+
+def make_record(name="score", level=logging.INFO):
+    return logging.makeLogRecord({"name": name, "levelno": level, "msg": "scored"})
+
+
+def test_async_logger_writes_json_lines_on_shutdown():
+    stream = io.StringIO()
+    logger = configure_async_score_logger("test.async", stream=stream)
+    logger.info("Scored %d rows", 3, extra={"request_id": "abc"})
+    try:
+        raise ValueError("bad row")
+    except ValueError:
+        logger.exception("Scoring failed")
+    shutdown_async_logging("test.async")
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["message"] for line in lines] == ["Scored 3 rows", "Scoring failed"]
+    assert lines[0]["request_id"] == "abc"
+    assert lines[0]["logger"] == "test.async" and lines[0]["level"] == "INFO"
+    assert "ValueError: bad row" in lines[1]["exception"]
+
+
+def test_sampling_keeps_warnings_and_uses_most_specific_logger():
+    sampling = SamplingFilter({"score": 0.0, "score.batch": 1.0}, seed=0)
+    assert not sampling.filter(make_record("score.request"))
+    assert sampling.filter(make_record("score.batch.shard"))
+    assert sampling.filter(make_record("score", logging.WARNING))
+    assert sampling.filter(make_record("other"))
+
+
+def test_rate_limit_reports_suppressed_records():
+    now = [0.0]
+    rate_limit = RateLimitFilter(max_per_second=10, clock=lambda: now[0])
+    passed = [rate_limit.filter(make_record()) for _ in range(100)]
+    assert sum(passed) == 10
+    assert rate_limit.filter(make_record("other"))
+
+    now[0] = 0.5
+    records = [make_record() for _ in range(10)]
+    assert sum(rate_limit.filter(r) for r in records) == 5
+    assert records[0].suppressed == 90
+
+
+def test_full_queue_drops_records_without_blocking():
+    handler = NonBlockingQueueHandler(queue.SimpleQueue(), max_size=1)
+    handler.handle(make_record())
+    handler.handle(make_record())
+    assert handler.dropped == 1
+
+
+def test_benchmark_score_logger():
+    results = benchmark_score_logger(n_calls=200, write_delay_seconds=0.0001)
+    assert set(results) == {"sync", "async"}
+    assert all(seconds > 0 for seconds in results.values())
+    # Writes of the sync logger take at least the write delay of 100us each.
+    assert results["async"] < results["sync"]
@@ -0,0 +1,110 @@
+import math
+import time
+
+import numpy as np
+import pytest
+
+from kreuzbergml.model.optimizer import TPEOptimizer
+from kreuzbergml.model.param_factory import (
+    MLPCParamsFactory,
+    RFCParamsFactory,
+    SVCParamsFactory,
+)
+from kreuzbergml.model.search_space import (
+    CategoricalDimension,
+    LogUniformDimension,
+    SearchSpace,
+    is_log_spaced,
+)
+
+
+def test_search_space_from_factory():
+    space = SearchSpace.from_factory(SVCParamsFactory())
+    dims = {dim.name: dim for dim in space.dimensions}
+
+    assert isinstance(dims["kernel"], CategoricalDimension)
+    assert isinstance(dims["gamma"], LogUniformDimension)
+    assert isinstance(dims["C"], LogUniformDimension)
+    assert math.isclose(dims["C"].low, 0.1)
+    assert math.isclose(dims["C"].high, 100.0)
+
+    rfc_space = SearchSpace.from_factory(RFCParamsFactory())
+    assert all(isinstance(d, CategoricalDimension) for d in rfc_space.dimensions)
+
+
+def test_is_log_spaced():
+    assert is_log_spaced(np.logspace(-4, -2, num=7))
+    assert not is_log_spaced(np.linspace(0, 1, num=5))
+    assert not is_log_spaced([8, 16, 32, 64])
+    assert not is_log_spaced([0.1, 1.0])
+    assert not is_log_spaced(["a", "b", "c"])
+
+
+def _svc_objective(params):
+    # Optimum at kernel="rbf", gamma=0.1, C=10.
+    penalty = 0.0 if params["kernel"] == "rbf" else 1.0
+    gamma_distance = (math.log10(params["gamma"]) + 1) ** 2
+    c_distance = (math.log10(params["C"]) - 1) ** 2
+    return -(gamma_distance + c_distance + penalty)
+
+
+def test_tpe_beats_random_sampling():
+    optimizer = TPEOptimizer(SVCParamsFactory(), n_startup_trials=10, random_state=0)
+    best = optimizer.optimize(_svc_objective, max_fits=60)
+
+    assert len(optimizer.trials) == 60
+    assert best.params["kernel"] == "rbf"
+
+    rng = np.random.default_rng(0)
+    space = SearchSpace.from_factory(SVCParamsFactory())
+    random_best = max(_svc_objective(space.sample(rng)) for _ in range(60))
+    assert best.score >= random_best
+
+
+def test_tpe_batch_ask_and_parallel_workers():
+    optimizer = TPEOptimizer(MLPCParamsFactory(), n_startup_trials=4, random_state=1)
+    for trial in optimizer.ask(4):
+        optimizer.tell(trial, score=-trial.params["alpha"])
+
+    batch = optimizer.ask(4)
+    assert len(batch) == 4
+    assert len(optimizer.pending_trials) == 4
+    assert len({trial.number for trial in batch}) == 4
+
+    for trial in batch:
+        optimizer.tell(trial, score=-trial.params["alpha"])
+    assert not optimizer.pending_trials
+
+    optimizer.optimize(lambda p: -p["alpha"], max_fits=8, n_workers=4)
+    assert len(optimizer.trials) == 16
+
+
+def test_pending_trials_do_not_count_as_startup_trials(monkeypatch):
+    optimizer = TPEOptimizer(SVCParamsFactory(), n_startup_trials=10, random_state=0)
+    optimizer.tell(optimizer.ask(1)[0], score=1.0)
+    sample = optimizer.space.sample
+    samples = []
+    monkeypatch.setattr(
+        optimizer.space, "sample", lambda rng: samples.append(1) or sample(rng)
+    )
+
+    optimizer.ask(12)
+    assert len(samples) == 12
+
+
+def test_tpe_time_budget_and_failures():
+    def objective(params):
+        time.sleep(0.01)
+        if params["kernel"] == "poly":
+            raise ValueError("poly is not supported")
+        return 1.0
+
+    optimizer = TPEOptimizer(SVCParamsFactory(), random_state=2)
+    optimizer.optimize(objective, max_time=0.2, n_workers=2)
+
+    assert 0 < len(optimizer.trials) < 100
+    assert all(t.failed for t in optimizer.trials if t.params["kernel"] == "poly")
+    assert optimizer.best_trial is None or optimizer.best_score == 1.0
+
+    with pytest.raises(ValueError):
+        optimizer.optimize(objective)
@@ -0,0 +1,152 @@
+import csv
+import io
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from kreuzbergml.data.postgres import AbstractPostgresDbDAO
+from kreuzbergml.deployment.batch import (
+    PostgresKeyRangeSource,
+    PostgresShardSink,
+    Shard,
+)
+
+
+class FakeCursor:
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    def copy_expert(self, sql, file):
+        self.statements.append((sql, None))
+        self.copied.extend(csv.reader(io.StringIO(file.read())))
+
+
+class FakeEngine:
+    def __init__(self):
+        self.cursor = FakeCursor()
+        self.keys = []
+
+    @contextmanager
+    def connect(self):
+        def execute(_, sql, params):
+            # The distinct key windows, as computed by the partition query.
+            size = params["shard_size"]
+            return [(w,) for w in sorted({key // size for key in self.keys})]
+
+        yield type("Connection", (), {"execute": execute})()
+
+    @contextmanager
+    def begin(self):
+        connection = type("Connection", (), {})()
+        connection.connection = type("DbApiConnection", (), {})()
+        connection.connection.cursor = lambda: self.cursor
+        yield connection
+
+    def dispose(self, close=True):
+        pass
+
+
+class FakePostgresDbDAO(AbstractPostgresDbDAO):
+    def __init__(self):
+        super().__init__("user", "password", "localhost", "5432", "db")
+
+    @staticmethod
+    def create_engine(username, password, host, port, database):
+        return FakeEngine()
+
+
+def test_replace_shard_deletes_shard_and_copies_nulls_as_empty_fields():
+    dao = FakePostgresDbDAO()
+    chunks = [
+        pd.DataFrame(
+            {
+                "id": [1, 2],
+                "name": ["a", None],
+                "score": [0.5, np.nan],
+                "scored_at": pd.to_datetime(["2021-01-01", None]),
+            }
+        ),
+        pd.DataFrame(
+            {
+                "id": [3],
+                "name": ["c"],
+                "score": [1.0],
+                "scored_at": pd.to_datetime(["2021-01-02"]),
+            }
+        ),
+    ]
+
+    cnt = dao.replace_shard(chunks, "scores", "shard_id", "s-1", "out")
+
+    cursor = dao.engine.cursor
+    assert cnt == 3
+    assert cursor.statements[0] == (
+        'DELETE FROM out.scores WHERE "shard_id" = %s',
+        ("s-1",),
+    )
+    assert cursor.statements[1][0] == (
+        'COPY out.scores ("id", "name", "score", "scored_at", "shard_id") '
+        "FROM STDIN WITH CSV"
+    )
+    assert cursor.copied == [
+        ["1", "a", "0.5", "2021-01-01 00:00:00", "s-1"],
+        ["2", "", "", "", "s-1"],
+        ["3", "c", "1.0", "2021-01-02 00:00:00", "s-1"],
+    ]
+
+
+def test_postgres_shard_sink_replaces_rows_of_its_shard():
+    dao = FakePostgresDbDAO()
+    sink = PostgresShardSink(dao, "scores", shard_column="shard")
+
+    cnt = sink.write(Shard("part-0"), [pd.DataFrame({"id": [1, 2]})])
+
+    cursor = dao.engine.cursor
+    assert cnt == 2
+    assert cursor.statements[0] == (
+        'DELETE FROM scores WHERE "shard" = %s',
+        ("part-0",),
+    )
+    assert cursor.copied == [["1", "part-0"], ["2", "part-0"]]
+
+
+def test_key_range_shards_do_not_move_when_table_grows():
+    dao = FakePostgresDbDAO()
+    source = PostgresKeyRangeSource(dao, "features", "id", shard_size=100)
+    assert source.partition() == []
+
+    dao.engine.keys = [5, 120, 250]
+    before = source.partition()
+    dao.engine.keys += [310, 420]
+    after = source.partition()
+
+    assert [s.shard_id for s in before] == [
+        "features-0-100",
+        "features-100-200",
+        "features-200-300",
+    ]
+    assert after[: len(before)] == before
+    assert after[-1].spec == {"start": 400, "stop": 500}
+
+
+def test_key_range_shards_skip_empty_ranges():
+    dao = FakePostgresDbDAO()
+    dao.engine.keys = [-5, 1, 10**9]
+    source = PostgresKeyRangeSource(dao, "features", "id", shard_size=100)
+
+    assert [s.spec for s in source.partition()] == [
+        {"start": -100, "stop": 0},
+        {"start": 0, "stop": 100},
+        {"start": 10**9, "stop": 10**9 + 100},
+    ]
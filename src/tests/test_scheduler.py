@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+
+import pytest
+
+from kreuzbergml.model.param_factory import RFCParamsFactory, SVCParamsFactory
+from kreuzbergml.model.scheduler import (
+    CANCELLED,
+    DONE,
+    FAILED,
+    TIMEOUT,
+    CostAwareScheduler,
+    SearchTask,
+    build_search_tasks,
+)
+
+
+def _sleep_task(params):
+    time.sleep(params["seconds"])
+    if params.get("fail"):
+        raise ValueError("bad params")
+    return params["seconds"]
+
+
+def test_longest_task_first_and_reports():
+    tasks = [
+        SearchTask(0, {"seconds": 0.05}, estimated_seconds=1.0),
+        SearchTask(1, {"seconds": 0.05}, estimated_seconds=3.0),
+        SearchTask(2, {"seconds": 0.05, "fail": True}, estimated_seconds=2.0),
+    ]
+    report = CostAwareScheduler(n_workers=1, poll_interval=0.01).run(tasks, _sleep_task)
+
+    started = sorted(report.tasks, key=lambda r: r.started_at)
+    assert [r.task.task_id for r in started] == [1, 2, 0]
+    assert [r.task.task_id for r in report.by_status(DONE)] == [1, 0]
+    failed = report.by_status(FAILED)
+    assert len(failed) == 1 and "bad params" in failed[0].error
+    assert report.workers[0].n_tasks == 3
+    assert 0 < report.utilization <= 1
+
+
+def test_n_jobs_packing_and_timeout():
+    tasks = [
+        SearchTask(0, {"seconds": 10}, estimated_seconds=10.0, n_jobs=2),
+        SearchTask(1, {"seconds": 0.01}, estimated_seconds=0.1),
+    ]
+    scheduler = CostAwareScheduler(n_workers=3, task_timeout=0.3, poll_interval=0.01)
+    start = time.perf_counter()
+    report = scheduler.run(tasks, _sleep_task)
+
+    assert time.perf_counter() - start < 5
+    reports = {r.task.task_id: r for r in report.tasks}
+    assert reports[0].status == TIMEOUT
+    assert reports[0].workers == [0, 1]
+    assert reports[1].status == DONE
+    assert reports[1].workers == [2]
+
+    with pytest.raises(ValueError):
+        scheduler.run([SearchTask(2, {}, n_jobs=4)], _sleep_task)
+
+
+def test_cancel():
+    scheduler = CostAwareScheduler(n_workers=1, poll_interval=0.01)
+    tasks = [SearchTask(i, {"seconds": 10}) for i in range(3)]
+    threading.Timer(0.2, scheduler.cancel).start()
+    report = scheduler.run(tasks, _sleep_task)
+
+    assert len(report.by_status(CANCELLED)) == 3
+    assert report.wall_seconds < 5
+
+
+def test_build_search_tasks():
+    grid = {"n_estimators": [8], "max_depth": [4]}
+    rfc_tasks = build_search_tasks(RFCParamsFactory(), 100, 5, 4, param_grid=grid)
+    assert len(rfc_tasks) == 1
+    assert rfc_tasks[0].n_jobs == 4
+    assert rfc_tasks[0].params["n_jobs"] == 4
+
+    svc_tasks = build_search_tasks(SVCParamsFactory(), 100, 5, os.cpu_count() or 1)
+    assert len(svc_tasks) == 3 * 5 * 4
+    assert all(t.n_jobs == 1 and "n_jobs" not in t.params for t in svc_tasks)
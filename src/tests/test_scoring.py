@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from kreuzbergml.deployment.scoring import MicroBatchScorer
+
+
+class CountingModel:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batch_sizes = []
+
+    def predict(self, X):
+        time.sleep(self.delay)
+        X = np.asarray(X)
+        self.batch_sizes.append(len(X))
+        return X.sum(axis=1)
+
+
+def test_concurrent_requests_are_batched():
+    model = CountingModel(delay=0.01)
+    results = {}
+
+    with MicroBatchScorer(model.predict, max_batch_size=8, max_wait_ms=20) as scorer:
+
+        def client(i):
+            results[i] = scorer.predict([[i, 1]], timeout=5)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(32)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        metrics = scorer.metrics()
+
+    assert {i: r.tolist() for i, r in results.items()} == {
+        i: [i + 1] for i in range(32)
+    }
+    assert sum(model.batch_sizes) == 32
+    assert len(model.batch_sizes) < 32
+    assert max(model.batch_sizes) <= 8
+    assert metrics.n_requests == 32
+    assert metrics.n_batches == len(model.batch_sizes)
+    assert metrics.mean_batch_size > 1
+    assert 0 < metrics.p50_latency_ms <= metrics.p99_latency_ms
+
+
+def test_single_request_respects_max_wait():
+    model = CountingModel()
+    with MicroBatchScorer(model.predict, max_batch_size=64, max_wait_ms=10) as scorer:
+        start = time.perf_counter()
+        prediction = scorer.predict(np.ones((3, 2)), timeout=5)
+        elapsed = time.perf_counter() - start
+
+    assert prediction.tolist() == [2, 2, 2]
+    assert elapsed < 1
+    assert model.batch_sizes == [3]
+
+
+def test_dataframes_json_and_errors():
+    def predict(df):
+        if (df["a"] < 0).any():
+            raise ValueError("negative input")
+        return pd.Series(df["a"] * 2)
+
+    with MicroBatchScorer(predict, max_wait_ms=1) as scorer:
+        payload = json.dumps({"data": [{"a": 1}, {"a": 2}]})
+        assert scorer.run_json(payload, timeout=5) == [2, 4]
+        with pytest.raises(ValueError):
+            scorer.predict(pd.DataFrame({"a": [-1]}), timeout=5)
+
+    with pytest.raises(RuntimeError):
+        scorer.submit([[1]])
+
+
+def test_cancelled_requests_are_skipped():
+    model = CountingModel()
+    with MicroBatchScorer(model.predict, max_wait_ms=200) as scorer:
+        cancelled = scorer.submit([[1, 2]])
+        assert cancelled.cancel()
+        assert scorer.predict([[3, 4]], timeout=5).tolist() == [7]
+        assert scorer.running
+        assert scorer.predict([[5, 6]], timeout=5).tolist() == [11]
+    assert model.batch_sizes == [1, 1]
+
+
+def test_bad_request_does_not_fail_its_batch():
+    def predict(X):
+        if np.asarray(X).shape[1] != 2:
+            raise ValueError("expected 2 features")
+        return np.asarray(X).sum(axis=1)
+
+    with MicroBatchScorer(predict, max_batch_size=8, max_wait_ms=100) as scorer:
+        good = scorer.submit([[1, 2]])
+        bad = scorer.submit([[1, 2, 3]])
+        other = scorer.submit([[3, 4]])
+        assert good.result(timeout=5).tolist() == [3]
+        assert other.result(timeout=5).tolist() == [7]
+        with pytest.raises(ValueError):
+            bad.result(timeout=5)
+    assert scorer.metrics().n_requests == 2
+
+
+def test_submit_is_rejected_once_stopping_has_begun():
+    model = CountingModel(delay=0.3)
+    scorer = MicroBatchScorer(model.predict, max_wait_ms=1).start()
+    first = scorer.submit([[1, 2]])
+    time.sleep(0.1)
+    stopper = threading.Thread(target=scorer.stop)
+    stopper.start()
+    time.sleep(0.05)
+
+    with pytest.raises(RuntimeError):
+        scorer.submit([[3, 4]])
+    stopper.join(5)
+    assert first.result(timeout=5).tolist() == [3]
+    assert not scorer.running